@@ -0,0 +1,348 @@
+"""
+FrozenLake policy explorer: a page of the Dash app in world_map.py that trains the
+q_learning agents on a chosen map and hyperparameters and shows the greedy policy
+and the reward curve while they learn.
+
+Training runs in Dash background callbacks on a DiskcacheManager, each launch in a
+process of its own, so the web workers never train; they only pass on the small
+snapshots the job publishes every PROGRESS_EVERY episodes. Jobs and their
+snapshots live in a diskcache folder (JOBS_DIR), with no broker to run:
+
+- a job's key hashes its configuration and the q_learning code version;
+- the first launch of a key trains it, and identical launches meanwhile follow its
+  snapshots instead of training again; finished results are kept for
+  RESULT_EXPIRE seconds, in a cache capped at RESULTS_SIZE_LIMIT bytes, so later
+  identical launches return at once;
+- at most MAX_JOBS jobs train at a time; the others show as queued until a slot
+  frees up. Slots and job ownership are recorded by process, and taken back from
+  processes that no longer run: Cancel kills the job's process outright
+  (SIGKILL), so it never gets to release them itself.
+
+`python policy_explorer.py --check-responsiveness` measures the app's response
+times idle and while jobs train.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import diskcache
+import numpy as np
+import psutil
+import plotly.graph_objects as go
+from dash import DiskcacheManager, Input, Output, State, callback, dcc, html, no_update
+
+from q_learning import (GridFeatures, MapCache, greedy_policy, make_env, render_policy, train_linear_agent,
+                        train_q_lambda, train_q_table)
+from q_learning.run_cache import code_version
+
+PATH = "/policy-explorer"
+JOBS_DIR = os.environ.get("POLICY_EXPLORER_JOBS_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "q_learning", "jobs"))
+MAX_JOBS = int(os.environ.get("POLICY_EXPLORER_MAX_JOBS", 2))
+SNAPSHOT_EXPIRE = 3600
+RESULT_EXPIRE = 7 * 24 * 3600
+RESULTS_SIZE_LIMIT = 2 ** 28
+PROGRESS_EVERY = 50
+POLL_INTERVAL = 0.5
+
+# Built-in maps, and maps generated with 10% holes from a fixed seed
+MAPS = {"4x4": None, "8x8": None, "16x16 (generated)": 16, "32x32 (generated)": 32}
+TRAINERS = ("tabular", "q-lambda", "linear (grid features)")
+# (label, lowest, highest, integer) of each numeric input; highest None for no limit
+LIMITS = {"episodes": ("episodes", 100, 50000, True), "alpha": ("alpha", 0, 1, False),
+          "gamma": ("gamma", 0, 1, False), "epsilon_decay": ("epsilon decay", 0.9, 1, False),
+          "seed": ("seed", 0, None, True)}
+
+jobs = diskcache.Cache(os.path.join(JOBS_DIR, "jobs"))
+results = diskcache.Cache(os.path.join(JOBS_DIR, "results"), size_limit=RESULTS_SIZE_LIMIT)
+background_callback_manager = DiskcacheManager(diskcache.Cache(os.path.join(JOBS_DIR, "callbacks")))
+
+
+def map_rows(map_name):
+    """The map as a list of row strings."""
+    if MAPS[map_name] is None:
+        from gymnasium.envs.toy_text.frozen_lake import MAPS as BUILT_IN_MAPS
+        return list(BUILT_IN_MAPS[map_name])
+    desc = MapCache().load_map(MAPS[map_name], hole_density=0.1, seed=0)
+    return [row.tobytes().decode() for row in desc]
+
+
+def job_key(config):
+    """Hash of a job's configuration and the code that trains it."""
+    return hashlib.sha256(json.dumps({"config": config, "code_version": code_version()},
+                                     sort_keys=True).encode()).hexdigest()
+
+
+class ProgressReporter:
+    """
+    A trainer's `progress` callback: every `every` episodes it publishes the greedy
+    policy and the rewards so far under the job's key and passes the snapshot to
+    `report`.
+    """
+    def __init__(self, key, config, report, every=PROGRESS_EVERY):
+        self.key = key
+        self.config = config
+        self.report = report
+        self.every = every
+        self.desc = map_rows(config["map"])
+        self.rewards = []
+
+    def snapshot(self, status, episode=0, model=None, state_size=None):
+        policy = None if model is None else greedy_policy(model, state_size).tolist()
+        return {"status": status, "episode": episode, "episodes": self.config["episodes"], "policy": policy,
+                "rewards": list(self.rewards), "desc": self.desc}
+
+    def publish(self, snapshot):
+        jobs.set(("progress", self.key), snapshot, expire=SNAPSHOT_EXPIRE)
+        self.report(snapshot)
+
+    def __call__(self, episode, reward, model, state_size=None):
+        self.rewards.append(reward)
+        if episode % self.every == 0:
+            self.publish(self.snapshot("training", episode, model, state_size))
+
+
+def train(config, reporter):
+    """Train the job `config`, publishing through `reporter`; the final snapshot."""
+    desc = map_rows(config["map"])
+    env = make_env(desc=desc, is_slippery=config["slippery"])
+    args = (env, config["episodes"], 100, config["alpha"], config["gamma"], 1.0, 0.01, config["epsilon_decay"])
+    if config["trainer"] == "tabular":
+        model, _ = train_q_table(*args, seed=config["seed"], progress=reporter)
+    elif config["trainer"] == "q-lambda":
+        model, _ = train_q_lambda(*args, seed=config["seed"], progress=reporter)
+    else:
+        model, _ = train_linear_agent(*args, seed=config["seed"], features=GridFeatures(np.array(desc, dtype="c")),
+                                      progress=reporter)
+    env.close()
+    return reporter.snapshot("done", config["episodes"], model, env.observation_space.n)
+
+
+def invalid_inputs(values):
+    """Why the numeric inputs `values` (name -> value) cannot start a job, or None if they can."""
+    for name, value in values.items():
+        label, lowest, highest, integer = LIMITS[name]
+        # Number inputs give None when empty or outside their min and max
+        if value is None or value < lowest or (highest is not None and value > highest):
+            return f"{label} must be " + (f"between {lowest} and {highest}" if highest is not None
+                                          else f"at least {lowest}")
+        if integer and value != int(value):
+            return f"{label} must be a whole number"
+    return None
+
+
+def current_process():
+    """The (pid, start time) of this process; the start time tells it apart from a later one reusing its pid."""
+    process = psutil.Process()
+    return process.pid, process.create_time()
+
+
+def is_running(holder):
+    """Whether the process `holder` (from current_process) still runs."""
+    pid, started = holder
+    try:
+        process = psutil.Process(pid)
+        # A killed job whose parent has not reaped it yet lingers as a zombie
+        return process.create_time() == started and process.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def acquire_slot(holder):
+    """Wait for one of the MAX_JOBS training slots and take it for `holder`."""
+    while True:
+        with jobs.transact():
+            holders = [other for other in jobs.get("slots", []) if is_running(other)]
+            if len(holders) < MAX_JOBS:
+                jobs.set("slots", holders + [holder])
+                return
+        time.sleep(POLL_INTERVAL)
+
+
+def release_slot(holder):
+    with jobs.transact():
+        jobs.set("slots", [other for other in jobs.get("slots", []) if other != holder])
+
+
+def claim_job(key, holder):
+    """Make `holder` the owner of the job `key`, unless a running process owns it. Whether it did."""
+    with jobs.transact():
+        owner = jobs.get(("owner", key))
+        if owner is not None and is_running(owner):
+            return False
+        jobs.set(("owner", key), holder)
+        return True
+
+
+def run_job(config, report):
+    """
+    The final snapshot of the job `config`: stored, followed from an identical
+    running job, or trained once a slot is free. `report` gets every snapshot.
+    """
+    key = job_key(config)
+    holder = current_process()
+    while True:
+        result = results.get(key)
+        if result is not None:
+            return result
+        if claim_job(key, holder):
+            break
+        # An identical job is running: follow it until it finishes or its process is gone
+        snapshot = jobs.get(("progress", key))
+        if snapshot is not None:
+            report(snapshot)
+        time.sleep(POLL_INTERVAL)
+
+    reporter = ProgressReporter(key, config, report)
+    try:
+        reporter.publish(reporter.snapshot("queued"))
+        acquire_slot(holder)
+        try:
+            result = train(config, reporter)
+        finally:
+            release_slot(holder)
+        results.set(key, result, expire=RESULT_EXPIRE)
+    finally:
+        jobs.delete(("owner", key))
+    return result
+
+
+def render(snapshot):
+    """The policy grid, reward curve figure and status line of a snapshot."""
+    policy = "" if snapshot["policy"] is None else render_policy(snapshot["policy"], snapshot["desc"])
+    rewards = np.array(snapshot["rewards"], dtype=np.float64)
+    window = min(100, len(rewards)) or 1
+    mean = np.convolve(rewards, np.ones(window) / window, mode="valid") if len(rewards) else rewards
+    figure = go.Figure(go.Scatter(x=np.arange(window, len(rewards) + 1), y=mean))
+    figure.update_layout(title=f"Success rate ({window}-episode mean)", xaxis_title="Episode",
+                         yaxis=dict(range=[0, 1]), height=350, margin=dict(l=40, r=20, t=50, b=40))
+    status = {"queued": f"Queued: waiting for one of {MAX_JOBS} training slots",
+              "training": f"Training: episode {snapshot['episode']} of {snapshot['episodes']}",
+              "done": f"Done: {snapshot['episodes']} episodes"}[snapshot["status"]]
+    return policy, figure, status
+
+
+def _field(label, component):
+    return html.Div([html.Label(label, style={"display": "block", "font-weight": "bold"}), component],
+                    style={"margin-bottom": "10px"})
+
+
+layout = html.Div([
+    html.H2("FrozenLake policy explorer"),
+    html.Div(style={"display": "flex", "gap": "30px"}, children=[
+        html.Div(style={"flex": "1", "max-width": "260px"}, children=[
+            _field("Trainer", dcc.Dropdown(list(TRAINERS), "tabular", id="explorer-trainer", clearable=False)),
+            _field("Map", dcc.Dropdown(list(MAPS), "4x4", id="explorer-map", clearable=False)),
+            dcc.Checklist([{"label": " slippery", "value": "slippery"}], [], id="explorer-slippery"),
+            _field("Episodes", dcc.Input(id="explorer-episodes", type="number", value=2000, min=LIMITS["episodes"][1],
+                                         max=LIMITS["episodes"][2], step=100)),
+            _field("Learning rate (alpha)", dcc.Input(id="explorer-alpha", type="number", value=0.1,
+                                                      min=LIMITS["alpha"][1], max=LIMITS["alpha"][2], step=0.01)),
+            _field("Discount (gamma)", dcc.Input(id="explorer-gamma", type="number", value=0.99,
+                                                 min=LIMITS["gamma"][1], max=LIMITS["gamma"][2], step=0.01)),
+            _field("Epsilon decay", dcc.Input(id="explorer-epsilon-decay", type="number", value=0.999,
+                                              min=LIMITS["epsilon_decay"][1], max=LIMITS["epsilon_decay"][2],
+                                              step=0.0005)),
+            _field("Seed", dcc.Input(id="explorer-seed", type="number", value=0, min=LIMITS["seed"][1], step=1)),
+            html.Button("Train", id="explorer-train"),
+            html.Button("Cancel", id="explorer-cancel", disabled=True, style={"margin-left": "10px"}),
+        ]),
+        html.Div(style={"flex": "3"}, children=[
+            html.Div(id="explorer-status", children="Pick a map and hyperparameters, then press Train."),
+            html.Pre(id="explorer-policy", style={"font-size": "18px", "line-height": "1.2"}),
+            dcc.Graph(id="explorer-rewards", figure=go.Figure()),
+        ]),
+    ]),
+], style={"margin": "20px"})
+
+RESULTS = [Output("explorer-policy", "children"), Output("explorer-rewards", "figure"),
+           Output("explorer-status", "children")]
+
+
+@callback(
+    RESULTS,
+    Input("explorer-train", "n_clicks"),
+    [State("explorer-trainer", "value"), State("explorer-map", "value"), State("explorer-slippery", "value"),
+     State("explorer-episodes", "value"), State("explorer-alpha", "value"), State("explorer-gamma", "value"),
+     State("explorer-epsilon-decay", "value"), State("explorer-seed", "value")],
+    background=True,
+    manager=background_callback_manager,
+    progress=RESULTS,
+    running=[(Output("explorer-train", "disabled"), True, False),
+             (Output("explorer-cancel", "disabled"), False, True)],
+    cancel=[Input("explorer-cancel", "n_clicks")],
+    prevent_initial_call=True,
+)
+def train_policy(set_progress, n_clicks, trainer, map_name, slippery, episodes, alpha, gamma, epsilon_decay, seed):
+    error = invalid_inputs({"episodes": episodes, "alpha": alpha, "gamma": gamma, "epsilon_decay": epsilon_decay,
+                            "seed": seed})
+    if error is not None:
+        return no_update, no_update, f"Not started: {error}."
+    config = {"trainer": trainer, "map": map_name, "slippery": "slippery" in slippery, "episodes": int(episodes),
+              "alpha": float(alpha), "gamma": float(gamma), "epsilon_decay": float(epsilon_decay), "seed": int(seed)}
+    return render(run_job(config, lambda snapshot: set_progress(render(snapshot))))
+
+
+def _latencies(url, num_requests):
+    """Response times in milliseconds of `num_requests` GETs of the page layout."""
+    import urllib.request
+    times = []
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        urllib.request.urlopen(url + "/_dash-layout").read()
+        times.append(1000 * (time.perf_counter() - start))
+    return np.array(times)
+
+
+def _ignore(snapshot):
+    pass
+
+
+def check_responsiveness(num_jobs=MAX_JOBS + 1, num_requests=200, episodes=20000):
+    """
+    Serve the app from a thread and print the p50 and p99 response times of its
+    layout endpoint idle and while `num_jobs` distinct jobs train in processes of
+    their own, started as the background callbacks start them, then terminated.
+    """
+    import logging
+    import multiprocessing
+    import threading
+
+    from werkzeug.serving import make_server
+
+    from world_map import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    rows = [("idle", _latencies(url, num_requests))]
+    configs = [{"trainer": "tabular", "map": "32x32 (generated)", "slippery": True, "episodes": episodes,
+                "alpha": 0.1, "gamma": 0.99, "epsilon_decay": 0.999, "seed": seed} for seed in range(num_jobs)]
+    for config in configs:
+        results.delete(job_key(config))
+    workers = [multiprocessing.Process(target=run_job, args=(config, _ignore)) for config in configs]
+    for worker in workers:
+        worker.start()
+    time.sleep(1.0)
+    rows.append((f"{num_jobs} jobs ({MAX_JOBS} training)", _latencies(url, num_requests)))
+    for worker in workers:
+        worker.terminate()
+        worker.join()
+    server.shutdown()
+    for name, times in rows:
+        print(f"{name:<24} p50 {np.percentile(times, 50):7.1f} ms   p99 {np.percentile(times, 99):7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check-responsiveness", action="store_true",
+                        help="measure response times idle and while jobs train")
+    parser.add_argument("--jobs", type=int, default=MAX_JOBS + 1, help="jobs to start for the measurement")
+    args = parser.parse_args()
+    if args.check_responsiveness:
+        check_responsiveness(args.jobs)
+    else:
+        parser.print_help()
@@ -0,0 +1,56 @@
+"""
+Q-learning agents for Gymnasium's FrozenLake: tabular Q-learning and Q(lambda), a
+linear Q-function approximator and deep Q-learning, with checkpointing, streaming
+training metrics and a cache of finished runs, all fed by shared rollout sources. The
+DQN parts (which need torch) and the Numba-compiled tabular trainer are only imported
+on first use.
+"""
+import importlib
+
+from .checkpoint import Checkpointer
+from .convergence import ConvergenceMonitor
+from .envs import GridLakeEnv, TransitionTable, make_env
+from .evaluation import evaluate_policy, greedy_policy, policy_grid, render_policy, shortest_path_policy
+from .export import CompiledPolicy, export_policy, serve_policy
+from .features import GridFeatures
+from .linear import LinearQAgent, train_linear_agent
+from .maps import MapCache, generate_map, goal_distances, has_path
+from .metrics import MetricsLogger, RollingMean, live_view, read_metrics
+from .profiling import PhaseProfiler, StackSampler
+from .q_lambda import train_q_lambda
+from .replay import IndexReplayBuffer, PrioritizedReplayBuffer, ReplayBuffer, SumTree
+from .rng import capture_rng_states, derive_seeds, restore_rng_states, seed_everything
+from .rollout import (EnvSource, EpsilonGreedy, PrefetchSource, TableSource, Transition, TransitionBatch,
+                      VectorEnvSource)
+from .run_cache import RunCache
+from .sparse import SparseQTable
+from .tabular import train_q_table
+from .visualize import visualize_policy_from_linear, visualize_policy_from_q
+
+# Names from modules with heavy optional dependencies (torch, numba), imported on first use
+_LAZY_NAMES = {
+    "DQNetwork": "dqn", "NumpyQNetwork": "dqn", "batch_q_function": "dqn", "make_greedy_actor": "dqn",
+    "one_hot_encode": "dqn", "select_action": "dqn",
+    "train_dqn_frozenlake": "dqn", "train_dqn_vectorized": "dqn",
+    "train_q_table_jit": "tabular_jit", "train_dqn_actor_learner": "actor_learner",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        module = importlib.import_module(f".{_LAZY_NAMES[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "Checkpointer", "CompiledPolicy", "ConvergenceMonitor", "EnvSource", "EpsilonGreedy", "GridFeatures",
+    "GridLakeEnv", "IndexReplayBuffer", "LinearQAgent", "MapCache", "MetricsLogger", "PhaseProfiler",
+    "PrefetchSource", "PrioritizedReplayBuffer", "ReplayBuffer", "RollingMean", "RunCache", "SparseQTable",
+    "StackSampler", "SumTree", "TableSource", "Transition", "TransitionBatch", "TransitionTable",
+    "VectorEnvSource", "capture_rng_states", "derive_seeds", "evaluate_policy", "export_policy", "generate_map",
+    "goal_distances", "greedy_policy", "has_path", "live_view", "make_env", "policy_grid", "read_metrics",
+    "render_policy", "restore_rng_states", "seed_everything", "serve_policy", "shortest_path_policy",
+    "train_linear_agent", "train_q_lambda", "train_q_table", "visualize_policy_from_linear",
+    "visualize_policy_from_q", *_LAZY_NAMES,
+]
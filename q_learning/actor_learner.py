@@ -0,0 +1,297 @@
+"""
+Actor-learner DQN: actor processes generate experience while one learner trains.
+
+Each actor process runs its own environment and an epsilon-greedy copy of the
+Q-network, and writes transitions into its own shared-memory ring. The learner (the
+calling process) drains the rings into an IndexReplayBuffer and makes gradient
+updates without waiting for the environments, publishing its weights to a shared
+block that actors reload every `refresh_every` steps.
+"""
+import copy
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from .dqn import DQNetwork
+from .envs import make_env
+from .replay import IndexReplayBuffer
+from .rng import derive_seeds, seed_everything
+
+
+class TransitionRing:
+    """
+    Single-producer, single-consumer ring of transitions in one shared memory block.
+
+    The producer only advances `head` and the consumer only advances `tail`, each
+    after the data it covers is written or read, so neither side needs a lock.
+    """
+    FIELDS = (("states", np.int32), ("actions", np.int64), ("rewards", np.float32),
+              ("next_states", np.int32), ("dones", np.float32))
+
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        size = 16 + sum(capacity * np.dtype(dtype).itemsize for _, dtype in self.FIELDS)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.counters = np.ndarray(2, dtype=np.int64, buffer=self.shm.buf)
+        if name is None:
+            self.counters[:] = 0
+        offset = 16
+        self.fields = {}
+        for field, dtype in self.FIELDS:
+            self.fields[field] = np.ndarray(capacity, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            offset += capacity * np.dtype(dtype).itemsize
+
+    def push(self, states, actions, rewards, next_states, dones, stop=None):
+        """Append a batch, waiting while the ring is full (unless `stop` gets set)."""
+        values = (states, actions, rewards, next_states, dones)
+        count = len(states)
+        while self.capacity - (self.counters[0] - self.counters[1]) < count:
+            if stop is not None and stop.is_set():
+                return
+            time.sleep(0.0005)
+        indices = (self.counters[0] + np.arange(count)) % self.capacity
+        for (field, _), value in zip(self.FIELDS, values):
+            self.fields[field][indices] = value
+        self.counters[0] += count
+
+    def drain(self):
+        """Remove and return everything pushed so far, as a tuple of arrays."""
+        head, tail = int(self.counters[0]), int(self.counters[1])
+        indices = (tail + np.arange(head - tail)) % self.capacity
+        batch = tuple(self.fields[field][indices] for field, _ in self.FIELDS)
+        self.counters[1] = head
+        return batch
+
+    def close(self, unlink=False):
+        del self.counters, self.fields
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class SharedWeights:
+    """A network's parameters as one float32 vector in shared memory, plus a version counter."""
+    def __init__(self, num_params, name=None):
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=8 + 4 * num_params)
+        self.version = np.ndarray(1, dtype=np.int64, buffer=self.shm.buf)
+        self.vector = np.ndarray(num_params, dtype=np.float32, buffer=self.shm.buf, offset=8)
+
+    def publish(self, network, lock):
+        with lock, torch.no_grad():
+            self.vector[:] = nn.utils.parameters_to_vector(network.parameters()).numpy()
+            self.version[0] += 1
+
+    def load_into(self, network, lock):
+        with lock, torch.no_grad():
+            nn.utils.vector_to_parameters(torch.from_numpy(self.vector.copy()), network.parameters())
+            return int(self.version[0])
+
+    def close(self, unlink=False):
+        del self.version, self.vector
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _run_actor(actor_seed, config, ring_name, weights_name, sync):
+    """Body of an actor process: play episodes until the episode budget is used up."""
+    torch.set_num_threads(1)
+    env = make_env(**config["env_kwargs"])
+    ring = TransitionRing(config["ring_capacity"], name=ring_name)
+    weights = SharedWeights(config["num_params"], name=weights_name)
+    network = DQNetwork(config["state_size"], config["action_size"], config["hidden_size"], embed=True)
+    network.requires_grad_(False)
+    version = weights.load_into(network, sync["weights_lock"])
+
+    rng = seed_everything(actor_seed, env)
+    state_t = torch.zeros(1, dtype=torch.long)
+    pending = []
+    steps = 0
+
+    sync["ready"].release()
+    sync["go"].wait()
+    while not sync["stop"].is_set():
+        with sync["episodes"].get_lock():
+            episode = sync["episodes"].value
+            if episode >= config["num_episodes"]:
+                break
+            sync["episodes"].value += 1
+        # The same per-episode schedule as the single-process trainers, over global episodes
+        epsilon = max(config["epsilon_start"] * config["epsilon_decay"] ** episode, config["epsilon_end"])
+
+        state, _ = env.reset()
+        total_reward = 0.0
+        for _ in range(config["max_steps"]):
+            if rng.random() < epsilon:
+                action = int(rng.integers(config["action_size"]))
+            else:
+                state_t[0] = state
+                with torch.inference_mode():
+                    action = int(network(state_t).argmax())
+            next_state, reward, terminated, truncated, _ = env.step(action)
+            # Only a real termination cuts off the bootstrap target
+            pending.append((state, action, reward, next_state, terminated))
+            total_reward += reward
+            state = next_state
+            steps += 1
+
+            if len(pending) >= config["push_every"]:
+                ring.push(*map(np.array, zip(*pending)), stop=sync["stop"])
+                pending = []
+            if steps % config["refresh_every"] == 0 and weights.version[0] != version:
+                version = weights.load_into(network, sync["weights_lock"])
+            if terminated or truncated:
+                break
+        sync["rewards"][episode] = total_reward
+
+    if pending:
+        ring.push(*map(np.array, zip(*pending)), stop=sync["stop"])
+    ring.close()
+    weights.close()
+
+
+def _check_actors(actors, started=True):
+    """Raise if an actor process failed: exited with an error, or exited at all before it was ready."""
+    for index, actor in enumerate(actors):
+        if actor.exitcode is not None and (actor.exitcode != 0 or not started):
+            raise RuntimeError(f"actor process {index} exited with code {actor.exitcode}")
+
+
+def train_dqn_actor_learner(
+    env_kwargs=None,
+    num_actors=4,
+    num_episodes=2000,
+    max_steps=100,
+    gamma=0.99,
+    lr=1e-3,
+    epsilon_start=1.0,
+    epsilon_end=0.01,
+    epsilon_decay=0.999,
+    batch_size=32,
+    replay_capacity=10000,
+    hidden_size=32,
+    target_sync_every=250,
+    publish_every=50,
+    refresh_every=100,
+    push_every=32,
+    ring_capacity=65536,
+    learner_threads=1,
+    seed=None,
+    start_method="spawn"
+):
+    """
+    DQN with `num_actors` actor processes and one learner (this process).
+
+    Actors build their environment with make_env(**env_kwargs) (a slippery 4x4 map by
+    default), draw their episodes from a shared budget of `num_episodes`, decay
+    epsilon by the global episode index, push transitions to the learner every
+    `push_every` steps and reload the published weights every `refresh_every` steps.
+    The learner updates continuously once the replay buffer holds `batch_size`
+    transitions, syncs its target network every `target_sync_every` updates and
+    publishes weights every `publish_every` updates. States are integer indices, as
+    in train_dqn_vectorized.
+
+    Returns (network, rewards, stats): rewards are indexed by global episode and
+    stats counts transitions and updates over the timed run, which starts once
+    every actor process is up. `seed` seeds the network and the learner's sampling,
+    and actor i runs with seed derive_seeds(seed, num_actors)[i]; results still vary
+    with process scheduling.
+    """
+    env_kwargs = dict(env_kwargs or {"is_slippery": True})
+    probe = make_env(**env_kwargs)
+    state_size, action_size = probe.observation_space.n, probe.action_space.n
+    probe.close()
+
+    torch.set_num_threads(learner_threads)
+    rng = seed_everything(seed)
+    q_network = DQNetwork(state_size, action_size, hidden_size, embed=True)
+    target_network = copy.deepcopy(q_network)
+    target_network.requires_grad_(False)
+    optimizer = optim.Adam(q_network.parameters(), lr=lr)
+    loss_fn = nn.MSELoss()
+    replay_buffer = IndexReplayBuffer(capacity=replay_capacity, rng=rng)
+
+    ctx = mp.get_context(start_method)
+    num_params = sum(p.numel() for p in q_network.parameters())
+    sync = {"weights_lock": ctx.Lock(), "episodes": ctx.Value("q", 0), "rewards": ctx.Array("d", num_episodes),
+            "ready": ctx.Semaphore(0), "go": ctx.Event(), "stop": ctx.Event()}
+    weights = SharedWeights(num_params)
+    rings = [TransitionRing(ring_capacity) for _ in range(num_actors)]
+    config = dict(env_kwargs=env_kwargs, state_size=state_size, action_size=action_size, hidden_size=hidden_size,
+                  num_params=num_params, ring_capacity=ring_capacity, num_episodes=num_episodes,
+                  max_steps=max_steps, epsilon_start=epsilon_start, epsilon_end=epsilon_end,
+                  epsilon_decay=epsilon_decay, push_every=push_every, refresh_every=refresh_every)
+    weights.publish(q_network, sync["weights_lock"])
+
+    actor_seeds = [None] * num_actors if seed is None else derive_seeds(seed, num_actors)
+    actors = [ctx.Process(target=_run_actor, args=(actor_seed, config, ring.shm.name, weights.shm.name, sync),
+                          daemon=True)
+              for actor_seed, ring in zip(actor_seeds, rings)]
+    transitions = 0
+    num_updates = 0
+    try:
+        for actor in actors:
+            actor.start()
+        # Actors that die before signalling (a failed import or spawn) would otherwise leave us waiting forever
+        for _ in actors:
+            while not sync["ready"].acquire(timeout=0.5):
+                _check_actors(actors, started=False)
+        sync["go"].set()
+        start = time.perf_counter()
+
+        while True:
+            actors_done = not any(actor.is_alive() for actor in actors)
+            # An actor that raised stops feeding its ring, so fail instead of waiting on it
+            _check_actors(actors)
+            for ring in rings:
+                batch = ring.drain()
+                if len(batch[0]):
+                    replay_buffer.push_batch(*batch)
+                    transitions += len(batch[0])
+            if actors_done:
+                # Everything the actors pushed before exiting has now been drained
+                break
+            if len(replay_buffer) < batch_size:
+                time.sleep(0.001)
+                continue
+
+            b_states, b_actions, b_rewards, b_next_states, b_dones = replay_buffer.sample(batch_size)
+            states_batch = torch.as_tensor(b_states)
+            actions_batch = torch.as_tensor(b_actions)
+            q_values_current = q_network(states_batch).gather(1, actions_batch.unsqueeze(1)).squeeze(1)
+            with torch.no_grad():
+                q_next_max = target_network(torch.as_tensor(b_next_states)).max(1)[0]
+            q_targets = torch.as_tensor(b_rewards) + gamma * q_next_max * (1 - torch.as_tensor(b_dones))
+
+            loss = loss_fn(q_values_current, q_targets)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            num_updates += 1
+
+            if num_updates % target_sync_every == 0:
+                target_network.load_state_dict(q_network.state_dict())
+            if num_updates % publish_every == 0:
+                weights.publish(q_network, sync["weights_lock"])
+        elapsed = time.perf_counter() - start
+    finally:
+        sync["stop"].set()
+        sync["go"].set()
+        for actor in actors:
+            actor.join(timeout=5)
+            if actor.is_alive():
+                actor.terminate()
+                actor.join()
+        for ring in rings:
+            ring.close(unlink=True)
+        weights.close(unlink=True)
+
+    _check_actors(actors)
+    stats = {"actors": num_actors, "seconds": elapsed, "transitions": transitions, "updates": num_updates,
+             "transitions_per_sec": transitions / elapsed, "updates_per_sec": num_updates / elapsed}
+    return q_network, list(sync["rewards"][:]), stats
@@ -0,0 +1,64 @@
+"""
+Benchmarks of the trainers and their optimizations.
+
+Each benchmark returns a list of result rows (dicts) so the CLI can print them as a
+table or dump them as JSON to track results across code versions:
+
+    python -m q_learning bench throughput metrics-overhead --json results.json
+
+The benchmarks are grouped by area: tabular.py (tabular, sparse, linear and
+Q(lambda) agents), dqn.py, maps.py (map generation and policy evaluation) and
+tooling.py (rollout sources, metrics, profiling, the run cache and policy
+export). They only time things; what they compare is checked by the tests.
+
+Steps/sec of every trainer is also tracked with pytest-benchmark, which keeps
+runs to compare against:
+
+    python -m pytest tests/test_trainer_throughput.py --benchmark-autosave
+    python -m pytest tests/test_trainer_throughput.py --benchmark-compare
+"""
+from .dqn import (bench_actor_learner, bench_dqn_backends, bench_dqn_targets, bench_index_states,
+                  bench_prioritized_replay, bench_target_network)
+from .maps import bench_map_cache, bench_policy_eval
+from .tabular import (bench_early_stopping, bench_linear_features, bench_q_lambda, bench_sparse_q,
+                      bench_tabular_jit)
+from .tooling import (bench_metrics_overhead, bench_policy_export, bench_profiling_overhead, bench_rollout,
+                      bench_run_cache, bench_throughput)
+
+BENCHMARKS = {
+    "throughput": bench_throughput,
+    "prioritized-replay": bench_prioritized_replay,
+    "index-states": bench_index_states,
+    "dqn-backends": bench_dqn_backends,
+    "target-network": bench_target_network,
+    "metrics-overhead": bench_metrics_overhead,
+    "tabular-jit": bench_tabular_jit,
+    "sparse-q": bench_sparse_q,
+    "linear-features": bench_linear_features,
+    "map-cache": bench_map_cache,
+    "policy-eval": bench_policy_eval,
+    "actor-learner": bench_actor_learner,
+    "rollout": bench_rollout,
+    "early-stopping": bench_early_stopping,
+    "q-lambda": bench_q_lambda,
+    "dqn-targets": bench_dqn_targets,
+    "profiling-overhead": bench_profiling_overhead,
+    "run-cache": bench_run_cache,
+    "policy-export": bench_policy_export,
+}
+
+
+def format_rows(rows):
+    """Render result rows as a plain-text table."""
+    columns = list(rows[0])
+
+    def cell(value):
+        if isinstance(value, float):
+            return f"{value:.0f}" if abs(value) >= 1e4 else f"{value:.4g}"
+        return "-" if value is None else str(value)
+
+    table = [columns] + [[cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    lines = ["  ".join(value.rjust(width) for value, width in zip(line, widths)) for line in table]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
@@ -0,0 +1,84 @@
+"""Shared settings and helpers of the benchmarks."""
+import time
+
+import gymnasium as gym
+import numpy as np
+
+from ..evaluation import evaluate_policy, greedy_policy
+from ..rollout import RolloutSource
+
+
+# Hyperparameters of the notebook's "Set Parameters" cell
+TABULAR_PARAMS = dict(max_steps=100, alpha=0.8, gamma=0.95,
+                      epsilon_init=1.0, epsilon_min=0.01, epsilon_decay=0.995)
+
+
+class StepCounter(gym.Wrapper):
+    """Counts the environment steps taken through it."""
+    def __init__(self, env):
+        super().__init__(env)
+        self.steps = 0
+
+    def step(self, action):
+        self.steps += 1
+        return self.env.step(action)
+
+
+class CountingSource(RolloutSource):
+    """Counts the transitions a rollout source yields to its consumer."""
+    def __init__(self, source):
+        self.source = source
+        self.num_envs = source.num_envs
+        self.steps_taken = 0
+
+    def transitions(self, policy, num_episodes, max_steps):
+        for transition in self.source.transitions(policy, num_episodes, max_steps):
+            self.steps_taken += 1
+            yield transition
+
+    def steps(self, policy, num_episodes, max_steps):
+        for batch in self.source.steps(policy, num_episodes, max_steps):
+            self.steps_taken += len(batch.state)
+            yield batch
+
+
+def episodes_to_success(rewards, target=0.5, window=100):
+    """First episode at which the rolling mean reward reaches `target`, or None."""
+    if len(rewards) < window:
+        return None
+    rolling = np.convolve(rewards, np.ones(window)/window, mode='valid')
+    hits = np.nonzero(rolling >= target)[0]
+    return int(hits[0]) + window if len(hits) else None
+
+
+def _tabular_args(num_episodes, params=TABULAR_PARAMS):
+    return (num_episodes, params["max_steps"], params["alpha"], params["gamma"],
+            params["epsilon_init"], params["epsilon_min"], params["epsilon_decay"])
+
+
+class SolvedMonitor:
+    """
+    Stands in for a ConvergenceMonitor: every `every` episodes it evaluates the
+    greedy policy of Q on `env`'s map and stops training once its success rate
+    reaches `target`. Its own time is kept in `seconds`, to be left out of timings.
+    """
+    def __init__(self, env, target, max_steps, every=250, num_episodes=1000, seed=0):
+        self.env = env
+        self.target = target
+        self.max_steps = max_steps
+        self.every = every
+        self.num_episodes = num_episodes
+        self.seed = seed
+        self.converged_episode = None
+        self.seconds = 0.0
+
+    def update(self, episode, reward, model, state_size=None):
+        if episode % self.every:
+            return False
+        start = time.perf_counter()
+        success = evaluate_policy(greedy_policy(model, state_size), env=self.env, num_episodes=self.num_episodes,
+                                  max_steps=self.max_steps, seed=self.seed)["success_rate"]
+        self.seconds += time.perf_counter() - start
+        if success >= self.target:
+            self.converged_episode = episode
+        return self.converged_episode is not None
@@ -0,0 +1,251 @@
+"""Benchmarks of the DQN agent and its training options."""
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+
+from ..envs import make_env
+from .common import SolvedMonitor, StepCounter, episodes_to_success
+
+
+def bench_prioritized_replay(num_episodes=2000, target_success=0.5, seed=0):
+    """Wall-clock time and episodes to a target success rate, uniform vs. prioritized replay."""
+    from ..dqn import train_dqn_frozenlake
+
+    rows = []
+    for prioritized in (False, True):
+        start = time.perf_counter()
+        _, rewards = train_dqn_frozenlake(num_episodes=num_episodes, prioritized=prioritized, seed=seed)
+        rows.append({"replay": "prioritized" if prioritized else "uniform",
+                     "seconds": time.perf_counter() - start,
+                     "episodes_to_target": episodes_to_success(rewards, target_success)})
+    return rows
+
+
+def _agent_steps_per_sec(state_size, index_states, num_steps=2000, batch_size=32, replay_capacity=10000):
+    """Time the agent side of a DQN step on random transitions, without the environment."""
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+
+    from ..dqn import DQNetwork, one_hot_encode, select_action
+    from ..replay import IndexReplayBuffer, ReplayBuffer
+
+    action_size = 4
+    q_network = DQNetwork(state_size, action_size, embed=index_states)
+    optimizer = optim.Adam(q_network.parameters(), lr=1e-3)
+    loss_fn = nn.MSELoss()
+    replay_buffer = IndexReplayBuffer(replay_capacity) if index_states else ReplayBuffer(replay_capacity)
+    state_t = torch.zeros(1, dtype=torch.long)
+    visited = np.random.default_rng(0).integers(state_size, size=num_steps + 1)
+
+    start = time.perf_counter()
+    for step in range(num_steps):
+        state_idx, next_state_idx = visited[step], visited[step + 1]
+        if index_states:
+            state_t[0] = state_idx
+            action = select_action(q_network, state_t, 0.1, action_size)
+            replay_buffer.push(state_idx, action, 0.0, next_state_idx, False)
+        else:
+            state_oh = torch.tensor(one_hot_encode(state_idx, state_size), dtype=torch.float32).unsqueeze(0)
+            action = select_action(q_network, state_oh, 0.1, action_size)
+            replay_buffer.push(state_oh.squeeze(0).numpy(), action, 0.0, one_hot_encode(next_state_idx, state_size), False)
+        if len(replay_buffer) >= batch_size:
+            states, actions, rewards, next_states, dones = replay_buffer.sample(batch_size)
+            if index_states:
+                states_t, next_states_t = torch.as_tensor(states), torch.as_tensor(next_states)
+            else:
+                states_t = torch.tensor(np.array(states), dtype=torch.float32)
+                next_states_t = torch.tensor(np.array(next_states), dtype=torch.float32)
+            q_values_current = q_network(states_t).gather(1, torch.tensor(actions, dtype=torch.long).unsqueeze(1)).squeeze(1)
+            with torch.no_grad():
+                q_targets = torch.tensor(rewards, dtype=torch.float32) + 0.99 * q_network(next_states_t).max(1)[0]
+            loss = loss_fn(q_values_current, q_targets)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+    return num_steps / (time.perf_counter() - start)
+
+
+def bench_index_states(state_sizes=(16, 4096, 65536), replay_capacity=10000):
+    """
+    Replay memory of a full buffer and agent-side steps/sec, one-hot vs. index states.
+    One-hot training at more than 4,096 states would need gigabytes of replay memory,
+    so only its memory is reported there.
+    """
+    from ..replay import IndexReplayBuffer
+
+    rows = []
+    for state_size in state_sizes:
+        rows.append({
+            "states": state_size,
+            "one_hot_replay_mib": replay_capacity * 2 * state_size * np.dtype(np.float32).itemsize / 2**20,
+            "index_replay_mib": IndexReplayBuffer(replay_capacity).nbytes() / 2**20,
+            "one_hot_steps_per_sec": _agent_steps_per_sec(state_size, False) if state_size <= 4096 else None,
+            "index_steps_per_sec": _agent_steps_per_sec(state_size, True),
+        })
+    return rows
+
+
+def bench_dqn_backends(num_actions=20000, num_updates=2000, num_episodes=300, num_threads=1, batch_size=32, seed=0):
+    """
+    Actions/sec and updates/sec of the DQN network on CPU for each backend of
+    make_greedy_actor, with index and one-hot inputs, at a fixed thread count. Setup
+    (scripting or compiling and the first calls) is timed separately; the end-to-end
+    steps/sec of train_dqn_frozenlake include it. "numpy" only changes acting, so its
+    updates are those of "inference".
+    """
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+
+    from ..dqn import BACKENDS, DQNetwork, compile_network, make_greedy_actor, train_dqn_frozenlake
+
+    torch.set_num_threads(num_threads)
+    rng = np.random.default_rng(seed)
+    state_size, action_size = 16, 4
+    states = rng.integers(state_size, size=max(num_actions, num_updates * batch_size))
+    one_hot = np.eye(state_size, dtype=np.float32)
+    rows = []
+    for backend in BACKENDS:
+        for index_states in (True, False):
+            network = DQNetwork(state_size, action_size, embed=index_states)
+            optimizer = optim.Adam(network.parameters(), lr=1e-3)
+            loss_fn = nn.MSELoss()
+            batches = states[:num_updates * batch_size].reshape(num_updates, batch_size)
+            inputs = torch.as_tensor(batches if index_states else one_hot[batches])
+            actions = torch.as_tensor(rng.integers(action_size, size=(num_updates, batch_size)))
+            rewards = torch.zeros(num_updates, batch_size)
+
+            def update(i):
+                q_values = model(inputs[i]).gather(1, actions[i].unsqueeze(1)).squeeze(1)
+                with torch.no_grad():
+                    q_targets = rewards[i] + 0.99 * model(inputs[(i + 1) % num_updates]).max(1)[0]
+                loss = loss_fn(q_values, q_targets)
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+
+            if backend == "compile":
+                # Every network shares DQNetwork.forward, and with it torch.compile's recompile limit
+                torch._dynamo.reset()
+            start = time.perf_counter()
+            model = compile_network(network, "inference" if backend == "numpy" else backend)
+            act = make_greedy_actor(network, backend, model)
+            act(0)
+            update(0)
+            setup = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for state in states[:num_actions].tolist():
+                act(state)
+            actions_per_sec = num_actions / (time.perf_counter() - start)
+            start = time.perf_counter()
+            for i in range(num_updates):
+                update(i)
+            updates_per_sec = num_updates / (time.perf_counter() - start)
+
+            env = StepCounter(make_env(is_slippery=True))
+            if backend == "compile":
+                torch._dynamo.reset()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                train_dqn_frozenlake(env=env, num_episodes=num_episodes, index_states=index_states, seed=seed,
+                                     backend=backend, num_threads=num_threads)
+            rows.append({"backend": backend, "states": "index" if index_states else "one-hot",
+                         "threads": num_threads, "setup_seconds": setup, "actions_per_sec": actions_per_sec,
+                         "updates_per_sec": updates_per_sec,
+                         "train_steps_per_sec": env.steps / (time.perf_counter() - start)})
+    return rows
+
+
+def bench_target_network(num_episodes=2000, target_success=0.5, seed=0):
+    """
+    Wall-clock time to a target success rate: train_dqn_frozenlake vs. the vectorized
+    engine with a hard-synced or Polyak-averaged target network. The time to target
+    is pro-rated from the total.
+    """
+    from ..dqn import train_dqn_frozenlake, train_dqn_vectorized
+
+    runs = {
+        "train_dqn_frozenlake": lambda: train_dqn_frozenlake(num_episodes=num_episodes, seed=seed),
+        "vectorized, hard target": lambda: train_dqn_vectorized(num_episodes=num_episodes, target_update="hard",
+                                                                seed=seed),
+        "vectorized, polyak target": lambda: train_dqn_vectorized(num_episodes=num_episodes, target_update="polyak",
+                                                                  seed=seed),
+    }
+    rows = []
+    for label, run in runs.items():
+        start = time.perf_counter()
+        _, rewards = run()
+        elapsed = time.perf_counter() - start
+        reached = episodes_to_success(rewards, target_success)
+        rows.append({"trainer": label, "seconds": elapsed, "episodes_to_target": reached,
+                     "seconds_to_target": elapsed * reached / len(rewards) if reached else None})
+    return rows
+
+
+def bench_actor_learner(actor_counts=(1, 2, 4), num_episodes=1000, seed=0):
+    """
+    Transitions/sec and learner updates/sec of train_dqn_actor_learner with a growing
+    number of actor processes, against the single-process train_dqn_frozenlake with
+    index states, on the slippery 4x4 map. Actors only add throughput while there
+    are idle cores for them, so cpu_count is reported alongside.
+    """
+    from ..actor_learner import train_dqn_actor_learner
+    from ..dqn import train_dqn_frozenlake
+
+    env = StepCounter(make_env(is_slippery=True))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        train_dqn_frozenlake(env=env, num_episodes=num_episodes, index_states=True, seed=seed)
+    elapsed = time.perf_counter() - start
+    # The single-process trainer makes one update per step once the buffer holds a batch
+    rows = [{"trainer": "single process", "cpu_count": os.cpu_count(), "transitions_per_sec": env.steps / elapsed,
+             "updates_per_sec": (env.steps - 31) / elapsed, "mean_reward": None}]
+    for num_actors in actor_counts:
+        _, rewards, stats = train_dqn_actor_learner(num_actors=num_actors, num_episodes=num_episodes, seed=seed)
+        rows.append({"trainer": f"{num_actors} actor(s) + learner", "cpu_count": os.cpu_count(),
+                     "transitions_per_sec": stats["transitions_per_sec"],
+                     "updates_per_sec": stats["updates_per_sec"], "mean_reward": float(np.mean(rewards))})
+    return rows
+
+
+def bench_dqn_targets(seeds=(0, 1, 2), target_success=0.7, n_step=3, target_sync_every=250, eval_every=100):
+    """
+    Sample efficiency and wall-clock time of train_dqn_frozenlake (index states) to
+    a greedy-policy success rate of `target_success` on the slippery 4x4 and 8x8
+    maps: one-step targets from the online network vs. Double DQN with a target
+    network, `n_step` returns, and both. Episodes and environment steps to the
+    target are means over `seeds`, with unsolved runs counted at their full budget;
+    seconds leave out the periodic greedy evaluations.
+    """
+    from ..dqn import train_dqn_frozenlake
+
+    # map: (max_steps, episode budget, epsilon_decay)
+    settings = {"4x4": (100, 2000, 0.995), "8x8": (200, 3000, 0.998)}
+    configs = {"dqn": {}, "double": dict(double=True, target_sync_every=target_sync_every),
+               f"{n_step}-step": dict(n_step=n_step),
+               f"double + {n_step}-step": dict(double=True, target_sync_every=target_sync_every, n_step=n_step)}
+    rows = []
+    for map_name, (max_steps, num_episodes, epsilon_decay) in settings.items():
+        for config, kwargs in configs.items():
+            episodes, steps, seconds, solved = [], [], [], 0
+            for seed in seeds:
+                env = StepCounter(make_env(map_name=map_name, is_slippery=True))
+                monitor = SolvedMonitor(make_env(map_name=map_name, is_slippery=True), target_success, max_steps,
+                                        every=eval_every)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    train_dqn_frozenlake(env=env, num_episodes=num_episodes, max_steps=max_steps, index_states=True,
+                                         epsilon_decay=epsilon_decay, seed=seed, convergence=monitor, **kwargs)
+                seconds.append(time.perf_counter() - start - monitor.seconds)
+                episodes.append(monitor.converged_episode or num_episodes)
+                steps.append(env.steps)
+                solved += monitor.converged_episode is not None
+            rows.append({"map": f"{map_name} slippery", "targets": config, "solved": f"{solved}/{len(seeds)}",
+                         "mean_episodes": float(np.mean(episodes)), "mean_env_steps": float(np.mean(steps)),
+                         "mean_seconds": float(np.mean(seconds))})
+    return rows
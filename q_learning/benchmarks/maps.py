@@ -0,0 +1,92 @@
+"""Benchmarks of map generation, caching and policy evaluation."""
+import time
+
+import numpy as np
+
+from ..envs import TransitionTable, make_env
+from ..maps import DEFAULT_CACHE_DIR, MapCache, generate_map
+
+
+def bench_map_cache(sizes=(256, 1024, 2048), hole_density=0.2, seed=0, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Time to generate a map and build its slippery transition table from scratch,
+    against loading both from a MapCache once stored there.
+    """
+    cache = MapCache(cache_dir)
+    rows = []
+    for size in sizes:
+        start = time.perf_counter()
+        desc = generate_map(size, hole_density, seed)
+        generate_time = time.perf_counter() - start
+        start = time.perf_counter()
+        table = TransitionTable.from_desc(desc, is_slippery=True)
+        build_time = time.perf_counter() - start
+        del table
+
+        # Fill the cache outside the timed region, then time a load that touches every page
+        cache.load_table(size, hole_density, seed, is_slippery=True)
+        start = time.perf_counter()
+        cache.load_map(size, hole_density, seed)
+        table = cache.load_table(size, hole_density, seed, is_slippery=True)
+        open_time = time.perf_counter() - start
+        for name in MapCache.TABLE_FIELDS:
+            np.asarray(getattr(table, name)).sum()
+        read_time = time.perf_counter() - start
+        rows.append({"map": f"{size}x{size}", "generate_s": generate_time, "build_table_s": build_time,
+                     "cached_open_s": open_time, "cached_read_all_s": read_time})
+    return rows
+
+
+def bench_policy_eval(sizes=(8, 256, 1000), num_episodes=10000, hole_density=0.2, loop_max_size=256,
+                      loop_episodes=100, seed=0, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Greedy policy extraction plus arrow-grid rendering, and rollout evaluation, done
+    state by state and episode by episode through the env as before, against the
+    vectorized greedy_policy/policy_grid/evaluate_policy. Each map gets the Q-table of
+    its shortest-path policy, so deterministic rollouts walk the full path to G.
+    The per-state loops only run on maps up to `loop_max_size`.
+    """
+    from ..evaluation import evaluate_policy, greedy_policy, policy_grid, shortest_path_policy
+
+    cache = MapCache(cache_dir)
+    rows = []
+    for size in sizes:
+        desc = cache.load_map(size, hole_density, seed)
+        Q = np.eye(4)[shortest_path_policy(desc)]
+        max_steps = 4 * size
+        row = {"map": f"{size}x{size}", "loop_policy_s": None, "policy_s": None,
+               "loop_rollouts_per_sec": None}
+
+        if size <= loop_max_size:
+            start = time.perf_counter()
+            grid = np.asarray(desc, dtype="c").astype("U1")
+            for state in range(size * size):
+                if grid.flat[state] == "F":
+                    grid.flat[state] = "<v>^"[np.argmax(Q[state])]
+            row["loop_policy_s"] = time.perf_counter() - start
+
+            env = make_env(desc=desc, lazy=True, seed=seed)
+            start = time.perf_counter()
+            for _ in range(loop_episodes):
+                state, _ = env.reset()
+                for _ in range(max_steps):
+                    state, _, terminated, _, _ = env.step(int(np.argmax(Q[state])))
+                    if terminated:
+                        break
+            row["loop_rollouts_per_sec"] = loop_episodes / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        policy = greedy_policy(Q)
+        policy_grid(policy, desc)
+        row["policy_s"] = time.perf_counter() - start
+
+        for label, is_slippery in (("deterministic", False), ("slippery", True)):
+            start = time.perf_counter()
+            result = evaluate_policy(policy, desc, is_slippery, num_episodes=num_episodes, max_steps=max_steps,
+                                     seed=seed)
+            row[f"{label}_eval_s"] = time.perf_counter() - start
+            row[f"{label}_success"] = (f"{result['success_rate']:.3f} "
+                                       f"[{result['ci_low']:.3f}, {result['ci_high']:.3f}]")
+        row["rollouts_per_sec"] = num_episodes / row["deterministic_eval_s"]
+        rows.append(row)
+    return rows
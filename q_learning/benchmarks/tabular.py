@@ -0,0 +1,253 @@
+"""Benchmarks of the tabular, sparse, linear and Q(lambda) agents."""
+import contextlib
+import io
+import time
+import tracemalloc
+
+import numpy as np
+
+from ..convergence import ConvergenceMonitor
+from ..envs import TransitionTable, make_env
+from ..evaluation import evaluate_policy, greedy_policy
+from ..linear import train_linear_agent
+from ..maps import DEFAULT_CACHE_DIR, MapCache, generate_map
+from ..q_lambda import train_q_lambda
+from ..sparse import make_q_storage
+from ..tabular import train_q_table
+from .common import SolvedMonitor, StepCounter, TABULAR_PARAMS, _tabular_args
+
+
+def bench_tabular_jit(num_episodes=1000, large_sizes=(32, 64), seed=0, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Episodes/sec of train_q_table against the Numba-compiled train_q_table_jit on the
+    4x4 and 8x8 maps and on large cached generated maps (slippery). tests/test_tabular_jit.py
+    checks that both give the same results.
+    """
+    from ..tabular_jit import jit_available, train_q_table_jit
+
+    cache = MapCache(cache_dir)
+    maps = [("4x4", dict(map_name="4x4"), 100), ("8x8", dict(map_name="8x8"), 200)]
+    maps += [(f"{size}x{size}", dict(desc=cache.load_map(size, seed=seed)), 4 * size)
+             for size in large_sizes]
+    params = dict(TABULAR_PARAMS, alpha=0.1, gamma=0.99, epsilon_decay=0.999)
+
+    rows = []
+    for name, map_args, max_steps in maps:
+        env = make_env(is_slippery=True, **map_args)
+        args = _tabular_args(num_episodes, dict(params, max_steps=max_steps))
+        table = TransitionTable.from_env(env)
+
+        start = time.perf_counter()
+        train_q_table(env, *args, seed=seed)
+        python_rate = num_episodes / (time.perf_counter() - start)
+
+        row = {"map": name, "python_episodes_per_sec": python_rate, "jit_episodes_per_sec": None}
+        if jit_available():
+            # Compile outside the timed region
+            train_q_table_jit(env, *_tabular_args(1, params), table=table)
+            start = time.perf_counter()
+            train_q_table_jit(env, *args, seed=seed, table=table)
+            row["jit_episodes_per_sec"] = num_episodes / (time.perf_counter() - start)
+        rows.append(row)
+    return rows
+
+
+def _random_walk_transitions(size, num_episodes, max_steps, seed):
+    """
+    Transitions of uniformly random walks from the top-left corner of an open
+    size x size grid, as flat (states, actions, next_states) arrays. Stepping the
+    walks directly avoids building FrozenLake's transition dict, which alone takes
+    seconds and gigabytes at this size.
+    """
+    rng = np.random.default_rng(seed)
+    moves = np.array([[0, -1], [1, 0], [0, 1], [-1, 0]])  # left, down, right, up, as (row, col)
+    actions = rng.integers(0, 4, size=(num_episodes, max_steps))
+    positions = np.zeros((num_episodes, max_steps + 1, 2), dtype=np.int64)
+    for t in range(max_steps):
+        positions[:, t + 1] = np.clip(positions[:, t] + moves[actions[:, t]], 0, size - 1)
+    states = positions[..., 0] * size + positions[..., 1]
+    return states[:, :-1].ravel(), actions.ravel(), states[:, 1:].ravel()
+
+
+def bench_sparse_q(size=1000, num_episodes=100, max_steps=2000, max_states=2000, seed=0):
+    """
+    Memory and update throughput of the dense Q-table against SparseQTable, uncapped
+    and capped at `max_states` rows, on a size x size map. Each table replays the same
+    random-walk transitions through the greedy action lookup and Q-learning update
+    train_q_table performs per step. Memory is the peak traced allocation, measured
+    in a second, untimed replay since tracing slows every allocation down.
+    """
+    states, actions, next_states = _random_walk_transitions(size, num_episodes, max_steps, seed)
+    transitions = list(zip(states.tolist(), actions.tolist(), next_states.tolist()))
+    # A small step penalty, so the updates write non-zero values
+    alpha, gamma, reward = 0.1, 0.99, -0.01
+
+    def replay(q_storage, cap):
+        Q = make_q_storage(size * size, 4, q_storage, cap)
+        for state, action, next_state in transitions:
+            np.argmax(Q[state])
+            Q[state, action] += alpha * (reward + gamma * np.max(Q[next_state]) - Q[state, action])
+        return Q
+
+    rows = []
+    for label, q_storage, cap in [("dense", "dense", None), ("sparse", "sparse", None),
+                                  (f"sparse, cap {max_states}", "sparse", max_states)]:
+        start = time.perf_counter()
+        Q = replay(q_storage, cap)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        replay(q_storage, cap)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append({"storage": label, "updates_per_sec": len(transitions) / elapsed,
+                     "stored_states": len(Q), "evictions": getattr(Q, "evictions", 0),
+                     "peak_mb": peak / 2**20})
+    return rows
+
+
+def _greedy_success(agent, env, max_steps, num_episodes=20):
+    """Success rate of the greedy policy of a LinearQAgent."""
+    wins = 0
+    for _ in range(num_episodes):
+        state, _ = env.reset()
+        for _ in range(max_steps):
+            state, reward, terminated, truncated, _ = env.step(int(np.argmax(agent.predict(state))))
+            if terminated or truncated:
+                wins += reward
+                break
+    return wins / num_episodes
+
+
+def bench_linear_features(sizes=(5, 6), large_sizes=(1024, 4096), num_episodes=3000,
+                          large_episodes=20, batch_size=16, seed=1, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    One-hot (tabular) LinearQAgent against the GridFeatures approximator, on cached
+    generated maps with 10% holes. On maps small enough for random exploration to find
+    the goal, both are trained to compare success rates. On the large maps only the
+    feature agent is trained, on a GridLakeEnv, to show it runs with weights whose size
+    does not depend on the map where a dense table would not fit comfortably; random
+    exploration does not reach the far corner of those maps, so no success is
+    expected there.
+    """
+    from ..features import GridFeatures
+
+    cache = MapCache(cache_dir)
+    params = dict(gamma=0.95, epsilon=1.0, epsilon_min=0.01, epsilon_decay=0.999)
+    rows = []
+    for size in (*sizes, *large_sizes):
+        large = size in large_sizes
+        desc = cache.load_map(size, hole_density=0.1, seed=seed)
+        max_steps = 4 * size if large else 100
+        agents = [("features", GridFeatures(desc, GridFeatures.KINDS), 0.05)]
+        if not large:
+            agents.append(("one-hot", None, 0.8))
+        for label, features, alpha in agents:
+            env = StepCounter(make_env(desc=desc, lazy=True))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent, rewards = train_linear_agent(
+                    env, large_episodes if large else num_episodes, max_steps, alpha, **params, seed=seed,
+                    features=features, batch_size=batch_size if features is not None else 1)
+            elapsed = time.perf_counter() - start
+            rows.append({"map": f"{size}x{size}", "agent": label, "weights_kb": agent.weights.nbytes / 1024,
+                         "dense_table_kb": size * size * env.action_space.n * 8 / 1024,
+                         "steps_per_sec": env.steps / elapsed, "train_success": float(np.mean(rewards[-100:])),
+                         "greedy_success": _greedy_success(agent, env, max_steps)})
+    return rows
+
+
+def bench_early_stopping(num_episodes=5000, seeds=(0, 1, 2, 3, 4), min_success=0.6):
+    """
+    Wall time of a sweep over seeds of the tabular and linear learners with the
+    notebook's final comparison settings, trained for the full `num_episodes` vs.
+    stopped by a ConvergenceMonitor: its defaults on the deterministic 4x4 map, and
+    policy stability with a `min_success` success rate on the slippery one, where Q
+    never settles under a constant step size. Each row gives the converged episode
+    and the greedy success rates of both runs; the last row totals the sweep.
+    """
+    params = dict(max_steps=100, alpha=0.1, gamma=0.99, epsilon=1.0, epsilon_min=0.01, epsilon_decay=0.999)
+    trainers = {
+        "tabular": lambda env, **kwargs: train_q_table(
+            env, num_episodes, params["max_steps"], params["alpha"], params["gamma"], params["epsilon"],
+            params["epsilon_min"], params["epsilon_decay"], **kwargs)[0],
+        "linear": lambda env, **kwargs: train_linear_agent(env, num_episodes, **params, **kwargs)[0],
+    }
+    rows = []
+    totals = {"fixed_seconds": 0.0, "early_seconds": 0.0}
+    for slippery in (False, True):
+        for learner, train in trainers.items():
+            for seed in seeds:
+                row = {"map": "4x4 slippery" if slippery else "4x4", "learner": learner, "seed": seed}
+                for mode in ("fixed", "early"):
+                    env = make_env(is_slippery=slippery)
+                    monitor = None
+                    if mode == "early":
+                        monitor = (ConvergenceMonitor(q_tol=None, min_success=min_success) if slippery
+                                   else ConvergenceMonitor())
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        model = train(env, seed=seed, convergence=monitor)
+                    row[f"{mode}_seconds"] = time.perf_counter() - start
+                    totals[f"{mode}_seconds"] += row[f"{mode}_seconds"]
+                    row[f"{mode}_success"] = evaluate_policy(greedy_policy(model), env=env, seed=seed)["success_rate"]
+                    if monitor is not None:
+                        row["converged_episode"] = monitor.converged_episode
+                row["speedup"] = row["fixed_seconds"] / row["early_seconds"]
+                rows.append(row)
+    rows.append({"map": "sweep", "learner": "total", "seed": None, **totals,
+                 "speedup": totals["fixed_seconds"] / totals["early_seconds"]})
+    return rows
+
+
+def bench_q_lambda(maps=(("8x8", None), (10, 0.05), (12, 0.05)), seeds=(0, 1, 2), num_episodes=10000,
+                   max_steps=300, lam=0.9, target_success=0.5, trace_sizes=(8, 64, 256), trace_episodes=300):
+    """
+    Episodes and wall-clock seconds until the greedy policy reaches `target_success`
+    on slippery maps, one-step Q-learning vs. Watkins's and Peng's Q(lambda), with
+    dense and sparse traces; maps are a built-in name or a (size, hole_density) pair
+    generated with seed 0. Unsolved runs count their full `num_episodes`. Then the
+    steps/sec of both trace kinds on `trace_sizes` maps, where a dense trace costs
+    a full-table operation per step.
+    """
+    params = (max_steps, 0.1, 0.99, 1.0, 0.01, 0.9997)
+    methods = {"one-step": lambda env, **kwargs: train_q_table(env, num_episodes, *params, **kwargs)}
+    for variant in ("watkins", "peng"):
+        for traces in ("dense", "sparse"):
+            methods[f"{variant} {traces}"] = (
+                lambda env, variant=variant, traces=traces, **kwargs: train_q_lambda(
+                    env, num_episodes, *params, lam=lam, variant=variant, traces=traces, **kwargs))
+
+    def make(name, hole_density):
+        if hole_density is None:
+            return f"{name} slippery", lambda: make_env(map_name=name, is_slippery=True)
+        desc = generate_map(name, hole_density, seed=0)
+        return (f"{name}x{name} {hole_density:g} holes slippery",
+                lambda: make_env(desc=desc, is_slippery=True, lazy=True))
+
+    rows = []
+    for name, hole_density in maps:
+        label, env_fn = make(name, hole_density)
+        for method, train in methods.items():
+            episodes, seconds, solved = [], [], 0
+            for seed in seeds:
+                monitor = SolvedMonitor(env_fn(), target_success, max_steps)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    train(env_fn(), seed=seed, convergence=monitor)
+                seconds.append(time.perf_counter() - start - monitor.seconds)
+                episodes.append(monitor.converged_episode or num_episodes)
+                solved += monitor.converged_episode is not None
+            rows.append({"map": label, "method": method, "solved": f"{solved}/{len(seeds)}",
+                         "mean_episodes_to_solve": float(np.mean(episodes)), "mean_seconds": float(np.mean(seconds)),
+                         "steps_per_sec": None})
+    for size in trace_sizes:
+        desc = generate_map(size, 0.05, seed=0)
+        for traces in ("dense", "sparse"):
+            env = StepCounter(make_env(desc=desc, is_slippery=True, lazy=True))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                train_q_lambda(env, trace_episodes, *params, lam=lam, traces=traces, seed=0)
+            rows.append({"map": f"{size}x{size} 0.05 holes slippery", "method": f"watkins {traces}",
+                         "solved": None, "mean_episodes_to_solve": None, "mean_seconds": None,
+                         "steps_per_sec": env.steps / (time.perf_counter() - start)})
+    return rows
@@ -0,0 +1,311 @@
+"""Benchmarks of the rollout sources, metrics, profiling, run cache and policy export."""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ..envs import TransitionTable, make_env
+from ..linear import train_linear_agent
+from ..maps import generate_map
+from ..metrics import MetricsLogger, read_metrics
+from ..rng import derive_seeds
+from ..rollout import EnvSource, PrefetchSource, TableSource, VectorEnvSource
+from ..run_cache import RunCache
+from ..tabular import train_q_table
+from .common import CountingSource, StepCounter, _tabular_args
+
+
+def bench_throughput(num_episodes=500, seed=0):
+    """Environment steps per second of each trainer on the 4x4 map."""
+    from ..dqn import train_dqn_frozenlake, train_dqn_vectorized
+
+    def tabular(env):
+        train_q_table(env, *_tabular_args(num_episodes), seed=seed)
+
+    def linear(env):
+        train_linear_agent(env, *_tabular_args(num_episodes), seed=seed)
+
+    def dqn(env):
+        train_dqn_frozenlake(env=env, num_episodes=num_episodes, seed=seed)
+
+    rows = []
+    for name, run in [("tabular", tabular), ("linear", linear), ("dqn", dqn)]:
+        env = StepCounter(make_env(is_slippery=name == "dqn"))
+        start = time.perf_counter()
+        run(env)
+        elapsed = time.perf_counter() - start
+        rows.append({"trainer": name, "episodes": num_episodes, "steps": env.steps,
+                     "seconds": elapsed, "steps_per_sec": env.steps / elapsed})
+
+    counters = []
+
+    def counted_env():
+        counters.append(StepCounter(make_env(is_slippery=True)))
+        return counters[-1]
+    start = time.perf_counter()
+    train_dqn_vectorized(env_fn=counted_env, num_episodes=num_episodes, seed=seed)
+    elapsed = time.perf_counter() - start
+    steps = sum(counter.steps for counter in counters)
+    rows.append({"trainer": "dqn-vectorized", "episodes": num_episodes, "steps": steps,
+                 "seconds": elapsed, "steps_per_sec": steps / elapsed})
+    return rows
+
+
+def bench_metrics_overhead(num_episodes=2000, num_calls=100_000, repeats=3, bound=0.01):
+    """
+    Cost of one MetricsLogger.log call, including its periodic flushes, relative to a
+    training episode of the cheapest trainer (tabular, deterministic 4x4 map), and
+    whether it stays within `bound` of it; plus the end-to-end difference between
+    runs with and without `metrics_dir`.
+    """
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        logger = MetricsLogger(metrics_dir)
+        start = time.perf_counter()
+        for i in range(num_calls):
+            logger.log(i + 1, 0.0, 0.5, steps_per_sec=1000.0)
+        logger.close()
+        log_cost = (time.perf_counter() - start) / num_calls
+
+    def best_time(metrics_dir):
+        times = []
+        for _ in range(repeats):
+            env = make_env()
+            # Same seed for every run, so both variants play identical episodes
+            start = time.perf_counter()
+            train_q_table(env, *_tabular_args(num_episodes), seed=0, metrics_dir=metrics_dir)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        untracked = best_time(None)
+        tracked = best_time(metrics_dir)
+        steps_per_sec = read_metrics(metrics_dir, columns=["steps_per_sec"])["steps_per_sec"]
+
+    episode_time = untracked / num_episodes
+    return [{"log_us": log_cost * 1e6, "episode_us": episode_time * 1e6,
+             "log_share_of_episode": log_cost / episode_time, "within_bound": log_cost / episode_time < bound,
+             "median_steps_per_sec": float(np.median(steps_per_sec)),
+             "seconds_without_metrics": untracked, "seconds_with_metrics": tracked}]
+
+
+def bench_rollout(num_episodes=500, vector_envs=8, table_envs=64, seed=0):
+    """
+    End-to-end steps/sec of the tabular, linear and DQN learners consuming each kind
+    of rollout source on the slippery 4x4 map: a gymnasium environment, a lazy
+    GridLakeEnv, several environments in lockstep, the NumPy TableSource and a
+    prefetched gymnasium environment. The DQN learner over batched sources is
+    train_dqn_vectorized, which acts on a whole step's states at once and makes one
+    update per step rather than per transition, so its rate grows with the batch.
+    """
+    from ..dqn import train_dqn_frozenlake, train_dqn_vectorized
+
+    def train_dqn(source):
+        if source.num_envs == 1:
+            return train_dqn_frozenlake(num_episodes=num_episodes, index_states=True, seed=seed, source=source)
+        return train_dqn_vectorized(num_episodes=num_episodes, seed=seed, num_envs=1, source=source)
+
+    table = TransitionTable.from_env(make_env(is_slippery=True))
+    sources = {
+        "gymnasium": lambda: EnvSource(make_env(is_slippery=True, seed=seed)),
+        "lazy GridLakeEnv": lambda: EnvSource(make_env(is_slippery=True, seed=seed, lazy=True)),
+        f"{vector_envs} envs in lockstep": lambda: VectorEnvSource(
+            make_env(is_slippery=True, seed=env_seed) for env_seed in derive_seeds(seed, vector_envs)),
+        f"TableSource x{table_envs}": lambda: TableSource(table, num_envs=table_envs, seed=seed),
+        "prefetched gymnasium": lambda: PrefetchSource(EnvSource(make_env(is_slippery=True, seed=seed))),
+    }
+    learners = {
+        "tabular": lambda source: train_q_table(make_env(is_slippery=True), *_tabular_args(num_episodes),
+                                                seed=seed, source=source),
+        "linear": lambda source: train_linear_agent(make_env(is_slippery=True), *_tabular_args(num_episodes),
+                                                    seed=seed, source=source),
+        "dqn": train_dqn,
+    }
+    rows = []
+    for learner, train in learners.items():
+        for name, make_source in sources.items():
+            source = CountingSource(make_source())
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                train(source)
+            rows.append({"learner": learner, "source": name,
+                         "steps_per_sec": source.steps_taken / (time.perf_counter() - start)})
+    return rows
+
+
+def bench_profiling_overhead(tabular_episodes=3000, dqn_episodes=200, repeats=3, seed=0):
+    """
+    Wall time of train_q_table and train_dqn_frozenlake on the slippery 4x4 map with
+    profiling off (profiler=None, the trainers' default) and with a PhaseProfiler,
+    with and without stack sampling; the best of `repeats` runs each.
+    """
+    from ..dqn import train_dqn_frozenlake
+    from ..profiling import PhaseProfiler
+
+    trainers = {
+        "tabular": lambda profiler: train_q_table(make_env(is_slippery=True), *_tabular_args(tabular_episodes),
+                                                  seed=seed, profiler=profiler),
+        "dqn": lambda profiler: train_dqn_frozenlake(env=make_env(is_slippery=True), num_episodes=dqn_episodes,
+                                                     seed=seed, profiler=profiler),
+    }
+    modes = {"off": lambda: None, "phases": lambda: PhaseProfiler(),
+             "phases + sampling": lambda: PhaseProfiler(sample_interval=0.005)}
+    rows = []
+    for trainer, train in trainers.items():
+        best = {}
+        for mode, make_profiler in modes.items():
+            times = []
+            for _ in range(repeats):
+                profiler = make_profiler()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    train(profiler)
+                times.append(time.perf_counter() - start)
+            best[mode] = min(times)
+            rows.append({"trainer": trainer, "profiling": mode, "seconds": best[mode],
+                         "overhead_percent": 100 * (best[mode] / best["off"] - 1)})
+    return rows
+
+
+def _cached_tabular_run(directory, num_episodes, seed):
+    """One sweep point of bench_run_cache, run in a worker process."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, rewards = RunCache(directory).run(train_q_table, make_env(is_slippery=True),
+                                             *_tabular_args(num_episodes), seed=seed)
+    return float(np.mean(rewards))
+
+
+def bench_run_cache(tabular_episodes=3000, dqn_episodes=200, sweep_seeds=(0, 1, 2, 3), workers=2, seed=0):
+    """
+    Wall time of a first (training) and a repeated (cached) RunCache.run of
+    train_q_table, train_linear_agent and train_dqn_frozenlake on the slippery 4x4
+    map. Then a tabular sweep over `sweep_seeds` in a pool of `workers` processes,
+    with every point submitted by each worker so writes of the same run race, cold
+    and repeated; and the number of runs left once the cache is capped at half its
+    size. tests/test_run_cache.py checks that cached results equal trained ones.
+    """
+    import multiprocessing
+
+    from ..dqn import train_dqn_frozenlake
+
+    trainers = {
+        "tabular": (train_q_table, (make_env(is_slippery=True), *_tabular_args(tabular_episodes)), {}),
+        "linear": (train_linear_agent, (make_env(is_slippery=True), *_tabular_args(tabular_episodes)), {}),
+        "dqn": (train_dqn_frozenlake, (), dict(env=make_env(is_slippery=True), num_episodes=dqn_episodes)),
+    }
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        cache = RunCache(directory)
+        for name, (trainer, args, kwargs) in trainers.items():
+            results = []
+            for _ in range(2):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results.append(cache.run(trainer, *args, seed=seed, **kwargs))
+                results[-1] += (time.perf_counter() - start,)
+            train_seconds, cached_seconds = results[0][-1], results[1][-1]
+            rows.append({"run": name, "first_seconds": train_seconds, "repeat_seconds": cached_seconds,
+                         "speedup": train_seconds / cached_seconds, "runs_stored": len(cache.entries()), "runs_after_halving": None})
+
+    with tempfile.TemporaryDirectory() as directory:
+        points = [(directory, tabular_episodes, point) for point in sweep_seeds for _ in range(workers)]
+        times = []
+        with multiprocessing.Pool(workers) as pool:
+            for _ in range(2):
+                start = time.perf_counter()
+                pool.starmap(_cached_tabular_run, points)
+                times.append(time.perf_counter() - start)
+        cache = RunCache(directory)
+        stored = len(cache.entries())
+        cache.max_bytes = cache.size() // 2
+        cache.evict()
+        rows.append({"run": f"sweep of {len(sweep_seeds)} x {workers} workers", "first_seconds": times[0],
+                     "repeat_seconds": times[1], "speedup": times[0] / times[1], "runs_stored": stored,
+                     "runs_after_halving": len(cache.entries())})
+    return rows
+
+
+def bench_policy_export(size=512, num_queries=2 ** 18, single_queries=20000, batch_size=4096, seed=0):
+    """
+    Queries/sec and bytes held of greedy-action lookups on a size x size map
+    against a random Q-table, a LinearQAgent with GridFeatures and an embedding
+    DQNetwork: calling the original object once per state and once per batch of
+    `batch_size` states, against their export_policy() exports queried in batches
+    in-process and through serve_policy() as JSON and as int32 / int8 bytes.
+    tests/test_export.py checks that every one of them answers like greedy_policy().
+    """
+    import http.client
+    import threading
+
+    import torch
+
+    from ..dqn import DQNetwork, batch_q_function, make_greedy_actor
+    from ..export import export_policy, serve_policy
+    from ..features import GridFeatures
+    from ..linear import LinearQAgent
+
+    rng = np.random.default_rng(seed)
+    state_size = size * size
+    agent = LinearQAgent(state_size, 4, 0.1, 0.99, 0.0, 0.0, 1.0, features=GridFeatures(generate_map(size, 0.1, seed)),
+                         rng=rng)
+    agent.weights = rng.normal(size=agent.weights.shape)
+    torch.manual_seed(seed)
+    network = DQNetwork(state_size, 4, embed=True)
+    models = {
+        "Q-table": (rng.normal(size=(state_size, 4)), lambda Q: lambda state: int(np.argmax(Q[state])),
+                    lambda Q: lambda states: Q[states].argmax(1)),
+        "linear (GridFeatures)": (agent, lambda agent: agent.act,
+                                  lambda agent: lambda states: agent.predict_batch(states).argmax(1)),
+        "DQNetwork (embed)": (network, make_greedy_actor,
+                              lambda network: lambda states: batch_q_function(network)(states).argmax(1)),
+    }
+    queries = rng.integers(state_size, size=num_queries)
+    batches = np.split(queries, range(batch_size, num_queries, batch_size))
+
+    def throughput(lookup, inputs, count):
+        start = time.perf_counter()
+        for item in inputs:
+            lookup(item)
+        return count / (time.perf_counter() - start)
+
+    rows = []
+    for name, (model, per_state, batched) in models.items():
+        if name.startswith("DQN"):
+            model_bytes = sum(p.numel() * p.element_size() for p in network.parameters())
+        else:
+            model_bytes = getattr(model, "weights", model).nbytes
+        rows.append({"model": name, "method": "object, per state", "bytes": model_bytes,
+                     "queries_per_sec": throughput(per_state(model), queries[:single_queries], single_queries),
+                     "export_seconds": None})
+        rows.append({"model": name, "method": "object, batched", "bytes": model_bytes,
+                     "queries_per_sec": throughput(batched(model), batches, num_queries), "export_seconds": None})
+        with tempfile.TemporaryDirectory() as directory:
+            for q_values in (None, "uint8"):
+                start = time.perf_counter()
+                policy = export_policy(model, os.path.join(directory, "policy"), state_size, q_values=q_values)
+                export_seconds = time.perf_counter() - start
+                rows.append({"model": name, "method": "export, uint8 Q" if q_values else "export",
+                             "bytes": policy.nbytes, "queries_per_sec": throughput(policy.act, batches, num_queries),
+                             "export_seconds": export_seconds})
+
+            server = serve_policy(policy, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            connection = http.client.HTTPConnection(*server.server_address)
+            for encoding in ("JSON", "binary"):
+                def query(batch):
+                    if encoding == "JSON":
+                        connection.request("POST", "/act", json.dumps({"states": batch.tolist()}),
+                                           {"Content-Type": "application/json"})
+                        return np.array(json.loads(connection.getresponse().read())["actions"])
+                    connection.request("POST", "/act", batch.astype("<i4").tobytes(),
+                                       {"Content-Type": "application/octet-stream"})
+                    return np.frombuffer(connection.getresponse().read(), dtype=np.int8)
+                rows.append({"model": name, "method": f"HTTP {encoding}", "bytes": policy.nbytes,
+                             "queries_per_sec": throughput(query, batches, num_queries), "export_seconds": None})
+            connection.close()
+            server.shutdown()
+            server.server_close()
+    return rows
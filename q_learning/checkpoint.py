@@ -0,0 +1,91 @@
+"""Asynchronous, resumable training checkpoints."""
+import copy
+import os
+import pickle
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+# Placeholder left in the pickled state for an array stored in its own .npy file
+_ARRAY_REF = "__checkpoint_array__"
+
+
+class Checkpointer:
+    """
+    Periodic, asynchronous training checkpoints kept in `directory`.
+
+    Each checkpoint is a folder named after its episode. Every NumPy array in the
+    (possibly nested) state dict is written to its own .npy file and everything else
+    (epsilon, RNG states, optimizer state, ...) is pickled. save() snapshots the state
+    and returns immediately while a background thread writes it; a folder only gets
+    its final name once complete, so a crash mid-write never leaves a corrupt
+    checkpoint. load_latest() opens the arrays as read-only memory maps, so large
+    Q-tables and replay buffers are paged in only as they are copied back.
+    """
+    def __init__(self, directory, keep=2):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    def save(self, episode, state):
+        # At most one write in flight; the snapshot is taken on the training thread
+        self.wait()
+        arrays = {}
+        meta = copy.deepcopy(self._split_arrays(state, "", arrays))
+        self._pending = self._executor.submit(self._write, episode, arrays, meta)
+
+    def wait(self):
+        """Block until the last checkpoint is on disk, re-raising any write error."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def load_latest(self):
+        """Return the most recent state dict, or None if there is no checkpoint yet."""
+        self.wait()
+        names = self._checkpoints()
+        if not names:
+            return None
+        path = os.path.join(self.directory, names[-1])
+        with open(os.path.join(path, "state.pkl"), "rb") as f:
+            meta = pickle.load(f)
+        return self._join_arrays(meta, path)
+
+    def _checkpoints(self):
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith("episode-") and not name.endswith(".tmp"))
+
+    def _write(self, episode, arrays, meta):
+        final = os.path.join(self.directory, f"episode-{episode:09d}")
+        tmp = final + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), array)
+        with open(os.path.join(tmp, "state.pkl"), "wb") as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+        for old in self._checkpoints()[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, old))
+
+    def _split_arrays(self, obj, name, arrays):
+        if isinstance(obj, np.ndarray):
+            arrays[name] = np.array(obj, copy=True)
+            return (_ARRAY_REF, name)
+        if isinstance(obj, dict):
+            return {key: self._split_arrays(value, f"{name}.{key}" if name else str(key), arrays)
+                    for key, value in obj.items()}
+        return obj
+
+    def _join_arrays(self, obj, path):
+        if isinstance(obj, tuple) and len(obj) == 2 and obj[0] == _ARRAY_REF:
+            return np.load(os.path.join(path, obj[1] + ".npy"), mmap_mode="r")
+        if isinstance(obj, dict):
+            return {key: self._join_arrays(value, path) for key, value in obj.items()}
+        return obj
+
@@ -0,0 +1,264 @@
+"""
+Command-line entry point for headless training and benchmark runs.
+
+    python -m q_learning train tabular --episodes 5000 --alpha 0.1 --gamma 0.99 --out q_table.npz
+    python -m q_learning train linear --episodes 5000 --early-stop
+    python -m q_learning train dqn --map 8x8 --slippery --seed 0 --checkpoint-dir runs/dqn
+    python -m q_learning train dqn --double --target-sync 250 --n-step 3
+    python -m q_learning train tabular --seed 0 --cache
+    python -m q_learning train tabular --export policies/tabular --export-q uint8
+    python -m q_learning serve policies/tabular --port 8000
+    python -m q_learning train dqn --episodes 500 --profile runs/profile --profile-sample-ms 5
+    python -m q_learning train dqn-actor-learner --actors 4 --episodes 5000
+    python -m q_learning train q-lambda --map 8x8 --slippery --variant peng --traces sparse --episodes 10000
+    python -m q_learning train tabular-jit --generate 512 --hole-density 0.1 --episodes 20000
+    python -m q_learning bench throughput --json results.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from .benchmarks import BENCHMARKS, format_rows
+from .benchmarks.common import TABULAR_PARAMS
+from .convergence import ConvergenceMonitor
+from .envs import make_env
+from .maps import MapCache
+from .profiling import PhaseProfiler
+from .run_cache import DEFAULT_RUN_CACHE_DIR, RunCache
+from .sparse import SparseQTable
+
+TRAINERS = ("tabular", "tabular-jit", "q-lambda", "linear", "dqn", "dqn-vectorized", "dqn-actor-learner")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m q_learning", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="train an agent on FrozenLake")
+    train.add_argument("trainer", choices=TRAINERS)
+    train.add_argument("--episodes", type=int, default=2000)
+    train.add_argument("--max-steps", type=int, default=100)
+    train.add_argument("--map", default="4x4", help="built-in FrozenLake map name (default: 4x4)")
+    train.add_argument("--generate", type=int, metavar="SIZE",
+                       help="train on a cached generated SIZE x SIZE map instead of --map")
+    train.add_argument("--hole-density", type=float, default=0.2, help="hole density of --generate (default: 0.2)")
+    train.add_argument("--map-seed", type=int, default=0, help="seed of the --generate map (default: 0)")
+    train.add_argument("--slippery", action="store_true", help="use slippery ice (the DQN trainers always do)")
+    train.add_argument("--seed", type=int)
+    train.add_argument("--alpha", type=float, help="learning rate of the tabular and linear agents")
+    train.add_argument("--lr", type=float, help="learning rate of the DQN agents")
+    train.add_argument("--gamma", type=float)
+    train.add_argument("--epsilon-decay", type=float)
+    train.add_argument("--q-storage", choices=("dense", "sparse"), default="dense",
+                       help="Q-table storage of the tabular and linear agents (default: dense)")
+    train.add_argument("--max-states", type=int, help="row cap of --q-storage sparse, evicting cold states")
+    train.add_argument("--lam", type=float, default=0.9, help="trace decay lambda of q-lambda (default: 0.9)")
+    train.add_argument("--variant", choices=("watkins", "peng"), default="watkins",
+                       help="Q(lambda) variant of q-lambda (default: watkins)")
+    train.add_argument("--traces", choices=("dense", "sparse"), default="dense",
+                       help="eligibility trace storage of q-lambda (default: dense)")
+    train.add_argument("--early-stop", action="store_true",
+                       help="stop the tabular and linear agents once they converge (see ConvergenceMonitor)")
+    train.add_argument("--q-tol", type=float, default=1e-3,
+                       help="largest Q change per 100-episode window of --early-stop, 0 to skip (default: 1e-3)")
+    train.add_argument("--min-success", type=float, help="window success rate --early-stop also requires")
+    train.add_argument("--actors", type=int, default=4, help="actor processes of dqn-actor-learner (default: 4)")
+    train.add_argument("--backend", choices=("eager", "inference", "script", "compile", "numpy"), default="inference",
+                       help="how the dqn trainer runs its network on CPU (default: inference)")
+    train.add_argument("--threads", type=int, help="torch thread count of the dqn trainer")
+    train.add_argument("--n-step", type=int, default=1, help="n-step returns of the dqn trainer (default: 1)")
+    train.add_argument("--target-sync", type=int, metavar="UPDATES",
+                       help="give the dqn trainer a target network synced every UPDATES updates")
+    train.add_argument("--double", action="store_true",
+                       help="Double DQN targets in the dqn trainer (needs --target-sync)")
+    train.add_argument("--profile", metavar="DIR",
+                       help="time the phases of the tabular, q-lambda, linear or dqn loop and write profiles to DIR")
+    train.add_argument("--profile-window", type=int, default=100,
+                       help="episodes per profile window (default: 100)")
+    train.add_argument("--profile-sample-ms", type=float,
+                       help="also sample the Python stack every this many milliseconds")
+    train.add_argument("--cache", nargs="?", const=DEFAULT_RUN_CACHE_DIR, metavar="DIR",
+                       help="return a stored run of the same configuration if there is one (needs --seed)")
+    train.add_argument("--checkpoint-dir")
+    train.add_argument("--metrics-dir")
+    train.add_argument("--out", help="write the learned table/weights (.npz) or network (.pt) here")
+    train.add_argument("--export", metavar="DIR", help="export the greedy policy as int8 actions here (see export)")
+    train.add_argument("--export-q", choices=("uint8", "float16"), help="also export the Q-values, quantized")
+
+    serve = commands.add_parser("serve", help="answer greedy-action queries to an exported policy over HTTP")
+    serve.add_argument("policy", help="directory written by train --export")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+
+    bench = commands.add_parser("bench", help="run benchmarks and print their results; exits with status 1 "
+                                                 "if one reports a result outside its bound")
+    bench.add_argument("names", nargs="*", metavar="name",
+                       help=f"benchmarks to run, from: {', '.join(BENCHMARKS)} (default: all)")
+    bench.add_argument("--json", help="also write the results to this JSON file")
+    return parser
+
+
+def run_train(args):
+    is_dqn = args.trainer.startswith("dqn")
+    slippery = args.slippery or is_dqn
+    map_args = dict(map_name=args.map)
+    if args.generate:
+        # Generated maps can be large, so use the env that needs no transition dict
+        desc = MapCache().load_map(args.generate, args.hole_density, args.map_seed)
+        map_args = dict(desc=desc, lazy=True)
+    env = make_env(is_slippery=slippery, **map_args)
+    options = dict(seed=args.seed, checkpoint_dir=args.checkpoint_dir, metrics_dir=args.metrics_dir)
+    profiler = None
+    if args.profile and args.trainer in ("tabular", "q-lambda", "linear", "dqn"):
+        sample_interval = args.profile_sample_ms / 1000 if args.profile_sample_ms else None
+        profiler = PhaseProfiler(args.profile_window, sample_interval)
+        options["profiler"] = profiler
+
+    # With --cache, the tabular, q-lambda, linear and dqn trainers run through a RunCache
+    cache = RunCache(args.cache) if args.cache else None
+    run = cache.run if cache is not None else lambda trainer, *values, **kwargs: trainer(*values, **kwargs)
+
+    start = time.perf_counter()
+    if args.trainer in ("tabular", "tabular-jit", "q-lambda", "linear"):
+        params = dict(TABULAR_PARAMS, max_steps=args.max_steps)
+        for name in ("alpha", "gamma", "epsilon_decay"):
+            if getattr(args, name) is not None:
+                params[name] = getattr(args, name)
+        positional = (env, args.episodes, params["max_steps"], params["alpha"], params["gamma"],
+                      params["epsilon_init"], params["epsilon_min"], params["epsilon_decay"])
+        storage = dict(q_storage=args.q_storage, max_states=args.max_states)
+        monitor = None
+        if args.early_stop and args.trainer != "tabular-jit":
+            monitor = ConvergenceMonitor(q_tol=args.q_tol if args.q_tol > 0 else None, min_success=args.min_success)
+            options["convergence"] = monitor
+        if args.trainer == "tabular":
+            from .tabular import train_q_table
+            Q, rewards = run(train_q_table, *positional, **options, **storage)
+            model, arrays = Q, {"Q": Q}
+        elif args.trainer == "tabular-jit":
+            # The compiled loop does not checkpoint, stream metrics or stop early
+            from .tabular_jit import train_q_table_jit
+            table = None
+            if args.generate:
+                table = MapCache().load_table(args.generate, args.hole_density, args.map_seed, slippery)
+            Q, rewards = train_q_table_jit(*positional, seed=args.seed, table=table)
+            model, arrays = Q, {"Q": Q}
+        elif args.trainer == "q-lambda":
+            # Q(lambda) keeps a dense Q-table
+            from .q_lambda import train_q_lambda
+            Q, rewards = run(train_q_lambda, *positional, lam=args.lam, variant=args.variant, traces=args.traces,
+                             **options)
+            model, arrays = Q, {"Q": Q}
+        else:
+            from .linear import train_linear_agent
+            agent, rewards = run(train_linear_agent, *positional, **options, **storage)
+            model, arrays = agent, {"weights": agent.weights}
+        if monitor is not None:
+            report = monitor.report()
+            print(f"converged at episode {report['converged_episode']}" if report["converged_episode"]
+                  else f"not converged; last window: max Q change {report['max_q_change']:.3g}, "
+                       f"{report['policy_changes']} policy change(s), success rate {report['success_rate']:.2f}")
+    else:
+        from .dqn import train_dqn_frozenlake, train_dqn_vectorized
+        params = {name: getattr(args, name) for name in ("lr", "gamma", "epsilon_decay")
+                  if getattr(args, name) is not None}
+        if args.trainer == "dqn":
+            network, rewards = run(train_dqn_frozenlake, env=env, num_episodes=args.episodes,
+                                   max_steps=args.max_steps, backend=args.backend, num_threads=args.threads,
+                                   n_step=args.n_step, double=args.double, target_sync_every=args.target_sync,
+                                   **params, **options)
+        elif args.trainer == "dqn-vectorized":
+            # The vectorized engine does not checkpoint or stream metrics
+            network, rewards = train_dqn_vectorized(env_fn=lambda: make_env(is_slippery=slippery, **map_args),
+                                                    num_episodes=args.episodes, max_steps=args.max_steps,
+                                                    seed=args.seed, **params)
+        else:
+            from .actor_learner import train_dqn_actor_learner
+            network, rewards, stats = train_dqn_actor_learner(
+                env_kwargs=dict(is_slippery=slippery, **map_args), num_actors=args.actors,
+                num_episodes=args.episodes, max_steps=args.max_steps, seed=args.seed, **params)
+            print(f"{stats['transitions_per_sec']:.0f} transitions/s, {stats['updates_per_sec']:.0f} updates/s "
+                  f"with {args.actors} actor(s)")
+    elapsed = time.perf_counter() - start
+    if profiler is not None:
+        write_profile(profiler, args.profile)
+
+    if cache is not None and cache.hits:
+        print(f"loaded from the run cache in {cache.directory}")
+    print(f"{args.trainer}: {len(rewards)} episodes in {elapsed:.1f}s, "
+          f"mean reward over the last 100 episodes: {np.mean(rewards[-100:]):.3f}")
+    if args.out:
+        if is_dqn:
+            import torch
+            torch.save({"network": network.state_dict(), "rewards": rewards}, args.out)
+        else:
+            arrays = {name: array.to_dense() if isinstance(array, SparseQTable) else array
+                      for name, array in arrays.items()}
+            np.savez(args.out, rewards=np.array(rewards), **arrays)
+        print(f"saved to {args.out}")
+    if args.export:
+        from .export import export_policy
+        policy = export_policy(network if is_dqn else model, args.export, env.observation_space.n,
+                               q_values=args.export_q)
+        print(f"policy exported to {args.export} ({policy.nbytes} bytes)")
+
+
+def run_serve(args):
+    from .export import serve_policy
+    server = serve_policy(args.policy, args.host, args.port)
+    print(f"serving {args.policy} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def write_profile(profiler, directory):
+    """Print the phase table and write the folded stacks and per-window rows to `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    print(profiler.table())
+    profiler.write_folded(os.path.join(directory, "phases.folded"))
+    with open(os.path.join(directory, "windows.json"), "w") as f:
+        json.dump(profiler.window_rows(), f, indent=2)
+    if profiler.sampler is not None:
+        profiler.sampler.write_folded(os.path.join(directory, "samples.folded"))
+    print(f"profiles written to {directory}")
+
+
+def run_bench(parser, args):
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    results = {}
+    for name in args.names or BENCHMARKS:
+        print(f"== {name}")
+        results[name] = BENCHMARKS[name]()
+        print(format_rows(results[name]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    # Benchmarks with a performance bound report it in a within_bound column
+    failed = [name for name, rows in results.items() if any(row.get("within_bound") is False for row in rows)]
+    if failed:
+        print(f"outside their bound: {', '.join(failed)}")
+        raise SystemExit(1)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        run_train(args)
+    elif args.command == "serve":
+        run_serve(args)
+    else:
+        run_bench(parser, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Convergence tracking and early stopping for the trainers.
+
+A ConvergenceMonitor is passed to train_q_table, train_q_lambda, train_linear_agent
+or train_dqn_frozenlake as `convergence`. It sees every finished episode, and at
+the end of every window of `window` episodes it compares the learned values and
+greedy policy with those of the window before. The values are the Q-table of the
+tabular trainers, the weights of a linear agent with features, and the Q-values
+of every state for a DQN. It checks three criteria:
+
+- the largest absolute change of any of those values over the window is at most
+  `q_tol` (not checked when None). With a constant step size on a stochastic map,
+  Q keeps moving by about alpha times the reward noise, so the policy and success
+  criteria fit such runs better;
+- the greedy policy has not changed in `stable_windows` consecutive windows;
+- the mean reward of the window, the success rate on FrozenLake, is at least
+  `min_success` (not checked when None).
+
+Training stops at the first window end where all three hold, after at least
+`min_episodes` episodes, and that episode is kept as `converged_episode`. Values
+still all zero never count as converged: nothing has been learned yet. Each check
+is appended to `history`.
+"""
+import numpy as np
+
+from .evaluation import greedy_policy
+from .sparse import SparseQTable
+
+
+def _values(model, state_size=None):
+    """
+    A dense copy of the parameters of a Q-table, SparseQTable or LinearQAgent, or
+    the Q-values of every state for a Q-value function.
+    """
+    values = getattr(model, "weights", model)
+    if isinstance(values, SparseQTable):
+        return values.to_dense()
+    if callable(values):
+        return np.array(values(np.arange(state_size)), dtype=np.float64)
+    return np.array(values, dtype=np.float64)
+
+
+class ConvergenceMonitor:
+    def __init__(self, window=100, q_tol=1e-3, stable_windows=3, min_success=None, min_episodes=0):
+        self.window = window
+        self.q_tol = q_tol
+        self.stable_windows = stable_windows
+        self.min_success = min_success
+        self.min_episodes = min_episodes
+        self.converged_episode = None
+        self.history = []
+        self._rewards = []
+        self._values = None
+        self._policy = None
+        self._stable = 0
+
+    def update(self, episode, reward, model, state_size=None):
+        """
+        Record the reward of `episode` (counted from 1) and, at a window end, check
+        the criteria on `model` (as accepted by greedy_policy, which needs
+        `state_size` for a LinearQAgent with features). True once converged.
+        """
+        self._rewards.append(reward)
+        if len(self._rewards) < self.window:
+            return False
+        success_rate = float(np.mean(self._rewards))
+        self._rewards = []
+        values = _values(model, state_size)
+        policy = greedy_policy(model, state_size)
+        if self._values is None:
+            max_change, policy_changes = np.inf, len(policy)
+        else:
+            max_change = float(np.max(np.abs(values - self._values)))
+            policy_changes = int(np.count_nonzero(policy != self._policy))
+        self._values, self._policy = values, policy
+        self._stable = self._stable + 1 if policy_changes == 0 else 0
+        converged = (episode >= self.min_episodes and values.any()
+                     and (self.q_tol is None or max_change <= self.q_tol)
+                     and self._stable >= self.stable_windows
+                     and (self.min_success is None or success_rate >= self.min_success))
+        self.history.append({"episode": episode, "max_q_change": max_change, "policy_changes": policy_changes,
+                             "success_rate": success_rate, "converged": converged})
+        if converged:
+            self.converged_episode = episode
+        return converged
+
+    def report(self):
+        """The converged episode (None if not converged) and the last check's measurements."""
+        last = self.history[-1] if self.history else {}
+        return {"converged_episode": self.converged_episode, "checks": len(self.history),
+                "max_q_change": last.get("max_q_change"), "policy_changes": last.get("policy_changes"),
+                "success_rate": last.get("success_rate")}
@@ -0,0 +1,575 @@
+"""Deep Q-learning: the Q-network, epsilon-greedy helpers and the DQN trainers."""
+import copy
+import math
+import time
+
+import gymnasium as gym
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from .checkpoint import Checkpointer
+from .metrics import MetricsLogger
+from .replay import IndexReplayBuffer, PrioritizedReplayBuffer, ReplayBuffer
+from .rng import capture_rng_states, derive_seeds, restore_rng_states, seed_everything
+from .rollout import EnvSource, EpsilonGreedy, VectorEnvSource
+
+
+class DQNetwork(nn.Module):
+    def __init__(self, state_size, action_size, hidden_size=32, embed=False):
+        super(DQNetwork, self).__init__()
+
+        # With embed=True the network takes integer state indices instead of one-hot
+        # vectors: looking up an embedding row is the same as multiplying a one-hot
+        # vector by the first layer's weights, without building the vector.
+        # Spaces report sizes as NumPy integers, which TorchScript rejects as module constants
+        state_size, action_size = int(state_size), int(action_size)
+        if embed:
+            first_layer = nn.Embedding(state_size, hidden_size)
+        else:
+            first_layer = nn.Linear(state_size, hidden_size)
+
+        # Two hidden layers of hidden_size units
+        self.net = nn.Sequential(
+            first_layer,
+            nn.ReLU(),
+            nn.Linear(hidden_size, hidden_size),
+            nn.ReLU(),
+            nn.Linear(hidden_size, action_size)
+        )
+
+    def forward(self, x):
+        return self.net(x)
+
+
+_default_rng = np.random.default_rng()
+
+
+def one_hot_encode(state_idx, state_size):
+    vec = np.zeros(state_size, dtype=np.float32)
+    vec[state_idx] = 1.0
+    return vec
+
+def select_action(network, state, epsilon, action_size, rng=None):
+    """
+    Epsilon-greedy policy.
+    'state' is a 1D PyTorch tensor (already one-hot encoded), or a (1,) long
+    tensor holding the state index for a network built with embed=True.
+    Exploration draws from the np.random.Generator `rng` (an unseeded one by default).
+    """
+    if rng is None:
+        rng = _default_rng
+    if rng.random() < epsilon:
+        return int(rng.integers(action_size))
+    else:
+        with torch.no_grad():
+            q_values = network(state)
+            return torch.argmax(q_values).item()
+
+
+# Ways to run the network on CPU, see make_greedy_actor()
+BACKENDS = ("eager", "inference", "script", "compile", "numpy")
+
+
+class NumpyQNetwork:
+    """
+    Forward pass of a DQNetwork in NumPy, for acting on one state at a time. The
+    arrays are views of the network's parameters, so optimizer steps are seen
+    without copying anything.
+    """
+    def __init__(self, network):
+        first, _, hidden, _, out = network.net
+        self.embed = isinstance(first, nn.Embedding)
+        # A one-hot input selects one column of the first Linear layer, as it selects one embedding row
+        self.first = first.weight.detach().numpy() if self.embed else first.weight.detach().numpy().T
+        self.first_bias = None if self.embed else first.bias.detach().numpy()
+        self.hidden_weight, self.hidden_bias = hidden.weight.detach().numpy(), hidden.bias.detach().numpy()
+        self.out_weight, self.out_bias = out.weight.detach().numpy(), out.bias.detach().numpy()
+
+    def q_values(self, state_idx):
+        h = self.first[state_idx]
+        if self.first_bias is not None:
+            h = h + self.first_bias
+        h = np.maximum(h, 0)
+        h = np.maximum(self.hidden_weight @ h + self.hidden_bias, 0)
+        return self.out_weight @ h + self.out_bias
+
+    def act(self, state_idx):
+        return int(np.argmax(self.q_values(state_idx)))
+
+
+def compile_network(network, backend):
+    """
+    The module to run forward passes with: `network` itself, or for "script" and
+    "compile" a TorchScript or torch.compile module sharing its parameters.
+    """
+    if backend == "script":
+        return torch.jit.script(network)
+    if backend == "compile":
+        return torch.compile(network)
+    return network
+
+
+def make_greedy_actor(network, backend="inference", module=None):
+    """
+    A function from a state index to the greedy action of `network`:
+
+    - "eager": a new input tensor per call and torch.no_grad(), as select_action
+    - "inference": one preallocated input tensor rewritten in place, and torch.inference_mode()
+    - "script", "compile": a preallocated input through compile_network(network, backend),
+      or `module` if it has been compiled already, under torch.no_grad(): compiled
+      modules that are also trained keep state that inference tensors would break
+    - "numpy": NumpyQNetwork, skipping PyTorch's per-call overhead altogether
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}, got {backend!r}")
+    if backend == "numpy":
+        return NumpyQNetwork(network).act
+    first = network.net[0]
+    embed = isinstance(first, nn.Embedding)
+    module = compile_network(network, backend) if module is None else module
+    if backend == "eager":
+        def act(state_idx):
+            if embed:
+                state = torch.tensor([state_idx])
+            else:
+                state = torch.tensor(one_hot_encode(state_idx, first.in_features)).unsqueeze(0)
+            with torch.no_grad():
+                return torch.argmax(module(state)).item()
+        return act
+
+    state = torch.zeros(1, dtype=torch.long) if embed else torch.zeros(1, first.in_features)
+    grad_mode = torch.inference_mode if backend == "inference" else torch.no_grad
+
+    def act(state_idx):
+        if embed:
+            state[0] = state_idx
+        else:
+            state.zero_()
+            state[0, state_idx] = 1.0
+        with grad_mode():
+            return int(module(state).argmax())
+    return act
+
+
+def batch_q_function(network):
+    """A function from an array of state indices to their Q-values under `network`, as a NumPy array."""
+    first = network.net[0]
+    embed = isinstance(first, nn.Embedding)
+
+    def q_function(states):
+        states = torch.as_tensor(np.asarray(states, dtype=np.int64))
+        with torch.inference_mode():
+            if embed:
+                return network(states).numpy()
+            return network(nn.functional.one_hot(states, first.in_features).float()).numpy()
+    return q_function
+
+
+def train_dqn_frozenlake(
+    env=None,
+    env_name="FrozenLake-v1",
+    num_episodes=2000,
+    max_steps=100,
+    gamma=0.99,
+    lr=1e-3,
+    epsilon_start=1.0,
+    epsilon_end=0.01,
+    epsilon_decay=0.999,
+    batch_size=32,
+    replay_capacity=10000,
+    hidden_size=32,
+    index_states=False,
+    desc=None,
+    prioritized=False,
+    per_alpha=0.6,
+    per_beta=0.4,
+    per_eps=1e-6,
+    per_beta_episodes=1000,
+    n_step=1,
+    double=False,
+    target_sync_every=None,
+    seed=None,
+    checkpoint_dir=None,
+    checkpoint_every=200,
+    metrics_dir=None,
+    backend="inference",
+    num_threads=None,
+    source=None,
+    convergence=None,
+    profiler=None,
+    progress=None
+):
+    # `env` is used as is when given; otherwise a slippery `env_name` environment is
+    # created from `desc`. `seed` fixes the run: torch and the environment are seeded,
+    # and exploration and replay sampling draw from the Generator of seed_everything().
+    # With `checkpoint_dir`, a checkpoint (network, optimizer, replay buffer, epsilon,
+    # RNG states) is written every `checkpoint_every` episodes and at the end, and
+    # training resumes from the latest one found there. With `metrics_dir`, per-episode
+    # metrics are streamed to a MetricsLogger there. `backend` picks how the network
+    # runs on CPU (see make_greedy_actor; "script" and "compile" are used for the
+    # training forward passes too) and `num_threads`, if given, fixes torch's thread count.
+    # Experience comes from `source` (a rollout source, EnvSource(env) by default).
+    # With `target_sync_every`, bootstrap values come from a target network copied from
+    # the online one every that many updates, and `double` makes them Double DQN
+    # targets: the online network picks the next action, the target network values it.
+    # With `n_step` > 1, the replay buffer returns n-step returns (see replay). With
+    # `convergence` (a ConvergenceMonitor), training stops early once it reports convergence.
+    # With `profiler` (a PhaseProfiler), the time of each phase of the loop is recorded there.
+    # `progress` is as in train_q_table.
+    if double and target_sync_every is None:
+        raise ValueError("double=True needs a target network: set target_sync_every")
+
+    # 1. Create environment
+    owns_env = env is None
+    if owns_env:
+        env = gym.make(env_name, desc=desc, is_slippery=True)
+    rng = seed_everything(seed, env)
+    state_size = env.observation_space.n
+    action_size = env.action_space.n
+
+    # 2. Initialize network & optimizer
+    # index_states=True keeps states as integer indices end to end: the network embeds
+    # them and the replay buffer stores int32 indices instead of one-hot vectors.
+    q_network = DQNetwork(state_size, action_size, hidden_size, embed=index_states)
+    target_network = None
+    if target_sync_every is not None:
+        target_network = copy.deepcopy(q_network)
+        target_network.requires_grad_(False)
+    optimizer = optim.Adam(q_network.parameters(), lr=lr)
+    loss_fn = nn.MSELoss()
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    # Forward passes go through `model`, which shares q_network's parameters
+    model = compile_network(q_network, backend)
+    act = make_greedy_actor(q_network, backend, model)
+
+    # 3. Initialize replay buffer (uniform, or prioritized by TD error)
+    # n-step returns need an array-backed buffer, so one-hot states are then stored as
+    # indices and encoded per mini-batch
+    store_indices = index_states or n_step > 1
+    if prioritized:
+        replay_buffer = PrioritizedReplayBuffer(replay_capacity, alpha=per_alpha, beta=per_beta, eps=per_eps,
+                                                rng=rng, n_step=n_step, gamma=gamma)
+    elif store_indices:
+        replay_buffer = IndexReplayBuffer(capacity=replay_capacity, rng=rng, n_step=n_step, gamma=gamma)
+    else:
+        replay_buffer = ReplayBuffer(capacity=replay_capacity, rng=rng)
+    total_updates = 0
+
+    # 4. Epsilon initialization
+    epsilon = epsilon_start
+
+    # 5. For logging
+    rewards_per_episode = []
+
+    start_episode = 0
+    checkpointer = Checkpointer(checkpoint_dir) if checkpoint_dir else None
+    if checkpointer is not None:
+        saved = checkpointer.load_latest()
+        if saved is not None:
+            q_network.load_state_dict(saved["network"])
+            if target_network is not None:
+                target_network.load_state_dict(saved["target_network"])
+                total_updates = saved["updates"]
+            optimizer.load_state_dict(saved["optimizer"])
+            replay_buffer.load_state_dict(saved["replay"])
+            epsilon = saved["epsilon"]
+            rewards_per_episode = saved["rewards"].tolist()
+            start_episode = saved["episode"]
+            restore_rng_states(saved["rng"], env, rng)
+            torch.set_rng_state(saved["rng"]["torch"])
+
+    metrics = MetricsLogger(metrics_dir, start_episode) if metrics_dir else None
+
+    def policy(state_idx):
+        # Epsilon-greedy, drawing from `rng` exactly as select_action does
+        if rng.random() < epsilon:
+            return int(rng.integers(action_size))
+        return act(state_idx)
+
+    def encode(states):
+        # One-hot rows of a batch of state indices, built per batch so that memory never
+        # grows with state_size ** 2
+        return nn.functional.one_hot(torch.as_tensor(np.asarray(states, dtype=np.int64)), state_size).float()
+
+    def q_function(states):
+        # Q-values of an array of state indices, for the convergence checks
+        with torch.no_grad():
+            return model(torch.as_tensor(states) if index_states else encode(states)).numpy()
+
+    def episode_started(episode):
+        nonlocal episode_start, episode_loss, num_updates
+        episode_start = time.perf_counter()
+        # Losses are summed on the tensor side; one host sync per episode when logging
+        episode_loss = 0.0
+        num_updates = 0
+        # Anneal the importance-sampling exponent linearly to 1 over per_beta_episodes
+        if prioritized:
+            replay_buffer.beta = min(1.0, per_beta + (1.0 - per_beta) * episode / per_beta_episodes)
+
+    source = EnvSource(env) if source is None else source
+    if profiler is not None:
+        policy = profiler.wrap("rollout;act", policy)
+    stream = source.transitions(policy, num_episodes - start_episode, max_steps)
+    if profiler is not None:
+        stream = profiler.iterate(stream)
+    episode = start_episode
+    episode_start, episode_loss, num_updates = 0.0, 0.0, 0
+    episode_started(episode)
+    for state_idx, action, reward, next_state_idx, terminated, truncated, step, last, total_reward in stream:
+        done = terminated or truncated
+        if profiler is not None:
+            start = profiler.clock()
+
+        # Store transition in buffer; `last` marks where n-step returns stop
+        if store_indices:
+            replay_buffer.push(state_idx, action, reward, next_state_idx, done, last)
+        else:
+            replay_buffer.push(one_hot_encode(state_idx, state_size), action, reward,
+                               one_hot_encode(next_state_idx, state_size), done)
+        if profiler is not None:
+            profiler.add("learn;replay.push", start)
+
+        # Train the network if replay buffer has enough samples
+        if len(replay_buffer) >= batch_size:
+            if profiler is not None:
+                start = profiler.clock()
+            # Sample a mini-batch
+            if prioritized:
+                states, actions, rewards, next_states, dones, indices, weights = replay_buffer.sample(batch_size)
+            else:
+                states, actions, rewards, next_states, dones = replay_buffer.sample(batch_size)
+            if profiler is not None:
+                profiler.add("learn;replay.sample", start)
+                start = profiler.clock()
+
+            # Convert all to tensors
+            if index_states:
+                # int32 indices go straight into the embedding layer
+                states_t = torch.as_tensor(states)                    # (batch_size,)
+                next_states_t = torch.as_tensor(next_states)
+            elif store_indices:
+                states_t = encode(states)                             # (batch_size, state_size)
+                next_states_t = encode(next_states)
+            else:
+                states_t = torch.as_tensor(np.array(states))          # (batch_size, state_size)
+                next_states_t = torch.as_tensor(np.array(next_states))
+            actions_t = torch.tensor(actions, dtype=torch.long)       # (batch_size,)
+            rewards_t = torch.tensor(rewards, dtype=torch.float32)    # (batch_size,)
+            dones_t = torch.tensor(dones, dtype=torch.float32)        # (batch_size,)
+            if profiler is not None:
+                profiler.add("learn;to_tensor", start)
+                start = profiler.clock()
+
+            q_values = model(states_t)
+
+            # Gather the Q-value for the chosen action: shape (batch_size,)
+            q_values_current = q_values.gather(1, actions_t.unsqueeze(1)).squeeze(1)
+
+            with torch.no_grad():
+                if target_network is None:
+                    # Bootstrap from the online network itself
+                    q_next_max = model(next_states_t).max(1)[0]
+                elif double:
+                    next_actions = model(next_states_t).argmax(1, keepdim=True)
+                    q_next_max = target_network(next_states_t).gather(1, next_actions).squeeze(1)
+                else:
+                    q_next_max = target_network(next_states_t).max(1)[0]
+
+            if n_step > 1:
+                # The buffer gives n-step returns, and bootstrap discounts gamma^m (0 once terminated) as dones
+                q_targets = rewards_t + dones_t * q_next_max
+            else:
+                # Target: y = r + gamma * max Q(next_state) if not done
+                q_targets = rewards_t + gamma * q_next_max * (1 - dones_t)
+
+            if prioritized:
+                # Importance-sampling weights correct the bias of non-uniform sampling
+                td_errors = q_targets - q_values_current
+                weights_t = torch.tensor(weights, dtype=torch.float32)
+                loss = (weights_t * td_errors.pow(2)).mean()
+                replay_buffer.update_priorities(indices, td_errors.detach().numpy())
+            else:
+                loss = loss_fn(q_values_current, q_targets)
+            if profiler is not None:
+                profiler.add("learn;forward", start)
+                start = profiler.clock()
+            optimizer.zero_grad()
+            loss.backward()
+            if profiler is not None:
+                profiler.add("learn;backward", start)
+                start = profiler.clock()
+            optimizer.step()
+            total_updates += 1
+            if target_network is not None and total_updates % target_sync_every == 0:
+                target_network.load_state_dict(q_network.state_dict())
+            if profiler is not None:
+                profiler.add("learn;optimizer", start)
+            if metrics is not None:
+                episode_loss += loss.detach()
+                num_updates += 1
+
+        if not last:
+            continue
+
+        epsilon = max(epsilon * epsilon_decay, epsilon_end)
+        if profiler is not None:
+            profiler.end_episode()
+
+        rewards_per_episode.append(total_reward)
+        if metrics is not None:
+            metrics.log(episode + 1, total_reward, epsilon,
+                        loss=float(episode_loss) / num_updates if num_updates else math.nan,
+                        steps_per_sec=(step + 1) / (time.perf_counter() - episode_start))
+
+        # Optional logging
+        if (episode + 1) % 200 == 0:
+            print(f"Episode {episode+1}/{num_episodes}, Reward: {total_reward:.1f}, Epsilon: {epsilon:.3f}")
+
+        if progress is not None:
+            progress(episode + 1, total_reward, q_function, state_size)
+        converged = convergence is not None and convergence.update(episode + 1, total_reward, q_function, state_size)
+        if converged:
+            print(f"Converged at episode {episode+1}")
+
+        if checkpointer is not None and ((episode + 1) % checkpoint_every == 0 or episode + 1 == num_episodes
+                                         or converged):
+            rng_states = capture_rng_states(env, rng)
+            rng_states["torch"] = torch.get_rng_state()
+            checkpoint = {"network": q_network.state_dict(), "optimizer": optimizer.state_dict(),
+                          "replay": replay_buffer.state_dict(), "epsilon": epsilon,
+                          "rewards": np.array(rewards_per_episode), "episode": episode + 1, "rng": rng_states}
+            if target_network is not None:
+                checkpoint.update(target_network=target_network.state_dict(), updates=total_updates)
+            checkpointer.save(episode + 1, checkpoint)
+        episode += 1
+        if episode == num_episodes or converged:
+            # Sources with several environments may end a few more episodes in their last step
+            break
+        episode_started(episode)
+
+    if checkpointer is not None:
+        checkpointer.wait()
+    if metrics is not None:
+        metrics.close()
+    if owns_env:
+        env.close()
+    return q_network, rewards_per_episode
+
+
+def train_dqn_vectorized(
+    env_name="FrozenLake-v1",
+    num_episodes=2000,
+    max_steps=100,
+    gamma=0.99,
+    lr=1e-3,
+    epsilon_start=1.0,
+    epsilon_end=0.01,
+    epsilon_decay=0.999,
+    batch_size=32,
+    replay_capacity=10000,
+    hidden_size=32,
+    desc=None,
+    env_fn=None,
+    seed=None,
+    num_envs=8,
+    train_every=1,
+    gradient_steps=1,
+    target_update="hard",
+    target_sync_every=250,
+    tau=0.005,
+    source=None
+):
+    """
+    DQN training engine that steps `num_envs` environments in lockstep.
+
+    - Actions for all environments come from one batched forward pass, with a single
+      host sync per vector step instead of one `.item()` per action.
+    - Targets come from a separate target network, either copied from the online
+      network every `target_sync_every` gradient updates (target_update="hard") or
+      Polyak-averaged with rate `tau` after every update (target_update="polyak").
+    - `gradient_steps` updates are made every `train_every` vector steps.
+    States are integer indices throughout, as with index_states=True. `env_fn`, if
+    given, is called once per environment instead of creating slippery `env_name`
+    environments from `desc`. With `seed`, environment i is seeded with
+    derive_seeds(seed, num_envs)[i], and exploration and replay sampling draw from
+    the Generator of seed_everything(seed). `source`, if given, is a rollout source to
+    collect experience from instead of the VectorEnvSource of those environments.
+    """
+    if target_update not in ("hard", "polyak"):
+        raise ValueError(f"target_update must be 'hard' or 'polyak', got {target_update!r}")
+
+    if env_fn is None:
+        def env_fn():
+            return gym.make(env_name, desc=desc, is_slippery=True)
+    envs = [env_fn() for _ in range(num_envs)]
+    rng = seed_everything(seed)
+    if seed is not None:
+        for env, env_seed in zip(envs, derive_seeds(seed, num_envs)):
+            env.reset(seed=env_seed)
+    state_size = envs[0].observation_space.n
+    action_size = envs[0].action_space.n
+
+    q_network = DQNetwork(state_size, action_size, hidden_size, embed=True)
+    target_network = copy.deepcopy(q_network)
+    target_network.requires_grad_(False)
+    optimizer = optim.Adam(q_network.parameters(), lr=lr)
+    loss_fn = nn.MSELoss()
+    replay_buffer = IndexReplayBuffer(capacity=replay_capacity, rng=rng)
+
+    def greedy_batch(states):
+        with torch.no_grad():
+            return q_network(torch.from_numpy(states)).argmax(1).numpy()
+
+    policy = EpsilonGreedy(None, action_size, epsilon_start, rng, greedy_batch=greedy_batch)
+    rewards_per_episode = []
+    vector_step = 0
+    num_updates = 0
+
+    if source is None:
+        source = VectorEnvSource(envs)
+    for batch in source.steps(policy, num_episodes, max_steps):
+        for i in range(len(batch.state)):
+            # Only a real termination cuts off the bootstrap target
+            replay_buffer.push(batch.state[i], batch.action[i], batch.reward[i], batch.next_state[i],
+                               batch.terminated[i])
+            if batch.last[i]:
+                rewards_per_episode.append(batch.episode_return[i])
+                policy.epsilon = max(policy.epsilon * epsilon_decay, epsilon_end)
+                if len(rewards_per_episode) % 200 == 0:
+                    print(f"Episode {len(rewards_per_episode)}/{num_episodes}, "
+                          f"Reward: {batch.episode_return[i]:.1f}, Epsilon: {policy.epsilon:.3f}")
+        vector_step += 1
+
+        if vector_step % train_every == 0 and len(replay_buffer) >= batch_size:
+            for _ in range(gradient_steps):
+                b_states, b_actions, b_rewards, b_next_states, b_dones = replay_buffer.sample(batch_size)
+                states_batch = torch.as_tensor(b_states)
+                next_states_batch = torch.as_tensor(b_next_states)
+                actions_batch = torch.as_tensor(b_actions)
+                rewards_batch = torch.as_tensor(b_rewards)
+                dones_batch = torch.as_tensor(b_dones)
+
+                q_values_current = q_network(states_batch).gather(1, actions_batch.unsqueeze(1)).squeeze(1)
+                with torch.no_grad():
+                    q_next_max = target_network(next_states_batch).max(1)[0]
+                q_targets = rewards_batch + gamma * q_next_max * (1 - dones_batch)
+
+                loss = loss_fn(q_values_current, q_targets)
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+                num_updates += 1
+
+                if target_update == "polyak":
+                    with torch.no_grad():
+                        for target_param, param in zip(target_network.parameters(), q_network.parameters()):
+                            target_param.lerp_(param, tau)
+                elif num_updates % target_sync_every == 0:
+                    target_network.load_state_dict(q_network.state_dict())
+
+    for env in envs:
+        env.close()
+    return q_network, rewards_per_episode[:num_episodes]
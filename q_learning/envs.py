@@ -0,0 +1,152 @@
+"""FrozenLake environment construction and transition tables."""
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+from gymnasium.envs.toy_text.frozen_lake import MAPS
+
+# (row, col) offsets of the LEFT, DOWN, RIGHT, UP actions
+MOVES = ((0, -1), (1, 0), (0, 1), (-1, 0))
+# Slipping on FrozenLake: action-1, the action itself and action+1, computed as
+# FrozenLakeEnv does so outcome sampling matches it bit for bit
+_SUCCESS_RATE = 1.0 / 3.0
+SLIP_OFFSETS = (-1, 0, 1)
+SLIP_PROBS = ((1.0 - _SUCCESS_RATE) / 2.0, _SUCCESS_RATE, (1.0 - _SUCCESS_RATE) / 2.0)
+SLIP_CUM_PROBS = np.cumsum(SLIP_PROBS)
+
+
+def make_env(map_name="4x4", is_slippery=False, desc=None, seed=None, render_mode=None, lazy=False):
+    """
+    Creates a FrozenLake-v1 environment. `desc` (a list of row strings) overrides
+    `map_name`. With `seed`, the environment's RNG is seeded by an initial reset.
+    With `lazy`, a GridLakeEnv is returned instead, for maps too large for
+    FrozenLake's precomputed transition dict.
+    """
+    if lazy:
+        if render_mode is not None:
+            raise ValueError("GridLakeEnv does not render")
+        env = GridLakeEnv(desc if desc is not None else MAPS[map_name], is_slippery=is_slippery)
+    else:
+        env = gym.make("FrozenLake-v1", desc=desc, map_name=map_name, is_slippery=is_slippery,
+                       render_mode=render_mode)
+    if seed is not None:
+        env.reset(seed=seed)
+    return env
+
+
+class GridLakeEnv(gym.Env):
+    """
+    FrozenLake dynamics computed on each step instead of read from a transition dict
+    built up front, so memory is one byte per cell and construction is instant on
+    maps with millions of states. Rewards, terminations and slipping match
+    FrozenLakeEnv, and so does the use of np_random: the same seed gives the same
+    trajectories. There is no time limit wrapper; trainers cap episodes with max_steps.
+    """
+    def __init__(self, desc, is_slippery=True):
+        self.desc = np.asarray(desc, dtype="c")
+        self.nrow, self.ncol = self.desc.shape
+        self.is_slippery = is_slippery
+        self.start_state = int(np.flatnonzero(self.desc == b"S")[0])
+        self.observation_space = spaces.Discrete(self.nrow * self.ncol)
+        self.action_space = spaces.Discrete(4)
+        self.s = self.start_state
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        # FrozenLakeEnv draws its start state even when there is only one
+        self.np_random.random()
+        self.s = self.start_state
+        return self.s, {"prob": 1}
+
+    def step(self, action):
+        row, col = divmod(self.s, self.ncol)
+        u = self.np_random.random()
+        if self.desc[row, col] in b"GH":
+            return self.s, 0, True, False, {"prob": 1.0}
+        prob = 1.0
+        if self.is_slippery:
+            k = int(np.argmax(SLIP_CUM_PROBS > u))
+            action = (action + SLIP_OFFSETS[k]) % 4
+            prob = SLIP_PROBS[k]
+        d_row, d_col = MOVES[action]
+        row = min(max(row + d_row, 0), self.nrow - 1)
+        col = min(max(col + d_col, 0), self.ncol - 1)
+        self.s = row * self.ncol + col
+        letter = self.desc[row, col]
+        return self.s, int(letter == b"G"), bool(letter in b"GH"), False, {"prob": prob}
+
+
+class TransitionTable:
+    """
+    Dense arrays of a discrete environment's transition model `env.unwrapped.P`.
+    Outcome k of taking `action` in `state` leads to next_states[state, action, k]
+    with reward rewards[state, action, k]; cum_probs holds the running sum of the
+    outcome probabilities, padded with 1.0, so an outcome is sampled as the first k
+    with cum_probs[state, action, k] > u for a uniform u, like FrozenLake's own step().
+    """
+    def __init__(self, cum_probs, next_states, rewards, terminals, start_state):
+        self.cum_probs = cum_probs
+        self.next_states = next_states
+        self.rewards = rewards
+        self.terminals = terminals
+        self.start_state = start_state
+
+    @classmethod
+    def from_env(cls, env):
+        if isinstance(env.unwrapped, GridLakeEnv):
+            return cls.from_desc(env.unwrapped.desc, env.unwrapped.is_slippery)
+        P = env.unwrapped.P
+        state_size = env.observation_space.n
+        action_size = env.action_space.n
+        num_outcomes = max(len(outcomes) for actions in P.values() for outcomes in actions.values())
+
+        cum_probs = np.ones((state_size, action_size, num_outcomes))
+        next_states = np.zeros((state_size, action_size, num_outcomes), dtype=np.int64)
+        rewards = np.zeros((state_size, action_size, num_outcomes))
+        terminals = np.zeros((state_size, action_size, num_outcomes), dtype=np.bool_)
+        for state, actions in P.items():
+            for action, outcomes in actions.items():
+                probs, outcome_states, outcome_rewards, outcome_terminals = zip(*outcomes)
+                n = len(outcomes)
+                cum_probs[state, action, :n] = np.cumsum(probs)
+                next_states[state, action, :n] = outcome_states
+                rewards[state, action, :n] = outcome_rewards
+                terminals[state, action, :n] = outcome_terminals
+        start_state = int(np.argmax(env.unwrapped.initial_state_distrib))
+        return cls(cum_probs, next_states, rewards, terminals, start_state)
+
+    @classmethod
+    def from_desc(cls, desc, is_slippery=False):
+        """
+        Build the table straight from a map with array operations, giving the same
+        arrays as from_env(make_env(desc=desc, is_slippery=...)) without FrozenLake's
+        per-state transition dict, which is impractical for maps with millions of cells.
+        """
+        desc = np.asarray(desc, dtype="c")
+        nrow, ncol = desc.shape
+        state_size, action_size = nrow * ncol, len(MOVES)
+        offsets = np.array(SLIP_OFFSETS if is_slippery else (0,))
+        num_outcomes = len(offsets)
+
+        rows, cols = np.divmod(np.arange(state_size), ncol)
+        # Action actually taken for each (state, intended action, outcome)
+        taken = (np.arange(action_size)[:, None] + offsets) % action_size
+        moves = np.array(MOVES)[taken]
+        next_rows = np.clip(rows[:, None, None] + moves[..., 0], 0, nrow - 1)
+        next_cols = np.clip(cols[:, None, None] + moves[..., 1], 0, ncol - 1)
+        next_states = next_rows * ncol + next_cols
+        letters = desc[next_rows, next_cols]
+        rewards = (letters == b"G").astype(np.float64)
+        terminals = (letters == b"G") | (letters == b"H")
+        cum_probs = np.broadcast_to(SLIP_CUM_PROBS if is_slippery else np.ones(1),
+                                    (state_size, action_size, num_outcomes)).copy()
+
+        # G and H are absorbing: one outcome back to the same state, the rest padding
+        absorbing = ((desc == b"G") | (desc == b"H")).ravel()
+        cum_probs[absorbing] = 1.0
+        next_states[absorbing] = 0
+        next_states[absorbing, :, 0] = np.flatnonzero(absorbing)[:, None]
+        rewards[absorbing] = 0.0
+        terminals[absorbing] = False
+        terminals[absorbing, :, 0] = True
+        start_state = int(np.flatnonzero(desc == b"S")[0])
+        return cls(cum_probs, next_states, rewards, terminals, start_state)
@@ -0,0 +1,150 @@
+"""
+Vectorized evaluation of greedy policies on FrozenLake maps.
+
+greedy_policy() turns a Q-table, SparseQTable, LinearQAgent or Q-value function into
+one action per state in a single call, policy_grid() renders it as an arrow grid with
+array indexing, and evaluate_policy() plays thousands of episodes in lockstep, one
+array operation per step for all of them, to estimate the success rate with a
+confidence interval.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+from .envs import MOVES, SLIP_CUM_PROBS, SLIP_OFFSETS, GridLakeEnv
+from .maps import goal_distances
+from .sparse import SparseQTable
+
+ACTION_SYMBOLS = np.array(["<", "v", ">", "^"])
+
+
+def greedy_policy(model, state_size=None, chunk_size=65536):
+    """
+    The greedy action of every state as an int64 array. `model` is a (states, actions)
+    Q-table, a SparseQTable (unvisited states get action 0, the argmax of a zero row),
+    a LinearQAgent, or a function mapping an array of states to a (batch, actions)
+    array of Q-values, evaluated in chunks of `chunk_size` states; the last two need
+    `state_size`.
+    """
+    if isinstance(model, np.ndarray):
+        return np.argmax(model, axis=1)
+    if isinstance(model, SparseQTable):
+        policy = np.zeros(model.shape[0], dtype=np.int64)
+        state_dict = model.state_dict()
+        policy[state_dict["states"]] = np.argmax(state_dict["rows"], axis=1)
+        return policy
+    if hasattr(model, "predict_batch"):
+        if model.features is None:
+            return greedy_policy(model.weights)
+        model = model.predict_batch
+    if state_size is None:
+        raise ValueError("state_size is needed to evaluate a Q-value function")
+    policy = np.empty(state_size, dtype=np.int64)
+    for start in range(0, state_size, chunk_size):
+        states = np.arange(start, min(start + chunk_size, state_size))
+        policy[start:start + len(states)] = np.argmax(model(states), axis=1)
+    return policy
+
+
+def shortest_path_policy(desc):
+    """
+    The optimal policy of a deterministic map: from every cell, the move to the
+    neighbour closest to G, never into a hole. Cells with no path keep action 0.
+    """
+    desc = np.asarray(desc, dtype="c")
+    nrow, ncol = desc.shape
+    distances = goal_distances(desc).ravel()
+    next_distances = distances[_successors(nrow, ncol)].astype(np.float64)
+    next_distances[next_distances < 0] = np.inf
+    return np.argmin(next_distances, axis=1)
+
+
+def policy_grid(policy, desc):
+    """The map as an (nrow, ncol) array of characters, with frozen cells replaced by policy arrows."""
+    desc = np.asarray(desc, dtype="c")
+    arrows = ACTION_SYMBOLS[np.asarray(policy).reshape(desc.shape)]
+    return np.where(desc == b"F", arrows, desc.astype("U1"))
+
+
+def render_policy(policy, desc):
+    """policy_grid() as text, one row per line with cells separated by spaces."""
+    grid = policy_grid(policy, desc)
+    return "\n".join(" ".join(row) for row in grid.tolist())
+
+
+def map_of(env):
+    """The (desc, is_slippery) of a FrozenLakeEnv or GridLakeEnv, possibly wrapped."""
+    env = env.unwrapped
+    if isinstance(env, GridLakeEnv):
+        return env.desc, env.is_slippery
+    start = int(np.argmax(env.initial_state_distrib))
+    # Slippery FrozenLake has three outcomes for every action from a frozen cell
+    return env.desc, len(env.P[start][0]) > 1
+
+
+def _successors(nrow, ncol):
+    """The cell each action moves to from every cell, as a (states, actions) array."""
+    rows, cols = np.divmod(np.arange(nrow * ncol, dtype=np.int64), ncol)
+    moves = np.array(MOVES)
+    next_rows = np.clip(rows[:, None] + moves[:, 0], 0, nrow - 1)
+    next_cols = np.clip(cols[:, None] + moves[:, 1], 0, ncol - 1)
+    dtype = np.int32 if nrow * ncol < 2**31 else np.int64
+    return (next_rows * ncol + next_cols).astype(dtype)
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """Wilson score confidence interval of a success probability."""
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return float(center - half_width), float(center + half_width)
+
+
+def evaluate_policy(policy, desc=None, is_slippery=False, env=None, num_episodes=10000, max_steps=100,
+                    seed=None, confidence=0.95):
+    """
+    Play `num_episodes` episodes of a fixed `policy` (one action per state) at once
+    and return the success rate with its Wilson confidence interval, plus the mean
+    episode length. The map comes from `desc` and `is_slippery` or from `env`.
+    Dynamics match FrozenLake's; episodes that reach neither G nor a hole within
+    `max_steps` count as failures.
+    """
+    if env is not None:
+        desc, is_slippery = map_of(env)
+    desc = np.asarray(desc, dtype="c")
+    nrow, ncol = desc.shape
+    policy = np.asarray(policy)
+    flat = desc.ravel()
+    is_goal = flat == b"G"
+    is_terminal = is_goal | (flat == b"H")
+    offsets = np.array(SLIP_OFFSETS)
+    rng = np.random.default_rng(seed)
+    successors = _successors(nrow, ncol)
+
+    start = int(np.flatnonzero(flat == b"S")[0])
+    states = np.full(num_episodes, start, dtype=np.int64)
+    lengths = np.full(num_episodes, max_steps, dtype=np.int64)
+    successes = 0
+    # Indices of the episodes still running; finished ones drop out of the arrays
+    active = np.arange(num_episodes)
+    for step in range(max_steps):
+        actions = policy[states]
+        if is_slippery:
+            actions = (actions + offsets[np.searchsorted(SLIP_CUM_PROBS, rng.random(len(states)), side="right")]) % 4
+        states = successors[states, actions]
+
+        done = is_terminal[states]
+        if done.any():
+            successes += int(is_goal[states[done]].sum())
+            lengths[active[done]] = step + 1
+            active, states = active[~done], states[~done]
+            if not len(states):
+                break
+
+    low, high = wilson_interval(successes, num_episodes, confidence)
+    return {"success_rate": successes / num_episodes, "ci_low": low, "ci_high": high,
+            "mean_length": float(lengths.mean()), "episodes": num_episodes}
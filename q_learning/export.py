@@ -0,0 +1,238 @@
+"""
+Compact greedy-policy exports and a batch inference server for them.
+
+export_policy() compiles a Q-table, SparseQTable, LinearQAgent or DQNetwork into
+one int8 greedy action per state, optionally with its Q-values quantized to one
+byte each (uint8 codes with a per-state offset and step, the row's min and
+(max - min) / 255) or stored as float16. The export is a folder of .npy files
+and a meta.json, written under a temporary name and renamed into place as in
+MapCache. CompiledPolicy loads it back as memory maps, so a policy over millions
+of states opens instantly and only the pages queried are read, and answers a
+whole array of states with one fancy-indexing operation.
+
+serve_policy() puts a CompiledPolicy behind a small HTTP server:
+
+    GET  /info   the export's meta.json
+    POST /act    states -> greedy actions
+    POST /q      states -> Q-values (exports with q_values only)
+
+A request body is either JSON, {"states": [...]}, answered with {"actions": [...]}
+or {"q_values": [[...], ...]}, or with Content-Type application/octet-stream the
+states as little-endian int32, answered with the raw int8 actions or float32
+Q-values, row-major.
+"""
+import json
+import os
+import shutil
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .linear import LinearQAgent
+from .sparse import SparseQTable
+
+Q_FORMATS = (None, "uint8", "float16")
+
+
+def _q_function(model):
+    """A function from an array of states to their (batch, actions) Q-values under `model`."""
+    if isinstance(model, LinearQAgent):
+        if model.features is not None:
+            return model.predict_batch
+        model = model.weights
+    if isinstance(model, SparseQTable):
+        state_dict = model.state_dict()
+        rows = np.zeros(model.shape[0], dtype=np.int64)
+        rows[state_dict["states"]] = np.arange(1, len(state_dict["states"]) + 1)
+        # Row 0 stands for every unvisited state
+        table = np.vstack([np.zeros((1, model.shape[1])), state_dict["rows"]])
+        return lambda states: table[rows[states]]
+    if isinstance(model, np.ndarray):
+        return lambda states: model[states]
+    if "torch" in sys.modules and isinstance(model, sys.modules["torch"].nn.Module):
+        from .dqn import batch_q_function
+        return batch_q_function(model)
+    if callable(model):
+        return model
+    raise TypeError(f"cannot export a policy from {type(model).__name__}")
+
+
+def _state_size(model, state_size):
+    if state_size is not None:
+        return int(state_size)
+    table = model.weights if isinstance(model, LinearQAgent) and model.features is None else model
+    if isinstance(table, (np.ndarray, SparseQTable)):
+        return int(table.shape[0])
+    if isinstance(model, LinearQAgent):
+        return int(model.state_size)
+    raise ValueError("state_size is needed to export a Q-value function")
+
+
+def export_policy(model, directory, state_size=None, q_values=None, chunk_size=65536):
+    """
+    Write the greedy action of every state of `model` (see _q_function) to
+    `directory` as int8, and with q_values="uint8" or "float16" its Q-values too.
+    Q-values are computed `chunk_size` states at a time and written straight into
+    the memory-mapped output, so exports larger than memory work. `state_size` is
+    needed for LinearQAgents with features and DQNetworks. Returns the CompiledPolicy.
+    """
+    if q_values not in Q_FORMATS:
+        raise ValueError(f"q_values must be one of {Q_FORMATS}, got {q_values!r}")
+    q_function = _q_function(model)
+    state_size = _state_size(model, state_size)
+    action_size = np.asarray(q_function(np.arange(1))).shape[1]
+    if action_size > 127:
+        raise ValueError(f"int8 actions hold at most 127 actions, got {action_size}")
+
+    tmp = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    open_memmap = np.lib.format.open_memmap
+    arrays = {"actions": open_memmap(os.path.join(tmp, "actions.npy"), "w+", np.int8, (state_size,))}
+    if q_values == "uint8":
+        arrays["q_codes"] = open_memmap(os.path.join(tmp, "q_codes.npy"), "w+", np.uint8, (state_size, action_size))
+        arrays["q_offset"] = open_memmap(os.path.join(tmp, "q_offset.npy"), "w+", np.float32, (state_size,))
+        arrays["q_step"] = open_memmap(os.path.join(tmp, "q_step.npy"), "w+", np.float32, (state_size,))
+    elif q_values == "float16":
+        arrays["q"] = open_memmap(os.path.join(tmp, "q.npy"), "w+", np.float16, (state_size, action_size))
+    for start in range(0, state_size, chunk_size):
+        stop = min(start + chunk_size, state_size)
+        q = np.asarray(q_function(np.arange(start, stop)), dtype=np.float64)
+        arrays["actions"][start:stop] = np.argmax(q, axis=1)
+        if q_values == "uint8":
+            low = q.min(axis=1)
+            step = (q.max(axis=1) - low) / 255
+            arrays["q_codes"][start:stop] = np.rint((q - low[:, None]) / np.where(step > 0, step, 1)[:, None])
+            arrays["q_offset"][start:stop], arrays["q_step"][start:stop] = low, step
+        elif q_values == "float16":
+            arrays["q"][start:stop] = q
+    for array in arrays.values():
+        array.flush()
+    del arrays
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"state_size": state_size, "action_size": int(action_size), "q_values": q_values,
+                   "model": type(model).__name__}, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.rename(tmp, directory)
+    return CompiledPolicy.load(directory)
+
+
+class CompiledPolicy:
+    """
+    An exported policy: `actions` (int8, one per state) and, if exported, the
+    Q-values, as read-only memory maps (or in-memory arrays with mmap=False).
+    """
+    def __init__(self, meta, actions, q=None, q_codes=None, q_offset=None, q_step=None):
+        self.meta = meta
+        self.state_size = meta["state_size"]
+        self.action_size = meta["action_size"]
+        self.actions = actions
+        self.q = q
+        self.q_codes, self.q_offset, self.q_step = q_codes, q_offset, q_step
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {}
+        for name in ("actions", "q", "q_codes", "q_offset", "q_step"):
+            path = os.path.join(directory, f"{name}.npy")
+            if os.path.exists(path):
+                arrays[name] = np.load(path, mmap_mode="r" if mmap else None)
+        return cls(meta, **arrays)
+
+    @property
+    def has_q_values(self):
+        return self.q is not None or self.q_codes is not None
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.actions, self.q, self.q_codes, self.q_offset, self.q_step)
+                   if array is not None)
+
+    def _check(self, states):
+        states = np.asarray(states)
+        if states.size == 0:
+            return states.astype(np.int64)
+        if states.dtype.kind not in "iu":
+            raise ValueError(f"states must be integers, got {states.dtype}")
+        if states.min() < 0 or states.max() >= self.state_size:
+            raise ValueError(f"states must be in [0, {self.state_size})")
+        return states
+
+    def act(self, states):
+        """The greedy actions of an array of states, as int8."""
+        return self.actions[self._check(states)]
+
+    def q_values(self, states):
+        """The stored Q-values of an array of states, shape (len(states), action_size), as float32."""
+        if not self.has_q_values:
+            raise ValueError("this policy was exported without Q-values")
+        states = self._check(states)
+        if self.q is not None:
+            return self.q[states].astype(np.float32)
+        return self.q_offset[states, None] + self.q_codes[states] * self.q_step[states, None]
+
+    def __call__(self, state):
+        """The greedy action of a single state, as an int."""
+        return int(self.actions[state])
+
+
+class _PolicyHandler(BaseHTTPRequestHandler):
+    # Keep connections open, so clients can send many requests over one, and send
+    # the body right after the headers instead of waiting for the client's delayed ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, content_type="application/json"):
+        if content_type == "application/json":
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/info":
+            self._reply(200, self.server.policy.meta)
+        else:
+            self._reply(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        policy = self.server.policy
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        binary = self.headers.get("Content-Type") == "application/octet-stream"
+        if self.path not in ("/act", "/q"):
+            self._reply(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            states = np.frombuffer(body, dtype="<i4") if binary else np.asarray(json.loads(body)["states"])
+            if self.path == "/act":
+                result = policy.act(states)
+            else:
+                result = policy.q_values(states).astype(np.float32)
+        except (ValueError, KeyError, TypeError) as error:
+            self._reply(400, {"error": str(error)})
+            return
+        if binary:
+            self._reply(200, result.tobytes(), "application/octet-stream")
+        else:
+            self._reply(200, {"actions" if self.path == "/act" else "q_values": result.tolist()})
+
+
+def serve_policy(policy, host="127.0.0.1", port=8000):
+    """
+    A ThreadingHTTPServer answering queries to `policy` (a CompiledPolicy or an
+    export directory); call serve_forever() on it. Port 0 picks a free port,
+    found in server.server_address.
+    """
+    if not isinstance(policy, CompiledPolicy):
+        policy = CompiledPolicy.load(policy)
+    server = ThreadingHTTPServer((host, port), _PolicyHandler)
+    server.policy = policy
+    return server
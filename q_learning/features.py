@@ -0,0 +1,73 @@
+"""State features of grid maps for linear Q-function approximation."""
+import numpy as np
+
+from .envs import MOVES
+
+_MOVES = np.array(MOVES)
+
+
+class GridFeatures:
+    """
+    Maps FrozenLake state indices to feature vectors computed from the map on demand,
+    so nothing per state is stored beyond the map itself. A constant bias feature is
+    always included; `kinds` selects the rest:
+
+    - "position": row and column, scaled to [0, 1]
+    - "goal_distance": Manhattan distance to the goal, scaled to [0, 1]
+    - "neighbour_holes": one indicator per action (left, down, right, up) for a hole
+      in that direction
+    - "neighbour_walls": one indicator per action for the map edge in that direction
+    """
+    KINDS = ("position", "goal_distance", "neighbour_holes", "neighbour_walls")
+
+    def __init__(self, desc, kinds=("position", "goal_distance", "neighbour_holes")):
+        unknown = set(kinds) - set(self.KINDS)
+        if unknown:
+            raise ValueError(f"unknown feature kinds {sorted(unknown)}, expected some of {self.KINDS}")
+        desc = np.asarray(desc, dtype="c")
+        self.kinds = tuple(kinds)
+        self.nrow, self.ncol = desc.shape
+        # Holes, padded with a border of non-holes so neighbour lookups need no bounds checks
+        self.holes = np.pad(desc == b"H", 1)
+        self.goal = tuple(int(x) for x in np.argwhere(desc == b"G")[0])
+        sizes = {"position": 2, "goal_distance": 1, "neighbour_holes": 4, "neighbour_walls": 4}
+        self.num_features = 1 + sum(sizes[kind] for kind in self.kinds)
+
+    def __call__(self, states):
+        """Feature matrix of shape (len(states), num_features) for an array of state indices."""
+        if len(states) == 1:
+            # Per-step action selection: plain Python beats array ops on a single state
+            return np.array([self._state_features(int(states[0]))])
+        rows, cols = np.divmod(np.asarray(states, dtype=np.int64), self.ncol)
+        phi = np.empty((len(rows), self.num_features))
+        phi[:, 0] = 1.0
+        j = 1
+        if "position" in self.kinds:
+            phi[:, j] = rows / max(self.nrow - 1, 1)
+            phi[:, j + 1] = cols / max(self.ncol - 1, 1)
+            j += 2
+        if "goal_distance" in self.kinds:
+            phi[:, j] = (np.abs(rows - self.goal[0]) + np.abs(cols - self.goal[1])) / max(self.nrow + self.ncol - 2, 1)
+            j += 1
+        if "neighbour_holes" in self.kinds:
+            phi[:, j:j + 4] = self.holes[rows[:, None] + 1 + _MOVES[:, 0], cols[:, None] + 1 + _MOVES[:, 1]]
+            j += 4
+        if "neighbour_walls" in self.kinds:
+            phi[:, j] = cols == 0
+            phi[:, j + 1] = rows == self.nrow - 1
+            phi[:, j + 2] = cols == self.ncol - 1
+            phi[:, j + 3] = rows == 0
+        return phi
+
+    def _state_features(self, state):
+        row, col = divmod(state, self.ncol)
+        phi = [1.0]
+        if "position" in self.kinds:
+            phi += [row / max(self.nrow - 1, 1), col / max(self.ncol - 1, 1)]
+        if "goal_distance" in self.kinds:
+            phi.append((abs(row - self.goal[0]) + abs(col - self.goal[1])) / max(self.nrow + self.ncol - 2, 1))
+        if "neighbour_holes" in self.kinds:
+            phi += [float(self.holes[row + 1 + d_row, col + 1 + d_col]) for d_row, d_col in MOVES]
+        if "neighbour_walls" in self.kinds:
+            phi += [float(col == 0), float(row == self.nrow - 1), float(col == self.ncol - 1), float(row == 0)]
+        return phi
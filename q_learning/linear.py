@@ -0,0 +1,219 @@
+"""Q-learning with a linear function approximator."""
+import time
+
+import numpy as np
+
+from .checkpoint import Checkpointer
+from .metrics import MetricsLogger
+from .rollout import EnvSource
+from .rng import capture_rng_states, restore_rng_states, seed_everything
+from .sparse import load_q_storage_state, make_q_storage, q_storage_state
+
+
+class LinearQAgent:
+    """
+    Q-learning with a linear Q-function, Q(s, .) = phi(s) @ weights.
+
+    By default phi is a one-hot encoding of the state, so `weights` is a
+    (state_size, action_size) table (dense or sparse, see make_q_storage). With
+    `features`, a callable mapping an array of states to a (batch, num_features)
+    matrix such as GridFeatures, `weights` is (num_features, action_size) and memory
+    no longer grows with the number of states.
+    """
+    def __init__(self, state_size, action_size, alpha, gamma, epsilon, epsilon_min, epsilon_decay,
+                 q_storage="dense", max_states=None, features=None, rng=None):
+        self.state_size = state_size
+        self.action_size = action_size
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.epsilon_min = epsilon_min
+        self.epsilon_decay = epsilon_decay
+        self.features = features
+        self.rng = np.random.default_rng() if rng is None else rng
+        if features is None:
+            self.weights = make_q_storage(state_size, action_size, q_storage, max_states)
+        else:
+            if q_storage != "dense" or max_states is not None:
+                raise ValueError("q_storage and max_states only apply to one-hot (tabular) weights")
+            self.weights = np.zeros((features.num_features, action_size))
+
+    def act(self, state):
+        """Epsilon-greedy action selection."""
+        if self.rng.random() < self.epsilon:
+            return self.rng.integers(self.action_size)  # random action
+        # Exploit: pick the argmax of the predicted Q-values
+        return np.argmax(self.predict(state))
+
+    def update(self, state, action, reward, next_state, done):
+        """Perform a Q-learning update with linear approximation."""
+        if self.features is not None:
+            self.update_batch([state], [action], [reward], [next_state], [done])
+            return
+        q_value = self.weights[state, action]
+        next_q = np.max(self.weights[next_state]) if not done else 0.0
+        # Q-learning update rule
+        difference = reward + self.gamma * next_q - q_value
+        self.weights[state, action] += self.alpha * difference
+
+    def update_batch(self, states, actions, rewards, next_states, dones):
+        """
+        One semi-gradient Q-learning step on a minibatch of transitions, averaging
+        the per-transition gradients. One-hot weights fall back to per-transition updates.
+        """
+        if self.features is None:
+            for transition in zip(states, actions, rewards, next_states, dones):
+                self.update(*transition)
+            return
+        actions = np.asarray(actions)
+        phi = self.features(states)
+        q_values = (phi @ self.weights)[np.arange(len(actions)), actions]
+        next_q = (self.features(next_states) @ self.weights).max(axis=1)
+        targets = np.asarray(rewards, dtype=np.float64) + self.gamma * next_q * ~np.asarray(dones, dtype=bool)
+        # d(0.5 * td^2)/d(weights[:, a]) summed per action, as one (num_features, action_size) matmul
+        td_by_action = np.zeros((len(actions), self.action_size))
+        td_by_action[np.arange(len(actions)), actions] = targets - q_values
+        self.weights += self.alpha / len(actions) * (phi.T @ td_by_action)
+
+    def decay_epsilon(self):
+        """Decay exploration rate."""
+        self.epsilon = max(self.epsilon * self.epsilon_decay, self.epsilon_min)
+
+    def predict(self, state):
+        """
+        Returns a NumPy array of Q-values for all actions at the given state.
+        Useful for visualizing or evaluating the learned policy.
+        """
+        if self.features is not None:
+            return (self.features([state]) @ self.weights)[0]
+        return self.weights[state]
+
+    def predict_batch(self, states):
+        """Q-values of an array of states, shape (len(states), action_size)."""
+        if self.features is not None:
+            return self.features(states) @ self.weights
+        return np.stack([self.weights[state] for state in states])
+
+
+def train_linear_agent(
+    env,
+    num_episodes,
+    max_steps,
+    alpha,
+    gamma,
+    epsilon,
+    epsilon_min,
+    epsilon_decay,
+    seed=None,
+    checkpoint_dir=None,
+    checkpoint_every=500,
+    metrics_dir=None,
+    q_storage="dense",
+    max_states=None,
+    features=None,
+    batch_size=1,
+    source=None,
+    convergence=None,
+    profiler=None,
+    progress=None
+):
+    """
+    Trains a Q-learning agent using a linear function approximator in a Gym/Gymnasium environment.
+    `seed` fixes the run: exploration draws from the Generator of seed_everything().
+    With `checkpoint_dir`, a checkpoint is written every `checkpoint_every` episodes
+    and at the end, and training resumes from the latest one found there.
+    With `metrics_dir`, per-episode metrics are streamed to a MetricsLogger there.
+    `q_storage` and `max_states` choose the weight storage as in train_q_table.
+    `features` (e.g. GridFeatures) replaces the one-hot state encoding; with
+    `batch_size` > 1, transitions are collected and applied as one vectorized
+    update every `batch_size` steps and at the end of each episode.
+    Experience comes from `source` (see rollout), by default an EnvSource over `env`;
+    checkpoints only hold the RNG state of `env`.
+    With `convergence` (a ConvergenceMonitor), training stops early once it reports
+    convergence. With `profiler` (a PhaseProfiler), the time spent collecting
+    experience and updating the weights is recorded there. `progress` is as in
+    train_q_table.
+    """
+    rng = seed_everything(seed, env)
+
+    # Derive state_size and action_size
+    # If the environment is discrete (like FrozenLake), we can do:
+    state_size = env.observation_space.n
+    action_size = env.action_space.n
+
+    # Initialize the Linear Q agent
+    agent = LinearQAgent(state_size, action_size, alpha, gamma, epsilon, epsilon_min, epsilon_decay,
+                         q_storage, max_states, features, rng)
+    rewards = []
+    start_episode = 0
+
+    checkpointer = Checkpointer(checkpoint_dir) if checkpoint_dir else None
+    if checkpointer is not None:
+        saved = checkpointer.load_latest()
+        if saved is not None:
+            load_q_storage_state(agent.weights, saved["weights"])
+            agent.epsilon = saved["epsilon"]
+            rewards = saved["rewards"].tolist()
+            start_episode = saved["episode"]
+            restore_rng_states(saved["rng"], env, rng)
+
+    metrics = MetricsLogger(metrics_dir, start_episode) if metrics_dir else None
+
+    source = EnvSource(env) if source is None else source
+    act = agent.act if profiler is None else profiler.wrap("rollout;act", agent.act)
+    if batch_size == 1:
+        stream = source.transitions(act, num_episodes - start_episode, max_steps)
+    else:
+        stream = source.batches(act, num_episodes - start_episode, max_steps, batch_size, flush_on_last=True)
+    if profiler is not None:
+        stream = profiler.iterate(stream)
+    episode = start_episode
+    episode_start = time.perf_counter()
+    for item in stream:
+        # Update the agent
+        if batch_size == 1:
+            state, action, reward, next_state, terminated, truncated, step, last, total_reward = item
+            agent.update(state, action, reward, next_state, terminated or truncated)
+            if not last:
+                continue
+        else:
+            agent.update_batch(item.state, item.action, item.reward, item.next_state, item.terminated | item.truncated)
+            # With flush_on_last an episode can only end with a batch
+            if not item.last[-1]:
+                continue
+            step, total_reward = int(item.step[-1]), item.episode_return[-1].item()
+
+        # Decay epsilon at the end of each episode
+        agent.decay_epsilon()
+        if profiler is not None:
+            profiler.end_episode()
+        rewards.append(total_reward)
+        if metrics is not None:
+            metrics.log(episode + 1, total_reward, agent.epsilon,
+                        steps_per_sec=(step + 1) / (time.perf_counter() - episode_start))
+
+        if (episode + 1) % 500 == 0:
+            print(f"Linear Q - Episode {episode+1}/{num_episodes} - Reward: {total_reward}, Epsilon: {agent.epsilon:.3f}")
+
+        if progress is not None:
+            progress(episode + 1, total_reward, agent, state_size)
+        converged = convergence is not None and convergence.update(episode + 1, total_reward, agent, state_size)
+        if converged:
+            print(f"Linear Q - Converged at episode {episode+1}")
+
+        if checkpointer is not None and ((episode + 1) % checkpoint_every == 0 or episode + 1 == num_episodes
+                                         or converged):
+            checkpointer.save(episode + 1, {"weights": q_storage_state(agent.weights), "rewards": np.array(rewards),
+                                            "epsilon": agent.epsilon, "episode": episode + 1,
+                                            "rng": capture_rng_states(env, rng)})
+        episode += 1
+        if episode == num_episodes or converged:
+            # Sources with several environments may end a few more episodes in their last step
+            break
+        episode_start = time.perf_counter()
+
+    if checkpointer is not None:
+        checkpointer.wait()
+    if metrics is not None:
+        metrics.close()
+    return agent, rewards
@@ -0,0 +1,130 @@
+"""
+Procedurally generated FrozenLake maps and an on-disk cache of them.
+
+generate_map() draws maps of any size and hole density from a seed and redraws until
+a breadth-first search finds a path from S to G. MapCache stores each generated map,
+and on request its transition tables, as .npy files keyed by (size, hole density,
+seed), and loads them back as memory maps, so every benchmark and trainer can run on
+the same large maps without paying for generation or table construction again.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+from .envs import MOVES, TransitionTable
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "q_learning", "maps")
+
+
+def _breadth_first(desc, source, target=None):
+    """
+    Breadth-first search over non-hole cells from the (row, col) `source`, one whole
+    level at a time. Returns the distance of every cell as an (nrow, ncol) array, -1
+    where unreachable, stopping early once the (row, col) `target` is reached.
+    """
+    desc = np.asarray(desc, dtype="c")
+    nrow, ncol = desc.shape
+    # A border of blocked cells removes the need for bounds checks
+    open_cells = np.pad(desc != b"H", 1).ravel()
+    width = ncol + 2
+    steps = np.array([d_row * width + d_col for d_row, d_col in MOVES])
+    source = (source[0] + 1) * width + source[1] + 1
+    target = None if target is None else (target[0] + 1) * width + target[1] + 1
+
+    distances = np.full(len(open_cells), -1, dtype=np.int64)
+    distances[source] = 0
+    frontier = np.array([source])
+    level = 0
+    while len(frontier) and (target is None or distances[target] < 0):
+        level += 1
+        neighbours = np.unique((frontier[:, None] + steps).ravel())
+        frontier = neighbours[open_cells[neighbours] & (distances[neighbours] < 0)]
+        distances[frontier] = level
+    return distances.reshape(nrow + 2, width)[1:-1, 1:-1]
+
+
+def has_path(desc):
+    """Whether G can be reached from S moving between non-hole cells (breadth-first search)."""
+    desc = np.asarray(desc, dtype="c")
+    goal = tuple(np.argwhere(desc == b"G")[0])
+    return bool(_breadth_first(desc, tuple(np.argwhere(desc == b"S")[0]), goal)[goal] >= 0)
+
+
+def goal_distances(desc):
+    """Shortest-path distance of every cell to G avoiding holes, as an (nrow, ncol) array; -1 if none."""
+    desc = np.asarray(desc, dtype="c")
+    return _breadth_first(desc, tuple(np.argwhere(desc == b"G")[0]))
+
+
+def generate_map(size, hole_density=0.2, seed=None, max_tries=100):
+    """
+    A size x size map with S in the top-left and G in the bottom-right corner, each
+    other cell a hole with probability `hole_density`. Maps without a path from S to
+    G are redrawn from the same generator, so a seed always gives the same map.
+    Returned as a (size, size) array of single bytes, which make_env, GridLakeEnv,
+    TransitionTable.from_desc and GridFeatures all accept as `desc`.
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(max_tries):
+        desc = np.where(rng.random((size, size)) < hole_density, b"H", b"F").astype("S1")
+        desc[0, 0], desc[-1, -1] = b"S", b"G"
+        if has_path(desc):
+            return desc
+    raise ValueError(f"no map with a path found in {max_tries} tries; hole_density={hole_density} is too high")
+
+
+class MapCache:
+    """
+    Generated maps and their transition tables, cached under `directory` as one folder
+    per (size, hole density, seed) key. Folders are written under a temporary name
+    and renamed into place, so concurrent or interrupted writers never leave a
+    partial entry. Arrays are returned as read-only memory maps.
+    """
+    TABLE_FIELDS = ("cum_probs", "next_states", "rewards", "terminals")
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, size, hole_density, seed):
+        return os.path.join(self.directory, f"{size}x{size}-holes{hole_density:g}-seed{seed}")
+
+    def load_map(self, size, hole_density=0.2, seed=0):
+        """The map for this key, generated and stored on first use."""
+        path = self.path(size, hole_density, seed)
+        if not os.path.exists(os.path.join(path, "desc.npy")):
+            self._write(path, {"desc.npy": generate_map(size, hole_density, seed)})
+        return np.load(os.path.join(path, "desc.npy"), mmap_mode="r")
+
+    def load_table(self, size, hole_density=0.2, seed=0, is_slippery=False):
+        """The TransitionTable of the map for this key, built and stored on first use."""
+        desc = self.load_map(size, hole_density, seed)
+        path = os.path.join(self.path(size, hole_density, seed), "slippery" if is_slippery else "deterministic")
+        if not os.path.exists(os.path.join(path, "table.json")):
+            table = TransitionTable.from_desc(desc, is_slippery)
+            files = {f"{name}.npy": getattr(table, name) for name in self.TABLE_FIELDS}
+            files["table.json"] = {"start_state": table.start_state}
+            self._write(path, files)
+        with open(os.path.join(path, "table.json")) as f:
+            start_state = json.load(f)["start_state"]
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in self.TABLE_FIELDS}
+        return TransitionTable(start_state=start_state, **arrays)
+
+    def _write(self, path, files):
+        tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, content in files.items():
+            if name.endswith(".npy"):
+                np.save(os.path.join(tmp, name), content)
+            else:
+                with open(os.path.join(tmp, name), "w") as f:
+                    json.dump(content, f)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another process finished the same entry first; theirs is identical
+            shutil.rmtree(tmp, ignore_errors=True)
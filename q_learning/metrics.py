@@ -0,0 +1,143 @@
+"""Streaming per-episode training metrics and a live view that tails them."""
+import json
+import math
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+
+class RollingMean:
+    """Mean of the last `window` values, updated in O(1) per value."""
+    def __init__(self, window=100):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        return self.total / len(self.values)
+
+
+class MetricsLogger:
+    """
+    Append-only columnar log of per-episode training metrics.
+
+    `directory` holds a `columns.json` schema and one raw little-endian binary file per
+    column, so a reader can load a single column, or only the rows it has not seen yet,
+    with one np.fromfile call. log() only appends a tuple to an in-memory list; rows are
+    written to disk every `flush_every` episodes or `flush_seconds` seconds, whichever
+    comes first. Pass the episode a run resumes from as `start_episode` to drop rows
+    logged after the checkpoint it resumed from.
+    """
+    COLUMNS = {"episode": "<i8", "reward": "<f8", "reward_mean": "<f8",
+               "epsilon": "<f8", "loss": "<f8", "steps_per_sec": "<f8"}
+
+    def __init__(self, directory, start_episode=0, window=100, flush_every=256, flush_seconds=1.0):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "columns.json"), "w") as f:
+            json.dump(self.COLUMNS, f)
+
+        self.rolling = RollingMean(window)
+        for name, dtype in self.COLUMNS.items():
+            path = self._path(name)
+            if not os.path.exists(path):
+                open(path, "wb").close()
+            keep_bytes = start_episode * np.dtype(dtype).itemsize
+            if os.path.getsize(path) > keep_bytes:
+                os.truncate(path, keep_bytes)
+        # Re-prime the rolling mean from the rows that were kept
+        for reward in read_metrics(directory, columns=["reward"])["reward"][-window:].tolist():
+            self.rolling.update(reward)
+
+        self._files = {name: open(self._path(name), "ab") for name in self.COLUMNS}
+        self._rows = []
+        self._last_flush = time.perf_counter()
+
+    def log(self, episode, reward, epsilon, loss=math.nan, steps_per_sec=math.nan):
+        self._rows.append((episode, reward, self.rolling.update(reward), epsilon, loss, steps_per_sec))
+        if len(self._rows) >= self.flush_every or time.perf_counter() - self._last_flush > self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            for (name, dtype), values in zip(self.COLUMNS.items(), zip(*self._rows)):
+                f = self._files[name]
+                np.array(values, dtype=dtype).tofile(f)
+                f.flush()
+            self._rows = []
+        self._last_flush = time.perf_counter()
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + ".bin")
+
+
+def read_metrics(directory, start_row=0, columns=None):
+    """Read the complete rows of a metrics log from `start_row` on, as a dict of arrays."""
+    with open(os.path.join(directory, "columns.json")) as f:
+        schema = json.load(f)
+    names = columns or list(schema)
+    # A reader can race a flush in progress, so only rows present in every column count
+    num_rows = min(os.path.getsize(os.path.join(directory, name + ".bin")) // np.dtype(dtype).itemsize
+                   for name, dtype in schema.items())
+    count = max(num_rows - start_row, 0)
+    return {name: np.fromfile(os.path.join(directory, name + ".bin"), dtype=schema[name], count=count,
+                              offset=start_row * np.dtype(schema[name]).itemsize)
+            for name in names}
+
+
+def live_view(directories, refresh=2.0, duration=None):
+    """
+    Tail one or more metrics logs and redraw reward, epsilon, loss and throughput
+    plots every `refresh` seconds, until interrupted or `duration` seconds pass.
+    Run it from a second notebook or console while training writes the logs.
+    """
+    import matplotlib.pyplot as plt
+    from IPython.display import clear_output
+
+    if isinstance(directories, str):
+        directories = [directories]
+    history = {directory: None for directory in directories}
+    started = time.perf_counter()
+    while duration is None or time.perf_counter() - started < duration:
+        for directory in directories:
+            if not os.path.exists(os.path.join(directory, "columns.json")):
+                continue
+            seen = 0 if history[directory] is None else len(history[directory]["episode"])
+            new_rows = read_metrics(directory, start_row=seen)
+            if history[directory] is None:
+                history[directory] = new_rows
+            else:
+                history[directory] = {name: np.concatenate([history[directory][name], new_rows[name]])
+                                      for name in new_rows}
+
+        clear_output(wait=True)
+        fig, axes = plt.subplots(2, 2, figsize=(12, 7))
+        for directory, metrics in history.items():
+            if metrics is None:
+                continue
+            label = os.path.basename(os.path.normpath(directory))
+            axes[0, 0].plot(metrics["episode"], metrics["reward_mean"], label=label)
+            axes[0, 1].plot(metrics["episode"], metrics["epsilon"], label=label)
+            axes[1, 0].plot(metrics["episode"], metrics["loss"], label=label)
+            axes[1, 1].plot(metrics["episode"], metrics["steps_per_sec"], label=label)
+        for ax, title in zip(axes.flat, ["Rolling mean reward", "Epsilon", "Loss", "Steps/sec"]):
+            ax.set_title(title)
+            ax.set_xlabel("Episode")
+            ax.grid(True)
+        axes[0, 0].legend()
+        plt.tight_layout()
+        plt.show()
+        time.sleep(refresh)
\ No newline at end of file
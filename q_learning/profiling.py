@@ -0,0 +1,191 @@
+"""
+Per-phase timers for the training loops.
+
+A PhaseProfiler is passed to a trainer as `profiler`. The trainer wraps its rollout
+stream with iterate(), which splits the loop into "rollout" (the source producing
+the next transition: env.step and the policy, timed on its own as "rollout;act")
+and "learn" (the trainer's work on it), and times the learner's sub-phases, such
+as "learn;replay.sample" or "learn;backward", with clock() and add(). Phases are
+';'-separated paths, so nested time is reported both inclusive and as self time.
+
+Every phase keeps a call count, a total and a histogram of durations in
+power-of-two nanosecond buckets, for the whole run and for each window of
+`window` episodes. table() renders them, and write_folded() writes self times as
+folded stacks ("rollout;act 1234", in microseconds), the input format of
+flamegraph.pl and speedscope. With `sample_interval`, a StackSampler also records
+the Python stacks of the training thread while the stream runs.
+
+With profiler=None the trainers only test for None once per update, so profiling
+off costs nothing measurable.
+"""
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Histogram buckets: bucket b holds durations in [2^(b-1), 2^b) ns; 2^40 ns is about 18 minutes
+NUM_BUCKETS = 41
+
+
+class _Phases:
+    """Call counts, total nanoseconds and duration histograms of a set of phases."""
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.totals = defaultdict(int)
+        self.histograms = defaultdict(lambda: [0] * NUM_BUCKETS)
+
+    def add(self, name, ns):
+        self.counts[name] += 1
+        self.totals[name] += ns
+        self.histograms[name][min(ns.bit_length(), NUM_BUCKETS - 1)] += 1
+
+    def self_ns(self, name):
+        """Time of `name` not spent in its direct sub-phases."""
+        depth = name.count(";") + 1
+        children = sum(total for child, total in self.totals.items()
+                       if child.startswith(name + ";") and child.count(";") == depth)
+        return self.totals[name] - children
+
+    def percentile_us(self, name, q):
+        """Upper bound of the bucket holding the q-th percentile, in microseconds."""
+        cumulative = np.cumsum(self.histograms[name])
+        bucket = int(np.searchsorted(cumulative, q / 100 * cumulative[-1]))
+        return 2 ** bucket / 1000
+
+    def rows(self):
+        grand_total = sum(total for name, total in self.totals.items() if ";" not in name) or 1
+        return [{"phase": name, "calls": self.counts[name], "total_s": self.totals[name] / 1e9,
+                 "self_s": self.self_ns(name) / 1e9, "percent": 100 * self.totals[name] / grand_total,
+                 "mean_us": self.totals[name] / self.counts[name] / 1000,
+                 "p50_us": self.percentile_us(name, 50), "p99_us": self.percentile_us(name, 99)}
+                for name in sorted(self.totals)]
+
+
+class StackSampler:
+    """
+    Samples the Python stack of one thread every `interval` seconds from a
+    background thread, counting folded stacks ("module:function;..." from the
+    outermost frame). Sampling takes the GIL, so it slows the sampled thread a
+    little; use it only when looking for hot spots.
+    """
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class PhaseProfiler:
+    def __init__(self, window=100, sample_interval=None):
+        self.window = window
+        self.run = _Phases()
+        self.windows = []
+        self._current = _Phases()
+        self._episodes = 0
+        self.sampler = StackSampler(sample_interval) if sample_interval else None
+
+    clock = staticmethod(time.perf_counter_ns)
+
+    def add(self, name, start):
+        """Record phase `name` as running from `start` (a clock() reading) until now."""
+        ns = time.perf_counter_ns() - start
+        self.run.add(name, ns)
+        self._current.add(name, ns)
+
+    def wrap(self, name, function):
+        """`function`, timed as phase `name` on every call."""
+        def timed(*args):
+            start = time.perf_counter_ns()
+            result = function(*args)
+            self.add(name, start)
+            return result
+        return timed
+
+    def iterate(self, stream, produce="rollout", consume="learn"):
+        """
+        Yield from `stream`, timing each step of it as `produce` and the consumer's
+        time between steps as `consume`. The sampler, if any, runs meanwhile.
+        """
+        if self.sampler is not None:
+            self.sampler.start()
+        try:
+            start = time.perf_counter_ns()
+            for item in stream:
+                self.add(produce, start)
+                start = time.perf_counter_ns()
+                yield item
+                self.add(consume, start)
+                start = time.perf_counter_ns()
+        finally:
+            if self.sampler is not None:
+                self.sampler.stop()
+
+    def end_episode(self):
+        """Count an episode, closing the current window after every `window` of them."""
+        self._episodes += 1
+        if self._episodes % self.window == 0:
+            self.windows.append((self._episodes, self._current))
+            self._current = _Phases()
+
+    def rows(self, window=None):
+        """Per-phase rows for the whole run, or for the window ending at episode `window`."""
+        if window is None:
+            return self.run.rows()
+        return dict(self.windows)[window].rows()
+
+    def window_rows(self):
+        """Per-phase totals of every finished window, one row per window and phase."""
+        return [{"episodes": episodes, **row} for episodes, phases in self.windows for row in phases.rows()]
+
+    def table(self, window=None):
+        """The rows as a plain-text table, phases indented by depth."""
+        rows = self.rows(window)
+        if not rows:
+            return "(no phases recorded)"
+        header = f"{'phase':<28} {'calls':>9} {'total s':>9} {'self s':>9} {'%':>6} {'mean us':>9} " \
+                 f"{'p50 us':>9} {'p99 us':>9}"
+        lines = [header, "-" * len(header)]
+        for row in rows:
+            depth = row["phase"].count(";")
+            name = "  " * depth + row["phase"].rsplit(";", 1)[-1]
+            lines.append(f"{name:<28} {row['calls']:>9} {row['total_s']:>9.3f} {row['self_s']:>9.3f} "
+                         f"{row['percent']:>6.1f} {row['mean_us']:>9.2f} {row['p50_us']:>9.2f} "
+                         f"{row['p99_us']:>9.2f}")
+        return "\n".join(lines)
+
+    def write_folded(self, path, root="train"):
+        """Self time of every phase as folded stacks under `root`, in microseconds."""
+        with open(path, "w") as f:
+            for name in sorted(self.run.totals):
+                us = self.run.self_ns(name) // 1000
+                if us > 0:
+                    f.write(f"{root};{name} {us}\n")
@@ -0,0 +1,224 @@
+"""
+Tabular Q(lambda): Q-learning with eligibility traces.
+
+One-step Q-learning moves FrozenLake's single terminal reward back by one state
+per visit, so the start state only learns of it after many episodes. With traces,
+every update also credits the state-action pairs that led to it, weighted by
+(gamma * lambda)^k for a pair visited k steps earlier.
+
+Watkins's Q(lambda) cuts the traces whenever a non-greedy action is taken, so it
+only credits greedy continuations; Peng's Q(lambda) never cuts them and mixes
+greedy and taken-action returns. Traces are kept either as a dense
+(states, actions) array, updated with one array operation per step, or as the
+set of traced pairs only, dropped once their trace falls below `min_trace`, for
+maps where a full-table operation per step would dominate.
+"""
+import time
+
+import numpy as np
+
+from .checkpoint import Checkpointer
+from .metrics import MetricsLogger
+from .rollout import EnvSource
+from .rng import capture_rng_states, restore_rng_states, seed_everything
+
+VARIANTS = ("watkins", "peng")
+TRACES = ("dense", "sparse")
+
+
+class DenseTraces:
+    """Eligibility traces of every state-action pair, in one array shaped like Q."""
+    def __init__(self, state_size, action_size):
+        self.e = np.zeros((state_size, action_size))
+
+    def visit(self, state, action, replacing):
+        if replacing:
+            self.e[state] = 0.0
+            self.e[state, action] = 1.0
+        else:
+            self.e[state, action] += 1.0
+
+    def apply(self, Q, step):
+        Q += step * self.e
+
+    def decay(self, factor):
+        self.e *= factor
+
+    def clear(self):
+        self.e[:] = 0.0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.e))
+
+
+class SparseTraces:
+    """
+    Eligibility traces of the traced state-action pairs only, in parallel arrays:
+    every operation touches those entries alone, and traces below `min_trace` are
+    dropped, so about log(min_trace) / log(gamma * lambda) pairs stay traced.
+    """
+    def __init__(self, min_trace=1e-4, capacity=64):
+        self.min_trace = min_trace
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity)
+        self.size = 0
+
+    def _keep(self, keep):
+        count = int(keep.sum())
+        n = self.size
+        for array in (self.states, self.actions, self.values):
+            array[:count] = array[:n][keep]
+        self.size = count
+
+    def _append(self, state, action, value):
+        if self.size == len(self.values):
+            self.states, self.actions, self.values = (np.concatenate([a, np.zeros_like(a)])
+                                                      for a in (self.states, self.actions, self.values))
+        i = self.size
+        self.states[i], self.actions[i], self.values[i] = state, action, value
+        self.size = i + 1
+
+    def visit(self, state, action, replacing):
+        n = self.size
+        if replacing:
+            same_state = self.states[:n] == state
+            if same_state.any():
+                self._keep(~same_state)
+            self._append(state, action, 1.0)
+            return
+        hit = np.flatnonzero((self.states[:n] == state) & (self.actions[:n] == action))
+        if len(hit):
+            self.values[hit[0]] += 1.0
+        else:
+            self._append(state, action, 1.0)
+
+    def apply(self, Q, step):
+        # Pairs are unique, so the fancy-indexed += adds each trace exactly once
+        n = self.size
+        Q[self.states[:n], self.actions[:n]] += step * self.values[:n]
+
+    def decay(self, factor):
+        n = self.size
+        self.values[:n] *= factor
+        keep = self.values[:n] >= self.min_trace
+        if not keep.all():
+            self._keep(keep)
+
+    def clear(self):
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+
+def train_q_lambda(env, num_episodes, max_steps, alpha, gamma,
+                   epsilon_init, epsilon_min, epsilon_decay, lam=0.9, variant="watkins",
+                   traces="dense", replacing=True, min_trace=1e-4, seed=None,
+                   checkpoint_dir=None, checkpoint_every=500, metrics_dir=None, source=None,
+                   convergence=None, profiler=None, progress=None):
+    """
+    Trains a tabular Q(lambda) agent, with the arguments and epsilon-greedy
+    exploration of train_q_table. `variant` is "watkins" or "peng", `traces` is
+    "dense" or "sparse" (dropping traces below `min_trace`), and `replacing` resets
+    a state's traces to 1 for the action taken on each visit instead of adding 1.
+    With lam=0, Watkins's Q(lambda) is one-step Q-learning: same seed, same Q as
+    train_q_table. `checkpoint_dir`, `checkpoint_every`, `metrics_dir`, `source`,
+    `convergence`, `profiler` and `progress` are as in train_q_table; traces are
+    cleared at the end of every episode, so checkpoints hold no traces.
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"variant must be one of {VARIANTS}, got {variant!r}")
+    if traces not in TRACES:
+        raise ValueError(f"traces must be one of {TRACES}, got {traces!r}")
+    rng = seed_everything(seed, env)
+
+    state_size = env.observation_space.n
+    action_size = env.action_space.n
+
+    Q = np.zeros((state_size, action_size))
+    E = DenseTraces(state_size, action_size) if traces == "dense" else SparseTraces(min_trace)
+    epsilon = epsilon_init
+    rewards = []
+    start_episode = 0
+
+    checkpointer = Checkpointer(checkpoint_dir) if checkpoint_dir else None
+    if checkpointer is not None:
+        saved = checkpointer.load_latest()
+        if saved is not None:
+            Q[:] = saved["Q"]
+            rewards = saved["rewards"].tolist()
+            epsilon = saved["epsilon"]
+            start_episode = saved["episode"]
+            restore_rng_states(saved["rng"], env, rng)
+
+    metrics = MetricsLogger(metrics_dir, start_episode) if metrics_dir else None
+
+    def policy(state):
+        if rng.random() < epsilon:
+            return rng.integers(action_size)
+        return np.argmax(Q[state])
+
+    source = EnvSource(env) if source is None else source
+    if profiler is not None:
+        policy = profiler.wrap("rollout;act", policy)
+    stream = source.transitions(policy, num_episodes - start_episode, max_steps)
+    if profiler is not None:
+        stream = profiler.iterate(stream)
+    episode = start_episode
+    episode_start = time.perf_counter()
+    for state, action, reward, next_state, _, _, step, last, total_reward in stream:
+        target = reward + gamma * np.max(Q[next_state])
+        if variant == "watkins":
+            # An exploratory action ends the greedy return the traces stand for
+            if Q[state, action] < np.max(Q[state]):
+                E.clear()
+            delta = target - Q[state, action]
+            E.visit(state, action, replacing)
+            E.apply(Q, alpha * delta)
+            E.decay(gamma * lam)
+        else:
+            # Peng: earlier pairs learn from the greedy value of `state`, the pair itself from its own
+            delta_taken = target - Q[state, action]
+            E.decay(gamma * lam)
+            E.apply(Q, alpha * (target - np.max(Q[state])))
+            Q[state, action] += alpha * delta_taken
+            E.visit(state, action, replacing)
+        if not last:
+            continue
+
+        E.clear()
+        epsilon = max(epsilon * epsilon_decay, epsilon_min)
+        if profiler is not None:
+            profiler.end_episode()
+
+        rewards.append(total_reward)
+        if metrics is not None:
+            metrics.log(episode + 1, total_reward, epsilon,
+                        steps_per_sec=(step + 1) / (time.perf_counter() - episode_start))
+
+        if (episode + 1) % 500 == 0:
+            print(f"Q(lambda) - Episode {episode+1}/{num_episodes} "
+                  f"- Reward: {total_reward}, Epsilon: {epsilon:.3f}")
+
+        if progress is not None:
+            progress(episode + 1, total_reward, Q)
+        converged = convergence is not None and convergence.update(episode + 1, total_reward, Q)
+        if converged:
+            print(f"Q(lambda) - Converged at episode {episode+1}")
+
+        if checkpointer is not None and ((episode + 1) % checkpoint_every == 0 or episode + 1 == num_episodes
+                                         or converged):
+            checkpointer.save(episode + 1, {"Q": Q, "rewards": np.array(rewards), "epsilon": epsilon,
+                                            "episode": episode + 1, "rng": capture_rng_states(env, rng)})
+        episode += 1
+        if episode == num_episodes or converged:
+            # Sources with several environments may end a few more episodes in their last step
+            break
+        episode_start = time.perf_counter()
+
+    if checkpointer is not None:
+        checkpointer.wait()
+    if metrics is not None:
+        metrics.close()
+    return Q, rewards
@@ -0,0 +1,280 @@
+"""
+Experience replay buffers for DQN: uniform, int32 index-based and prioritized.
+Each buffer samples from its own np.random.Generator, `rng` (unseeded by default).
+
+The array-backed buffers (IndexReplayBuffer, PrioritizedReplayBuffer) can also
+return n-step transitions: with n_step > 1, pushes must follow one stream of
+episodes in order, each transition flagged with `end` when its episode ended
+there, and sample() accumulates the returns from the stored one-step transitions.
+"""
+from collections import deque
+
+import numpy as np
+
+
+def n_step_transitions(buffer, indices, n_step, gamma):
+    """
+    The n-step view of the transitions at `indices` of an array-backed buffer: the
+    return sum_k gamma^k r_k over up to `n_step` transitions, stopping after one that
+    ended its episode or at the newest one stored, the next state after the last of
+    them, and the bootstrap discount gamma^m for m transitions summed (0 if the last
+    terminated). One array operation over a (batch, n_step) window per field.
+    """
+    offsets = np.arange(n_step)
+    steps = (indices[:, None] + offsets) % buffer.capacity
+    # Transitions from each index up to the newest are consecutive in the ring
+    available = (buffer.pos - 1 - indices) % buffer.capacity + 1
+    ends = buffer.ends[steps]
+    ended_before = np.cumsum(ends, axis=1) - ends > 0
+    included = (offsets < available[:, None]) & ~ended_before
+    count = included.sum(axis=1)
+    returns = (buffer.rewards[steps] * gamma ** offsets * included).sum(axis=1).astype(np.float32)
+    last = steps[np.arange(len(indices)), count - 1]
+    discounts = (gamma ** count * (1 - buffer.dones[last])).astype(np.float32)
+    return returns, buffer.next_states[last], discounts
+
+
+class ReplayBuffer:
+    def __init__(self, capacity=10000, rng=None):
+        self.buffer = deque(maxlen=capacity)
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def push(self, state, action, reward, next_state, done):
+        self.buffer.append((state, action, reward, next_state, done))
+
+    def sample(self, batch_size):
+        batch = [self.buffer[i] for i in self.rng.choice(len(self.buffer), batch_size, replace=False)]
+        states, actions, rewards, next_states, dones = zip(*batch)
+        return states, actions, rewards, next_states, dones
+
+    def state_dict(self):
+        if not self.buffer:
+            return {"capacity": self.buffer.maxlen, "size": 0}
+        states, actions, rewards, next_states, dones = zip(*self.buffer)
+        return {"capacity": self.buffer.maxlen, "size": len(self.buffer),
+                "states": np.array(states), "actions": np.array(actions), "rewards": np.array(rewards),
+                "next_states": np.array(next_states), "dones": np.array(dones)}
+
+    def load_state_dict(self, state):
+        self.buffer = deque(maxlen=state["capacity"])
+        if state["size"]:
+            self.buffer.extend(zip(np.array(state["states"]), state["actions"].tolist(), state["rewards"].tolist(),
+                                   np.array(state["next_states"]), state["dones"].tolist()))
+
+    def __len__(self):
+        return len(self.buffer)
+
+
+class IndexReplayBuffer:
+    """
+    Replay buffer for integer state indices, kept in preallocated int32 ring arrays.
+    States cost 4 bytes each instead of 4 * state_size bytes for one-hot vectors.
+    With `n_step` > 1, sample() returns n-step returns, the states `n_step` steps on
+    and bootstrap discounts (see n_step_transitions) in place of rewards, next states
+    and dones.
+    """
+    def __init__(self, capacity=10000, rng=None, n_step=1, gamma=0.99):
+        self.capacity = capacity
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.n_step = n_step
+        self.gamma = gamma
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self.ends = np.zeros(capacity, dtype=bool)
+        self.pos = 0
+        self.size = 0
+
+    def push(self, state, action, reward, next_state, done, end=None):
+        i = self.pos
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.ends[i] = done if end is None else end
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def push_batch(self, states, actions, rewards, next_states, dones, ends=None):
+        """Store a batch of transitions with one indexed array write per field."""
+        ends = dones if ends is None else ends
+        count = len(states)
+        if count > self.capacity:
+            # Only the newest `capacity` transitions would survive anyway
+            states, actions, rewards, next_states, dones, ends = (
+                np.asarray(a)[-self.capacity:] for a in (states, actions, rewards, next_states, dones, ends))
+            count = self.capacity
+        indices = (self.pos + np.arange(count)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        self.ends[indices] = ends
+        self.pos = (self.pos + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, batch_size):
+        indices = self.rng.choice(self.size, batch_size, replace=False)
+        if self.n_step > 1:
+            returns, next_states, discounts = n_step_transitions(self, indices, self.n_step, self.gamma)
+            return self.states[indices], self.actions[indices], returns, next_states, discounts
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.dones[indices])
+
+    def state_dict(self):
+        return {"states": self.states, "actions": self.actions, "rewards": self.rewards,
+                "next_states": self.next_states, "dones": self.dones, "ends": self.ends,
+                "pos": self.pos, "size": self.size}
+
+    def load_state_dict(self, state):
+        for name in ("states", "actions", "rewards", "next_states", "dones"):
+            getattr(self, name)[:] = state[name]
+        # Checkpoints from before episode ends were stored only know terminations
+        self.ends[:] = state["ends"] if "ends" in state else state["dones"]
+        self.pos = state["pos"]
+        self.size = state["size"]
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.states, self.actions, self.rewards, self.next_states, self.dones,
+                                      self.ends))
+
+    def __len__(self):
+        return self.size
+
+
+class SumTree:
+    """
+    Array-based binary sum-tree over `capacity` leaf priorities.
+    Every internal node holds the sum of its two children, so both updating
+    a priority and finding the leaf for a given prefix sum walk a single
+    root-to-leaf path: O(log n). Both operations work on whole batches.
+    """
+    def __init__(self, capacity):
+        # Round up to a power of two so that every leaf sits at the same depth
+        self.capacity = 1
+        while self.capacity < capacity:
+            self.capacity *= 2
+        self.depth = self.capacity.bit_length() - 1
+        self.tree = np.zeros(2 * self.capacity - 1, dtype=np.float64)
+
+    def total(self):
+        return self.tree[0]
+
+    def get(self, leaf_indices):
+        return self.tree[np.asarray(leaf_indices) + self.capacity - 1]
+
+    def update(self, leaf_indices, priorities):
+        """Set the priorities of a batch of leaves and refresh their ancestors level by level."""
+        nodes = np.asarray(leaf_indices, dtype=np.int64) + self.capacity - 1
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique((nodes - 1) // 2)
+            self.tree[nodes] = self.tree[2 * nodes + 1] + self.tree[2 * nodes + 2]
+
+    def find(self, values):
+        """For each value in [0, total), return the leaf whose cumulative-priority interval contains it."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.zeros(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes + 1
+            left_sum = self.tree[left]
+            go_right = values >= left_sum
+            values = np.where(go_right, values - left_sum, values)
+            nodes = np.where(go_right, left + 1, left)
+        return nodes - (self.capacity - 1)
+
+
+class PrioritizedReplayBuffer:
+    """
+    Proportional prioritized experience replay (Schaul et al., 2016).
+    Transitions are sampled with probability p_i^alpha / sum_k p_k^alpha and
+    returned together with their buffer indices and importance-sampling
+    weights (N * P(i))^-beta, normalized by the batch maximum. `n_step` and
+    `gamma` are as in IndexReplayBuffer.
+    """
+    def __init__(self, capacity=10000, alpha=0.6, beta=0.4, eps=1e-6, rng=None, n_step=1, gamma=0.99):
+        self.capacity = capacity
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.n_step = n_step
+        self.gamma = gamma
+        self.alpha = alpha
+        self.beta = beta
+        self.eps = eps
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0
+        self.pos = 0
+        self.size = 0
+        # Storage is allocated on the first push, once the state shape is known
+        self.states = None
+
+    def push(self, state, action, reward, next_state, done, end=None):
+        if self.states is None:
+            # Integer state indices are kept as int32, encoded states as float32
+            state_dtype = np.int32 if np.issubdtype(np.asarray(state).dtype, np.integer) else np.float32
+            self.states = np.zeros((self.capacity,) + np.shape(state), dtype=state_dtype)
+            self.next_states = np.zeros_like(self.states)
+            self.actions = np.zeros(self.capacity, dtype=np.int64)
+            self.rewards = np.zeros(self.capacity, dtype=np.float32)
+            self.dones = np.zeros(self.capacity, dtype=np.float32)
+            self.ends = np.zeros(self.capacity, dtype=bool)
+        i = self.pos
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.ends[i] = done if end is None else end
+        # New transitions get the largest priority seen so far, so each is replayed at least once
+        self.tree.update([i], [self.max_priority ** self.alpha])
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size):
+        # Stratified sampling: one uniform draw from each of batch_size equal slices of the total mass
+        total = self.tree.total()
+        bounds = np.linspace(0.0, total, batch_size + 1)
+        values = self.rng.uniform(bounds[:-1], bounds[1:])
+        # Floating-point round-off can walk past the last filled leaf
+        indices = np.minimum(self.tree.find(values), self.size - 1)
+
+        probs = self.tree.get(indices) / total
+        weights = (self.size * probs) ** (-self.beta)
+        weights = (weights / weights.max()).astype(np.float32)
+
+        if self.n_step > 1:
+            returns, next_states, discounts = n_step_transitions(self, indices, self.n_step, self.gamma)
+            return self.states[indices], self.actions[indices], returns, next_states, discounts, indices, weights
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.dones[indices], indices, weights)
+
+    def update_priorities(self, indices, td_errors):
+        """Batched priority update from the absolute TD errors of a sampled mini-batch."""
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities ** self.alpha)
+
+    def state_dict(self):
+        state = {"tree": self.tree.tree, "max_priority": self.max_priority, "beta": self.beta,
+                 "pos": self.pos, "size": self.size}
+        if self.states is not None:
+            state.update(states=self.states, actions=self.actions, rewards=self.rewards,
+                         next_states=self.next_states, dones=self.dones, ends=self.ends)
+        return state
+
+    def load_state_dict(self, state):
+        self.tree.tree[:] = state["tree"]
+        self.max_priority = state["max_priority"]
+        self.beta = state["beta"]
+        self.pos = state["pos"]
+        self.size = state["size"]
+        if "states" in state:
+            for name in ("states", "actions", "rewards", "next_states", "dones"):
+                setattr(self, name, np.array(state[name]))
+            self.ends = np.array(state["ends"] if "ends" in state else state["dones"], dtype=bool)
+
+    def __len__(self):
+        return self.size
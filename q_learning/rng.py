@@ -0,0 +1,57 @@
+"""
+Seeding and RNG state capture shared by the trainers.
+
+Every trainer takes one `seed` and gets its randomness from the Generator that
+seed_everything() returns (exploration, replay sampling), from torch (network
+initialization) and from its environments, so a seed fixes the whole run and
+nothing depends on the global NumPy or Python RNGs. Parallel and vectorized
+trainers give each worker or environment its own seed from derive_seeds().
+"""
+import random
+import sys
+
+import numpy as np
+
+
+def derive_seeds(seed, count):
+    """`count` independent integer seeds derived from `seed`, one per worker or environment."""
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(count)]
+
+
+def seed_everything(seed, env=None):
+    """
+    Seed torch if something has imported it already (the DQN trainers have; the
+    tabular and linear ones never load it), the environment's RNG and, for code
+    outside the trainers, the global NumPy and Python RNGs, and return the
+    np.random.Generator the trainer should draw from. Its stream is derived from `seed` rather than
+    seeded with it, so it is independent of the environment's. With seed=None
+    nothing is seeded and the Generator draws fresh OS entropy.
+    """
+    if seed is None:
+        return np.random.default_rng()
+    np.random.seed(seed)
+    random.seed(seed)
+    if "torch" in sys.modules:
+        sys.modules["torch"].manual_seed(seed)
+    if env is not None:
+        env.reset(seed=seed)
+    return np.random.default_rng(derive_seeds(seed, 1)[0])
+
+
+def capture_rng_states(env=None, rng=None):
+    """Snapshot the global NumPy and Python RNGs and, if given, the environment's RNG and a Generator."""
+    states = {"numpy": np.random.get_state(), "python": random.getstate()}
+    if env is not None:
+        states["env"] = env.unwrapped.np_random.bit_generator.state
+    if rng is not None:
+        states["generator"] = rng.bit_generator.state
+    return states
+
+
+def restore_rng_states(states, env=None, rng=None):
+    np.random.set_state(states["numpy"])
+    random.setstate(states["python"])
+    if env is not None:
+        env.unwrapped.np_random.bit_generator.state = states["env"]
+    if rng is not None and "generator" in states:
+        rng.bit_generator.state = states["generator"]
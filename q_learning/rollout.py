@@ -0,0 +1,256 @@
+"""
+Streaming experience collection shared by the learners.
+
+A source plays episodes with a policy and yields what happens lazily, in one of
+three shapes: transitions() one at a time, steps() one TransitionBatch per lockstep
+step of all its environments, or batches() in fixed-size TransitionBatches. The
+learner pulls the stream, so the policy always acts on the learner's latest values,
+and swapping the source (one gymnasium environment, several stepped in lockstep, a
+pure-NumPy simulator or a background prefetcher) changes how experience is collected
+without touching the learner.
+
+Policies are functions from a state to an action. Sources that act on many states at
+once call a policy's `batch` method (an array of states to an array of actions) if it
+has one, and the policy state by state otherwise.
+"""
+import itertools
+import queue
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# `step` counts from 0 within the episode; `last` marks the final transition of an
+# episode (terminated, truncated or at max_steps) and `episode_return` is the reward
+# summed over the episode so far, the whole episode's return when `last` is set.
+Transition = namedtuple("Transition", ["state", "action", "reward", "next_state", "terminated", "truncated",
+                                       "step", "last", "episode_return"])
+# The same fields as arrays, one entry per transition
+TransitionBatch = namedtuple("TransitionBatch", Transition._fields)
+
+
+def stack_transitions(transitions):
+    """A TransitionBatch of a list of Transitions."""
+    return TransitionBatch(*(np.array(field) for field in zip(*transitions)))
+
+
+def batch_policy(policy):
+    """The batched form of `policy`: its `batch` method, or the policy applied to each state in turn."""
+    batch = getattr(policy, "batch", None)
+    if batch is not None:
+        return batch
+    return lambda states: np.array([policy(state) for state in states.tolist()])
+
+
+class EpsilonGreedy:
+    """
+    Epsilon-greedy over `greedy` (a state to its greedy action) and `greedy_batch`
+    (an array of states to theirs; `greedy` state by state if not given), drawing
+    from the np.random.Generator `rng`. `epsilon` is read on every call, so a learner
+    can decay it while a stream is running.
+    """
+    def __init__(self, greedy, action_size, epsilon, rng, greedy_batch=None):
+        self.greedy = greedy
+        self.greedy_batch = greedy_batch
+        self.action_size = action_size
+        self.epsilon = epsilon
+        self.rng = rng
+
+    def __call__(self, state):
+        if self.rng.random() < self.epsilon:
+            return int(self.rng.integers(self.action_size))
+        return self.greedy(state)
+
+    def batch(self, states):
+        if self.greedy_batch is not None:
+            greedy = self.greedy_batch(states)
+        else:
+            greedy = np.array([self.greedy(state) for state in states.tolist()])
+        explore = self.rng.random(len(states)) < self.epsilon
+        return np.where(explore, self.rng.integers(self.action_size, size=len(states)), greedy)
+
+
+class RolloutSource:
+    """
+    Base class of the sources. Subclasses implement transitions() or steps(), and
+    each is derived from the other here. `num_episodes` is the number of episodes to
+    finish, or None to run until the consumer stops; sources stepping several
+    environments finish their last lockstep step, so a few more may end in it.
+    """
+    num_envs = 1
+
+    def transitions(self, policy, num_episodes, max_steps):
+        for batch in self.steps(policy, num_episodes, max_steps):
+            for fields in zip(*(field.tolist() for field in batch)):
+                yield Transition(*fields)
+
+    def steps(self, policy, num_episodes, max_steps):
+        for transition in self.transitions(policy, num_episodes, max_steps):
+            yield stack_transitions([transition])
+
+    def batches(self, policy, num_episodes, max_steps, batch_size=32, flush_on_last=False):
+        """
+        The transitions in TransitionBatches of `batch_size`, the final one possibly
+        shorter; with `flush_on_last`, every episode's last transition ends a batch too.
+        """
+        pending = []
+        for transition in self.transitions(policy, num_episodes, max_steps):
+            pending.append(transition)
+            if len(pending) == batch_size or (flush_on_last and transition.last):
+                yield stack_transitions(pending)
+                pending = []
+        if pending:
+            yield stack_transitions(pending)
+
+
+class EnvSource(RolloutSource):
+    """Episodes of one gymnasium environment, played one step at a time."""
+    def __init__(self, env):
+        self.env = env
+
+    def transitions(self, policy, num_episodes, max_steps):
+        for _ in itertools.count() if num_episodes is None else range(num_episodes):
+            state, _ = self.env.reset()
+            episode_return = 0
+            for step in range(max_steps):
+                action = policy(state)
+                next_state, reward, terminated, truncated, _ = self.env.step(action)
+                episode_return += reward
+                last = terminated or truncated or step == max_steps - 1
+                yield Transition(state, action, reward, next_state, terminated, truncated, step, last, episode_return)
+                if terminated or truncated:
+                    break
+                state = next_state
+
+
+class VectorEnvSource(RolloutSource):
+    """
+    Episodes of several gymnasium environments stepped in lockstep, with one batched
+    policy call per step. An environment is reset as soon as its episode ends.
+    """
+    def __init__(self, envs):
+        self.envs = list(envs)
+        self.num_envs = len(self.envs)
+
+    def steps(self, policy, num_episodes, max_steps):
+        act = batch_policy(policy)
+        num_envs = self.num_envs
+        states = np.array([env.reset()[0] for env in self.envs], dtype=np.int64)
+        returns = np.zeros(num_envs)
+        episode_steps = np.zeros(num_envs, dtype=np.int64)
+        finished = 0
+        while num_episodes is None or finished < num_episodes:
+            actions = act(states)
+            batch = TransitionBatch(states.copy(), actions, np.zeros(num_envs), np.zeros(num_envs, dtype=np.int64),
+                                    np.zeros(num_envs, dtype=bool), np.zeros(num_envs, dtype=bool),
+                                    episode_steps.copy(), np.zeros(num_envs, dtype=bool), np.zeros(num_envs))
+            for i, env in enumerate(self.envs):
+                next_state, reward, terminated, truncated, _ = env.step(actions[i])
+                episode_steps[i] += 1
+                returns[i] += reward
+                last = terminated or truncated or episode_steps[i] >= max_steps
+                batch.reward[i], batch.next_state[i] = reward, next_state
+                batch.terminated[i], batch.truncated[i], batch.last[i] = terminated, truncated, last
+                batch.episode_return[i] = returns[i]
+                if last:
+                    finished += 1
+                    returns[i] = 0
+                    episode_steps[i] = 0
+                    next_state, _ = env.reset()
+                states[i] = next_state
+            yield batch
+
+
+class TableSource(RolloutSource):
+    """
+    A pure-NumPy simulator of `num_envs` episodes at once on a TransitionTable: every
+    step samples all outcomes with one array operation, as FrozenLake's step() does
+    for one. Dynamics draw from their own Generator, seeded with `seed`.
+    """
+    def __init__(self, table, num_envs=1, seed=None):
+        self.table = table
+        self.num_envs = num_envs
+        self.rng = np.random.default_rng(seed)
+
+    def steps(self, policy, num_episodes, max_steps):
+        act = batch_policy(policy)
+        table = self.table
+        states = np.full(self.num_envs, table.start_state, dtype=np.int64)
+        returns = np.zeros(self.num_envs)
+        episode_steps = np.zeros(self.num_envs, dtype=np.int64)
+        finished = 0
+        while num_episodes is None or finished < num_episodes:
+            actions = np.asarray(act(states), dtype=np.int64)
+            # First outcome whose cumulative probability exceeds a uniform draw
+            u = self.rng.random(self.num_envs)
+            outcomes = np.argmax(table.cum_probs[states, actions] > u[:, None], axis=1)
+            next_states = table.next_states[states, actions, outcomes]
+            rewards = table.rewards[states, actions, outcomes]
+            terminated = table.terminals[states, actions, outcomes]
+            returns += rewards
+            last = terminated | (episode_steps + 1 >= max_steps)
+            yield TransitionBatch(states, actions, rewards, next_states, terminated,
+                                  np.zeros(self.num_envs, dtype=bool), episode_steps.copy(), last, returns.copy())
+            finished += int(last.sum())
+            returns[last] = 0
+            episode_steps = np.where(last, 0, episode_steps + 1)
+            states = np.where(last, table.start_state, next_states)
+
+
+class PrefetchSource(RolloutSource):
+    """
+    Runs another source in a background thread, up to `depth` items ahead of the
+    consumer, so collection overlaps learning. The policy then acts on values up to
+    `depth` items old and shares its Generator with the learner across threads, so
+    runs are no longer reproducible from a seed.
+    """
+    def __init__(self, source, depth=256):
+        self.source = source
+        self.num_envs = source.num_envs
+        self.depth = depth
+
+    def transitions(self, policy, num_episodes, max_steps):
+        return self._prefetch(self.source.transitions(policy, num_episodes, max_steps))
+
+    def steps(self, policy, num_episodes, max_steps):
+        return self._prefetch(self.source.steps(policy, num_episodes, max_steps))
+
+    def _prefetch(self, items):
+        buffer = queue.Queue(self.depth)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # Give up once the consumer has stopped, instead of blocking on a full queue
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for item in items:
+                    if not put(item):
+                        return
+            except BaseException as error:
+                put(error)
+            else:
+                put(done)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # The consumer stopped early or finished: let the producer exit
+            stop.set()
+            producer.join()
@@ -0,0 +1,264 @@
+"""
+A content-addressed on-disk cache of training runs.
+
+RunCache.run(trainer, *args, **kwargs) calls a trainer such as train_q_table or
+train_dqn_frozenlake only if no run with the same configuration is stored yet.
+The key is the SHA-256 of the trainer's name, every argument after defaults are
+applied (the environment reduced to its map, slipperiness and step limit), and
+the code version: a hash of the package's source files and the numpy, gymnasium
+and torch versions, so editing any learner invalidates every earlier run. The
+learned table, weights or network and the reward curve are stored as one .npz
+file per run, so a repeated notebook cell or sweep point returns at once.
+
+Only reproducible runs are cached: without a seed, or with a checkpoint
+directory, metrics directory, rollout source, convergence monitor, profiler or
+progress callback (whose effects a stored result cannot replay), run() just
+calls the trainer.
+
+Entries are written under a temporary name and renamed into place, as in
+MapCache, so parallel sweep workers never see a partial entry; when two finish
+the same run, the first rename wins and the other copy is dropped. Every hit
+touches its entry, and after each write the least recently used entries are
+removed until the cache is at most `max_bytes`.
+"""
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+import types
+
+import numpy as np
+
+from .evaluation import map_of
+from .linear import LinearQAgent
+from .sparse import SparseQTable
+
+DEFAULT_RUN_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "q_learning", "runs")
+
+# Arguments whose effects are not captured by the returned model and rewards
+UNCACHEABLE_ARGUMENTS = ("checkpoint_dir", "metrics_dir", "source", "convergence", "profiler", "progress", "env_fn")
+
+_code_version = None
+
+
+def code_version():
+    """Hash of this package's source files and the versions of the libraries runs depend on."""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(package)):
+            if name.endswith(".py"):
+                with open(os.path.join(package, name), "rb") as f:
+                    digest.update(name.encode() + b"\0" + f.read() + b"\0")
+        import gymnasium
+        versions = {"numpy": np.__version__, "gymnasium": gymnasium.__version__}
+        if "torch" in sys.modules:
+            versions["torch"] = sys.modules["torch"].__version__
+        digest.update(json.dumps(versions, sort_keys=True).encode())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def describe_env(env):
+    """What a trainer's results depend on in `env`: its type, map, slipperiness and step limit."""
+    desc, is_slippery = map_of(env)
+    spec = getattr(env, "spec", None)
+    return {"env": type(env.unwrapped).__name__, "desc": _canonical(np.asarray(desc, dtype="c")),
+            "is_slippery": bool(is_slippery), "max_episode_steps": getattr(spec, "max_episode_steps", None)}
+
+
+def _canonical(value):
+    """`value` as JSON-serializable data that identifies it; arrays by dtype, shape and content hash."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return {"dtype": array.dtype.str, "shape": list(array.shape),
+                "sha256": hashlib.sha256(array.tobytes()).hexdigest()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in sorted(value.items())}
+    if hasattr(value, "unwrapped"):
+        return describe_env(value)
+    if isinstance(value, (types.FunctionType, types.MethodType)) or not hasattr(value, "__dict__"):
+        raise TypeError(f"cannot derive a cache key from {type(value).__name__} arguments")
+    # Plain configuration objects such as GridFeatures: their class and attributes
+    return {"class": f"{type(value).__module__}.{type(value).__qualname__}", "state": _canonical(vars(value))}
+
+
+def _pack(model, rewards):
+    """The arrays and JSON metadata that _unpack rebuilds (model, rewards) from."""
+    arrays = {"rewards": np.asarray(rewards, dtype=np.float64)}
+    meta = {}
+    weights = model.weights if isinstance(model, LinearQAgent) else model
+    if isinstance(weights, SparseQTable):
+        state = weights.state_dict()
+        arrays.update({"q.states": state["states"], "q.rows": state["rows"]})
+        meta["sparse"] = _canonical({"shape": weights.shape, "max_states": weights.max_states,
+                                     "evictions": state["evictions"]})
+    elif isinstance(weights, np.ndarray):
+        arrays["q"] = weights
+    if isinstance(model, LinearQAgent):
+        meta["kind"] = "linear"
+        meta["agent"] = _canonical({name: getattr(model, name) for name in (
+            "state_size", "action_size", "alpha", "gamma", "epsilon", "epsilon_min", "epsilon_decay")})
+        meta["rng"] = model.rng.bit_generator.state
+    elif isinstance(model, (np.ndarray, SparseQTable)):
+        meta["kind"] = "table"
+    elif type(model).__name__ == "DQNetwork":
+        import torch.nn as nn
+        first_layer = model.net[0]
+        embed = isinstance(first_layer, nn.Embedding)
+        meta["kind"] = "dqn"
+        meta["network"] = {"state_size": first_layer.num_embeddings if embed else first_layer.in_features,
+                           "action_size": model.net[-1].out_features, "hidden_size": model.net[-1].in_features,
+                           "embed": embed}
+        arrays.update({f"network.{name}": tensor.detach().cpu().numpy()
+                       for name, tensor in model.state_dict().items()})
+    else:
+        raise TypeError(f"cannot cache a trained {type(model).__name__}")
+    return arrays, meta
+
+
+def _unpack(arrays, meta, arguments):
+    """(model, rewards) as the trainer returned them; `arguments` supplies what was not stored (features)."""
+    rewards = arrays["rewards"].tolist()
+    if "sparse" in meta:
+        shape = meta["sparse"]["shape"]
+        weights = SparseQTable(shape[0], shape[1], max_states=meta["sparse"]["max_states"])
+        weights.load_state_dict({"states": arrays["q.states"], "rows": arrays["q.rows"],
+                                 "evictions": meta["sparse"]["evictions"]})
+    else:
+        weights = arrays.get("q")
+    if meta["kind"] == "table":
+        return weights, rewards
+    if meta["kind"] == "linear":
+        agent = LinearQAgent(**meta["agent"], features=arguments.get("features"))
+        agent.weights = weights
+        agent.rng.bit_generator.state = meta["rng"]
+        return agent, rewards
+    import torch
+    from .dqn import DQNetwork
+    network = DQNetwork(**meta["network"])
+    network.load_state_dict({name[len("network."):]: torch.from_numpy(array)
+                             for name, array in arrays.items() if name.startswith("network.")})
+    return network, rewards
+
+
+class RunCache:
+    """
+    Trained models and reward curves under `directory`, one folder per run key,
+    kept to at most `max_bytes` by evicting the least recently used runs.
+    `hits` and `misses` count run() calls that could be cached.
+    """
+    def __init__(self, directory=DEFAULT_RUN_CACHE_DIR, max_bytes=2 ** 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, trainer, arguments):
+        """The run key of `trainer` called with the bound `arguments` (a dict)."""
+        config = {"trainer": f"{trainer.__module__}.{trainer.__qualname__}",
+                  "arguments": _canonical({name: value for name, value in arguments.items()
+                                           if name not in UNCACHEABLE_ARGUMENTS}),
+                  "code_version": code_version()}
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def run(self, trainer, *args, **kwargs):
+        """`trainer(*args, **kwargs)`, returned from the cache when this run is stored."""
+        bound = inspect.signature(trainer).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        if arguments.get("seed") is None or any(arguments.get(name) is not None for name in UNCACHEABLE_ARGUMENTS):
+            return trainer(*args, **kwargs)
+        key = self.key(trainer, arguments)
+        stored = self.load(key)
+        if stored is not None:
+            self.hits += 1
+            return _unpack(*stored, arguments)
+        self.misses += 1
+        model, rewards = trainer(*args, **kwargs)
+        arrays, meta = _pack(model, rewards)
+        meta.update(trainer=trainer.__name__, created=time.time())
+        self.store(key, arrays, meta)
+        return model, rewards
+
+    def load(self, key):
+        """The (arrays, meta) stored under `key`, marking it as just used, or None."""
+        path = self.path(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            with np.load(os.path.join(path, "arrays.npz")) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)
+        except FileNotFoundError:
+            # Never stored, or evicted by another process meanwhile
+            return None
+        return arrays, meta
+
+    def store(self, key, arrays, meta):
+        path = self.path(key)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.savez(os.path.join(tmp, "arrays.npz"), **arrays)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another process stored the same run first; theirs is identical
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """(key, bytes, last use) of every stored run, least recently used first."""
+        entries = []
+        for key in os.listdir(self.directory):
+            path = self.path(key)
+            if "." in key or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((key, size, os.stat(path).st_mtime))
+            except FileNotFoundError:
+                continue
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove the least recently used runs until the cache holds at most max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            # Renamed first, so readers see the entry either whole or gone
+            doomed = f"{self.path(key)}.evict-{os.getpid()}"
+            try:
+                os.rename(self.path(key), doomed)
+            except OSError:
+                # Already evicted by another process
+                pass
+            else:
+                shutil.rmtree(doomed, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            shutil.rmtree(self.path(key), ignore_errors=True)
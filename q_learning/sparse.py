@@ -0,0 +1,118 @@
+"""Sparse Q-value storage for large grid worlds where most states are never visited."""
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SparseQTable:
+    """
+    Q-table that allocates a row only when a state is first written to.
+
+    Rows live in one growable (capacity, action_size) block; a dict maps each stored
+    state to its slot. Reads of states that were never written return zeros without
+    allocating, so the dense-table access patterns keep working unchanged:
+    `Q[state]` (a row to pass to np.argmax / np.max), `Q[state, action]` and
+    `Q[state, action] += delta`. With `max_states`, storing a new state beyond the
+    cap evicts the least recently written one, whose values fall back to zero.
+    """
+    def __init__(self, state_size, action_size, max_states=None, initial_capacity=1024):
+        self.shape = (state_size, action_size)
+        self.max_states = max_states
+        self.evictions = 0
+        if max_states is not None:
+            initial_capacity = min(initial_capacity, max_states)
+        # state -> slot, ordered from least to most recently written
+        self._slots = OrderedDict()
+        self._rows = np.zeros((max(initial_capacity, 1), action_size))
+        self._zero_row = np.zeros(action_size)
+        self._zero_row.flags.writeable = False
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            state, action = key
+            slot = self._slots.get(state)
+            return 0.0 if slot is None else self._rows[slot, action]
+        slot = self._slots.get(key)
+        return self._zero_row if slot is None else self._rows[slot]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, tuple):
+            state, action = key
+        else:
+            state, action = key, slice(None)
+        # Resolve the slot first: it may grow (and so replace) the row block
+        slot = self._slot_for_write(state)
+        self._rows[slot, action] = value
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, state):
+        return state in self._slots
+
+    def _slot_for_write(self, state):
+        slot = self._slots.get(state)
+        if slot is not None:
+            if self.max_states is not None:
+                self._slots.move_to_end(state)
+            return slot
+        if self.max_states is not None and len(self._slots) >= self.max_states:
+            _, slot = self._slots.popitem(last=False)
+            self._rows[slot] = 0.0
+            self.evictions += 1
+        else:
+            slot = len(self._slots)
+            if slot == len(self._rows):
+                grown = np.zeros((2 * len(self._rows), self.shape[1]))
+                grown[:slot] = self._rows
+                self._rows = grown
+        self._slots[state] = slot
+        return slot
+
+    def nbytes(self):
+        """Approximate memory held: the row block plus the state -> slot index."""
+        return self._rows.nbytes + sys.getsizeof(self._slots) + 2 * 28 * len(self._slots)
+
+    def to_dense(self):
+        Q = np.zeros(self.shape)
+        if self._slots:
+            states = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+            slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+            Q[states] = self._rows[slots]
+        return Q
+
+    def state_dict(self):
+        states = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+        return {"states": states, "rows": self._rows[slots], "evictions": self.evictions}
+
+    def load_state_dict(self, state):
+        states = np.asarray(state["states"])
+        self._slots = OrderedDict(zip(states.tolist(), range(len(states))))
+        self._rows = np.zeros((max(len(states), 1), self.shape[1]))
+        self._rows[:len(states)] = state["rows"]
+        self.evictions = state["evictions"]
+
+
+def make_q_storage(state_size, action_size, q_storage="dense", max_states=None):
+    """A dense np.zeros table, or a SparseQTable for q_storage="sparse"."""
+    if q_storage == "dense":
+        if max_states is not None:
+            raise ValueError("max_states needs q_storage='sparse'")
+        return np.zeros((state_size, action_size))
+    if q_storage == "sparse":
+        return SparseQTable(state_size, action_size, max_states=max_states)
+    raise ValueError(f"q_storage must be 'dense' or 'sparse', got {q_storage!r}")
+
+
+def q_storage_state(Q):
+    """The checkpointable form of a dense or sparse Q-table."""
+    return Q.state_dict() if isinstance(Q, SparseQTable) else Q
+
+
+def load_q_storage_state(Q, state):
+    if isinstance(Q, SparseQTable):
+        Q.load_state_dict(state)
+    else:
+        Q[:] = state
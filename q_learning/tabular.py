@@ -0,0 +1,109 @@
+"""Tabular Q-learning."""
+import time
+
+import numpy as np
+
+from .checkpoint import Checkpointer
+from .metrics import MetricsLogger
+from .rollout import EnvSource
+from .rng import capture_rng_states, restore_rng_states, seed_everything
+from .sparse import load_q_storage_state, make_q_storage, q_storage_state
+
+
+def train_q_table(env, num_episodes, max_steps, alpha, gamma,
+                  epsilon_init, epsilon_min, epsilon_decay, seed=None,
+                  checkpoint_dir=None, checkpoint_every=500, metrics_dir=None,
+                  q_storage="dense", max_states=None, source=None, convergence=None,
+                  profiler=None, progress=None):
+    """
+    Trains a Q-learning agent in a discrete environment such as FrozenLake-v1.
+    `seed` fixes the run: exploration draws from the Generator of seed_everything().
+    With `checkpoint_dir`, a checkpoint is written every `checkpoint_every` episodes
+    and at the end, and training resumes from the latest one found there.
+    With `metrics_dir`, per-episode metrics are streamed to a MetricsLogger there.
+    With q_storage="sparse", Q is a SparseQTable holding rows only for visited
+    states, capped at `max_states` rows if given.
+    Experience comes from `source` (see rollout), by default an EnvSource over `env`;
+    checkpoints only hold the RNG state of `env`.
+    With `convergence` (a ConvergenceMonitor), training stops early once it reports
+    convergence. With `profiler` (a PhaseProfiler), the time spent collecting
+    experience and updating Q is recorded there. `progress`, if given, is called
+    after every episode with the arguments of ConvergenceMonitor.update, and its
+    return value is ignored.
+    """
+    rng = seed_everything(seed, env)
+
+    state_size = env.observation_space.n
+    action_size = env.action_space.n
+
+    Q = make_q_storage(state_size, action_size, q_storage, max_states)
+    epsilon = epsilon_init
+    rewards = []
+    start_episode = 0
+
+    checkpointer = Checkpointer(checkpoint_dir) if checkpoint_dir else None
+    if checkpointer is not None:
+        saved = checkpointer.load_latest()
+        if saved is not None:
+            load_q_storage_state(Q, saved["Q"])
+            rewards = saved["rewards"].tolist()
+            epsilon = saved["epsilon"]
+            start_episode = saved["episode"]
+            restore_rng_states(saved["rng"], env, rng)
+
+    metrics = MetricsLogger(metrics_dir, start_episode) if metrics_dir else None
+
+    # Epsilon-greedy over the current Q-table
+    def policy(state):
+        if rng.random() < epsilon:
+            return rng.integers(action_size)
+        return np.argmax(Q[state])
+
+    source = EnvSource(env) if source is None else source
+    if profiler is not None:
+        policy = profiler.wrap("rollout;act", policy)
+    stream = source.transitions(policy, num_episodes - start_episode, max_steps)
+    if profiler is not None:
+        stream = profiler.iterate(stream)
+    episode = start_episode
+    episode_start = time.perf_counter()
+    for state, action, reward, next_state, _, _, step, last, total_reward in stream:
+        Q[state, action] += alpha * (reward + gamma * np.max(Q[next_state]) - Q[state, action])
+        if not last:
+            continue
+
+        epsilon = max(epsilon * epsilon_decay, epsilon_min)
+        if profiler is not None:
+            profiler.end_episode()
+
+        rewards.append(total_reward)
+        if metrics is not None:
+            metrics.log(episode + 1, total_reward, epsilon,
+                        steps_per_sec=(step + 1) / (time.perf_counter() - episode_start))
+
+        # Optional logging every 500 episodes
+        if (episode + 1) % 500 == 0:
+            print(f"Q-table - Episode {episode+1}/{num_episodes} "
+                  f"- Reward: {total_reward}, Epsilon: {epsilon:.3f}")
+
+        if progress is not None:
+            progress(episode + 1, total_reward, Q)
+        converged = convergence is not None and convergence.update(episode + 1, total_reward, Q)
+        if converged:
+            print(f"Q-table - Converged at episode {episode+1}")
+
+        if checkpointer is not None and ((episode + 1) % checkpoint_every == 0 or episode + 1 == num_episodes
+                                         or converged):
+            checkpointer.save(episode + 1, {"Q": q_storage_state(Q), "rewards": np.array(rewards), "epsilon": epsilon,
+                                            "episode": episode + 1, "rng": capture_rng_states(env, rng)})
+        episode += 1
+        if episode == num_episodes or converged:
+            # Sources with several environments may end a few more episodes in their last step
+            break
+        episode_start = time.perf_counter()
+
+    if checkpointer is not None:
+        checkpointer.wait()
+    if metrics is not None:
+        metrics.close()
+    return Q, rewards
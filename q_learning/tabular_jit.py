@@ -0,0 +1,108 @@
+"""
+Tabular Q-learning with the whole episode loop compiled by Numba.
+
+The loop runs against a precomputed TransitionTable instead of calling env.step, and
+draws its randomness from the same two Generators as train_q_table, in the same
+order: exploration from the one seed_everything() returns, and the environment's
+dynamics (one draw per reset and one per step, as FrozenLake and GridLakeEnv make
+them) from the environment's own np_random. Numba's Generator support produces the
+same streams as NumPy's, so for a given seed the compiled kernel, its pure-Python
+fallback (used when Numba is not installed) and train_q_table all learn the same Q
+and rewards, as long as `max_steps` is within the environment's own step limit.
+"""
+import warnings
+
+import numpy as np
+
+from .envs import TransitionTable
+from .rng import seed_everything
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _q_learning_episodes(cum_probs, next_states, rewards, terminals, start_state, Q, rng, env_rng,
+                         num_episodes, max_steps, alpha, gamma, epsilon, epsilon_min, epsilon_decay,
+                         episode_rewards):
+    """Run `num_episodes` of epsilon-greedy Q-learning in place on Q; returns the final epsilon."""
+    action_size = Q.shape[1]
+    num_outcomes = cum_probs.shape[2]
+    for episode in range(num_episodes):
+        # reset() samples the start state from a one-state distribution, which still takes a draw
+        env_rng.random()
+        state = start_state
+        total_reward = 0.0
+        for step in range(max_steps):
+            if rng.random() < epsilon:
+                action = rng.integers(0, action_size)
+            else:
+                action = np.argmax(Q[state])
+
+            # Sample the outcome the same way FrozenLake's step() does
+            u = env_rng.random()
+            k = 0
+            while k < num_outcomes - 1 and cum_probs[state, action, k] <= u:
+                k += 1
+            next_state = next_states[state, action, k]
+            reward = rewards[state, action, k]
+            done = terminals[state, action, k]
+
+            Q[state, action] += alpha * (reward + gamma * np.max(Q[next_state]) - Q[state, action])
+
+            state = next_state
+            total_reward += reward
+            if done:
+                break
+        epsilon = max(epsilon * epsilon_decay, epsilon_min)
+        episode_rewards[episode] = total_reward
+    return epsilon
+
+
+if numba is not None:
+    _q_learning_episodes_jit = numba.njit(cache=True)(_q_learning_episodes)
+else:
+    _q_learning_episodes_jit = None
+
+
+def jit_available():
+    return _q_learning_episodes_jit is not None
+
+
+def train_q_table_jit(env, num_episodes, max_steps, alpha, gamma,
+                      epsilon_init, epsilon_min, epsilon_decay, seed=None, use_jit=True,
+                      table=None):
+    """
+    Trains a tabular Q-learning agent like train_q_table, with the episode loop
+    compiled by Numba, and with the same Q and rewards for the same seed. `env` is
+    only read for its transition model unless a precomputed `table` is given; its
+    RNG drives the dynamics and advances as if train_q_table had stepped it. With
+    env=None, the dynamics draw from a Generator seeded as seed_everything() seeds
+    an environment. Without Numba (or with use_jit=False) the same loop runs as
+    plain Python, with identical results.
+    """
+    if table is None:
+        table = TransitionTable.from_env(env)
+    state_size, action_size = table.cum_probs.shape[:2]
+    Q = np.zeros((state_size, action_size))
+    rewards = np.zeros(num_episodes)
+    rng = seed_everything(seed, env)
+    if env is not None:
+        env_rng = env.unwrapped.np_random
+    else:
+        env_rng = np.random.default_rng(seed)
+        if seed is not None:
+            # The draw of seed_everything()'s env.reset(seed=seed)
+            env_rng.random()
+
+    run = _q_learning_episodes
+    if use_jit:
+        if jit_available():
+            run = _q_learning_episodes_jit
+        else:
+            warnings.warn("numba is not installed; running the tabular Q-learning loop in Python")
+
+    run(table.cum_probs, table.next_states, table.rewards, table.terminals, table.start_state, Q, rng, env_rng,
+        num_episodes, max_steps, alpha, gamma, epsilon_init, epsilon_min, epsilon_decay, rewards)
+    return Q, rewards.tolist()
@@ -0,0 +1,20 @@
+"""Text rendering of greedy FrozenLake policies."""
+from .evaluation import greedy_policy, render_policy
+
+
+def visualize_policy_from_q(Q, env):
+    """
+    Visualizes the learned policy from a Q-table (dense or sparse).
+    Frozen cells ('F') are replaced by arrows indicating the best action.
+    """
+    print(render_policy(greedy_policy(Q), env.unwrapped.desc))
+
+
+def visualize_policy_from_linear(agent, env):
+    """
+    Visualizes the learned policy from the linear Q-function approximator.
+    In FrozenLake, frozen cells ('F') are replaced by arrows indicating the best action.
+    """
+    # Q-values of all states are computed in batches (LinearQAgent.predict_batch)
+    policy = greedy_policy(agent, state_size=env.observation_space.n)
+    print(render_policy(policy, env.unwrapped.desc))
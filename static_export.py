@@ -0,0 +1,304 @@
+"""
+Static export of the world map site, servable by any file server or CDN.
+
+Everything the map page shows only changes with the code, so `export` renders it
+once: index.html holds the page (world_map.map_layout rendered to HTML, with the
+info box as display_info shows it before any click), plotly.js is copied next to
+it, and the figure and the info box contents of every country on the map are
+written as JSON under data/<version>/, fetched when the page loads and when a
+country is clicked. `version` hashes the data, so everything but index.html can
+be cached forever. Simplified topojson is bundled too when it has been built
+(see topojson_assets.py). The policy explorer needs a server and is left out.
+
+`check` compares a bundle with the live app: the page against the app's layout
+and initial callback, the figure against the one in the layout, and every
+country's file against display_info's response over Dash's callback protocol,
+all fetched through a plain file server. tests/test_static_export.py runs both.
+
+    python static_export.py export [OUT_DIR]
+    python static_export.py check [OUT_DIR]
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import textwrap
+
+import plotly
+from plotly.utils import PlotlyJSONEncoder
+
+import topojson_assets
+import world_map
+
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static_site")
+# Marks a folder as written by export, which only ever replaces such folders or empty ones
+MARKER = ".static-export"
+CALLBACK_OUTPUTS = ("country-name", "country-info")
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{plotly_js}"></script>
+</head>
+<body>
+<div id="page">{page}</div>
+<script>
+var DATA = "{data}";
+var pickTopojson = {picker};
+fetch(DATA + "figure.json").then(function(response) {{ return response.json(); }}).then(function(figure) {{
+    var picked = pickTopojson ? pickTopojson(figure) : [{{}}, figure];
+    var graph = document.getElementById("world-map");
+    Plotly.newPlot(graph, picked[1].data, picked[1].layout, picked[0]);
+    graph.on("plotly_click", function(event) {{
+        fetch(DATA + "countries/" + event.points[0].customdata[0] + ".json")
+            .then(function(response) {{ return response.json(); }})
+            .then(function(outputs) {{
+                for (var id in outputs) {{ document.getElementById(id).innerHTML = outputs[id]; }}
+            }});
+    }});
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def to_json(value):
+    """`value`, which may hold Dash components and figures, as the JSON the app sends to the browser."""
+    return json.loads(json.dumps(value, cls=PlotlyJSONEncoder))
+
+
+def markdown_html(text):
+    """The subset of Markdown the site uses (headings, paragraphs, bold, italics, bare links) as HTML."""
+    blocks = []
+    for block in re.split(r"\n\s*\n", textwrap.dedent(text).strip()):
+        block = html.escape(block.strip(), quote=False)
+        block = re.sub(r"https?://[^\s<]+", lambda match: f'<a href="{match[0]}">{match[0]}</a>', block)
+        block = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", block)
+        block = re.sub(r"\*(.+?)\*", r"<em>\1</em>", block)
+        heading = re.match(r"(#{1,6})\s+(.*)", block, re.S)
+        if heading:
+            level = len(heading[1])
+            blocks.append(f"<h{level}>{heading[2]}</h{level}>")
+        else:
+            blocks.append(f"<p>{block}</p>")
+    return "\n".join(blocks)
+
+
+def _style(style):
+    # React accepts camelCase style keys; CSS wants them hyphenated
+    return ";".join(f"{re.sub('([A-Z])', lambda match: '-' + match[1], key).lower()}:{value}"
+                    for key, value in style.items())
+
+
+def render(component):
+    """HTML for a component tree in the JSON form of to_json, as the app's page shows it."""
+    if component is None:
+        return ""
+    if isinstance(component, list):
+        return "".join(render(child) for child in component)
+    if not isinstance(component, dict):
+        return html.escape(str(component), quote=False)
+    kind, namespace, props = component["type"], component["namespace"], component["props"]
+    classes = [props["className"]] if props.get("className") else []
+    if namespace == "dash_html_components":
+        tag = kind.lower()
+    elif (namespace, kind) == ("dash_core_components", "Markdown"):
+        children = props.get("children") or ""
+        tag, props = "div", dict(props, children=None, _html=markdown_html(
+            children if isinstance(children, str) else "\n".join(children)))
+    elif (namespace, kind) == ("dash_core_components", "Graph"):
+        # Plotted into by the page's script
+        tag, props = "div", dict(props, children=None)
+    elif (namespace, kind) == ("dash_core_components", "Link"):
+        tag = "a"
+    elif (namespace, kind) in (("dash_core_components", "Store"), ("dash_core_components", "Location")):
+        return ""
+    elif (namespace, kind) == ("dash_bootstrap_components", "Row"):
+        tag, classes = "div", ["row"] + classes
+    elif (namespace, kind) == ("dash_bootstrap_components", "Col"):
+        tag, classes = "div", [f"col-{props['width']}" if props.get("width") else "col"] + classes
+    else:
+        raise ValueError(f"cannot render {namespace}.{kind} statically")
+    attributes = "".join(f' {name}="{html.escape(str(value))}"' for name, value in (
+        ("id", props.get("id")), ("class", " ".join(classes) or None), ("href", props.get("href")),
+        ("style", _style(props["style"]) if props.get("style") else None)) if value is not None)
+    return f"<{tag}{attributes}>{props.get('_html') or render(props.get('children'))}</{tag}>"
+
+
+def _set_outputs(tree, outputs):
+    """Give the components of `tree` with the ids in `outputs` those children, in place."""
+    if isinstance(tree, list):
+        for child in tree:
+            _set_outputs(child, outputs)
+    elif isinstance(tree, dict) and "props" in tree:
+        if tree["props"].get("id") in outputs:
+            tree["props"]["children"] = outputs[tree["props"]["id"]]
+        _set_outputs(tree["props"].get("children"), outputs)
+
+
+def _find(tree, component_id):
+    """The component of `tree` with id `component_id`, or None."""
+    if isinstance(tree, list):
+        return next((found for child in tree if (found := _find(child, component_id)) is not None), None)
+    if isinstance(tree, dict) and "props" in tree:
+        if tree["props"].get("id") == component_id:
+            return tree
+        return _find(tree["props"].get("children"), component_id)
+    return None
+
+
+def render_page(layout, initial_outputs):
+    """The map page's HTML from its layout and display_info's outputs before any click."""
+    layout = to_json(layout)
+    _set_outputs(layout, to_json(initial_outputs))
+    return render(layout)
+
+
+def map_countries(figure):
+    """The ISO-3 code and hover name of every country on the map figure."""
+    trace = figure["data"][0]
+    return {customdata[0]: name for customdata, name in zip(trace["customdata"], trace["hovertext"])}
+
+
+def click_data(iso, name):
+    """The clickData of a click on the country `iso`, as the map's Graph reports it."""
+    return {"points": [{"location": iso, "hovertext": name, "customdata": [iso]}]}
+
+
+def export(out_dir=OUT_DIR):
+    """
+    Write the static site to `out_dir`, replacing a previous export there. Refuses
+    (ValueError) to touch a folder that is neither empty nor an export. Returns the
+    number of files written.
+    """
+    figure = to_json(world_map.fig)
+    countries = {iso: dict(zip(CALLBACK_OUTPUTS, (render(output) for output in to_json(
+        world_map.display_info(click_data(iso, name))))))
+        for iso, name in map_countries(figure).items()}
+    files = {"figure.json": figure}
+    files.update({f"countries/{iso}.json": outputs for iso, outputs in countries.items()})
+    encoded = {name: json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+               for name, data in files.items()}
+    digest = hashlib.sha256()
+    for name in sorted(encoded):
+        digest.update(name.encode() + b"\0" + encoded[name])
+    data_dir = f"data/{digest.hexdigest()[:12]}/"
+
+    if os.path.isdir(out_dir) and os.listdir(out_dir) and not os.path.exists(os.path.join(out_dir, MARKER)):
+        raise ValueError(f"{out_dir} is not empty and holds no previous export; refusing to replace it")
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    open(os.path.join(out_dir, MARKER), "w").close()
+    for name, data in encoded.items():
+        path = os.path.join(out_dir, data_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    plotly_js = f"plotly-{plotly.__version__}.min.js"
+    shutil.copy(os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js"),
+                os.path.join(out_dir, plotly_js))
+    picker = "null"
+    version = topojson_assets.assets_version()
+    if version is not None:
+        urls = {level: f"topojson/{version}/{level}/" for level in topojson_assets.LEVEL_NAMES}
+        for level in topojson_assets.LEVEL_NAMES:
+            shutil.copytree(os.path.join(topojson_assets.ASSETS_DIR, level), os.path.join(out_dir, urls[level]))
+        picker = topojson_assets.viewport_picker(urls, map_width=900).strip()
+    page = render_page(world_map.map_layout, dict(zip(CALLBACK_OUTPUTS, world_map.display_info(None))))
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(PAGE.format(title=html.escape(world_map.app.title), plotly_js=plotly_js, page=page,
+                            data=data_dir, picker=picker))
+    # Every file but the marker, topojson levels included
+    return sum(len(files) for _, _, files in os.walk(out_dir)) - 1
+
+
+def check(out_dir=OUT_DIR):
+    """
+    Compare the bundle in `out_dir`, served by a plain file server, with the live
+    app. Returns the mismatches, empty when the bundle behaves like the app.
+    """
+    import functools
+    import http.server
+    import threading
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    static = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=out_dir))
+    threading.Thread(target=static.serve_forever, daemon=True).start()
+    try:
+        return _compare(f"http://127.0.0.1:{static.server_port}/")
+    finally:
+        static.shutdown()
+        static.server_close()
+
+
+def _compare(base):
+    """The mismatches between the bundle served at `base` and the live app."""
+    import urllib.request
+
+    def fetch(path):
+        with urllib.request.urlopen(base + path) as response:
+            return response.read()
+
+    live = world_map.app.server.test_client()
+
+    def display_info(click_data):
+        response = live.post("/_dash-update-component", json={
+            "output": ".." + "...".join(f"{name}.children" for name in CALLBACK_OUTPUTS) + "..",
+            "outputs": [{"id": name, "property": "children"} for name in CALLBACK_OUTPUTS],
+            "inputs": [{"id": "world-map", "property": "clickData", "value": click_data}],
+            "changedPropIds": ["world-map.clickData"] if click_data else [], "state": []})
+        outputs = response.get_json()["response"]
+        return {name: outputs[name]["children"] for name in CALLBACK_OUTPUTS}
+
+    mismatches = []
+    index = fetch("index.html").decode("utf-8")
+    data_dir = re.search(r'var DATA = "([^"]+)"', index)[1]
+    for source in re.findall(r'<script src="([^"]+)"', index):
+        fetch(source)
+    layout = live.get("/_dash-layout").get_json()
+    page = render_page(_find(layout, "page")["props"]["children"], display_info(None))
+    if f'<div id="page">{page}</div>' not in index:
+        mismatches.append("index.html: page differs from the app's layout")
+
+    store = _find(layout, "world-map-figure")
+    live_figure = store["props"]["data"] if store and store["props"].get("data") else \
+        _find(layout, "world-map")["props"]["figure"]
+    if json.loads(fetch(data_dir + "figure.json")) != live_figure:
+        mismatches.append("figure.json: differs from the app's figure")
+    for url in re.findall(r'"(topojson/[^"]+/)"', index):
+        fetch(url + topojson_assets.SERVED_NAME)
+
+    for iso, name in map_countries(live_figure).items():
+        expected = {key: render(value) for key, value in display_info(click_data(iso, name)).items()}
+        exported = json.loads(fetch(f"{data_dir}countries/{iso}.json"))
+        if exported != expected:
+            mismatches.append(f"countries/{iso}.json: differs from display_info for {name}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=("export", "check"))
+    parser.add_argument("out_dir", nargs="?", default=OUT_DIR)
+    args = parser.parse_args()
+    if args.command == "export":
+        try:
+            print(f"wrote {export(args.out_dir)} files to {args.out_dir}")
+        except ValueError as error:
+            parser.error(str(error))
+    else:
+        mismatches = check(args.out_dir)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} mismatches with the live app")
+        raise SystemExit(1 if mismatches else 0)
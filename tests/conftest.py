@@ -0,0 +1,21 @@
+import pytest
+
+from q_learning.envs import make_env
+
+# The notebook's tabular settings, over fewer episodes
+TABULAR_SETTINGS = {"max_steps": 100, "alpha": 0.8, "gamma": 0.95, "epsilon_init": 1.0, "epsilon_min": 0.01,
+                    "epsilon_decay": 0.995}
+
+
+@pytest.fixture
+def env():
+    """A slippery 4x4 FrozenLake, so that runs depend on the environment's RNG too."""
+    env = make_env(is_slippery=True)
+    yield env
+    env.close()
+
+
+@pytest.fixture
+def tabular_args():
+    """Positional arguments of train_q_table and train_linear_agent after env and num_episodes."""
+    return tuple(TABULAR_SETTINGS.values())
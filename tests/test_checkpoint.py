@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from q_learning import train_linear_agent, train_q_lambda, train_q_table
+
+torch = pytest.importorskip("torch")
+from q_learning.dqn import train_dqn_frozenlake  # noqa: E402
+
+
+def network_values(network):
+    return torch.cat([p.flatten() for p in network.parameters()]).detach().numpy()
+
+
+def check_resume(train, num_episodes, extract, checkpoint_dir):
+    """A run interrupted at num_episodes and resumed to 2 * num_episodes matches one run straight through."""
+    expected_model, expected_rewards = train(2 * num_episodes, None)
+    train(num_episodes, str(checkpoint_dir))
+    # A fresh call picks up from the checkpoint written at the interruption
+    resumed_model, resumed_rewards = train(2 * num_episodes, str(checkpoint_dir))
+    assert resumed_rewards == expected_rewards
+    np.testing.assert_array_equal(extract(resumed_model), extract(expected_model))
+
+
+def test_tabular_resume(env, tabular_args, tmp_path):
+    check_resume(lambda n, ckpt: train_q_table(env, n, *tabular_args, seed=0, checkpoint_dir=ckpt,
+                                               checkpoint_every=100),
+                 200, lambda Q: Q, tmp_path)
+
+
+def test_tabular_sparse_resume(env, tabular_args, tmp_path):
+    check_resume(lambda n, ckpt: train_q_table(env, n, *tabular_args, seed=0, checkpoint_dir=ckpt,
+                                               checkpoint_every=100, q_storage="sparse"),
+                 200, lambda Q: Q.to_dense(), tmp_path)
+
+
+@pytest.mark.parametrize("variant,traces", [("watkins", "dense"), ("peng", "sparse")])
+def test_q_lambda_resume(env, tabular_args, variant, traces, tmp_path):
+    check_resume(lambda n, ckpt: train_q_lambda(env, n, *tabular_args, variant=variant, traces=traces, seed=0,
+                                                checkpoint_dir=ckpt, checkpoint_every=100),
+                 200, lambda Q: Q, tmp_path)
+
+
+def test_linear_resume(env, tabular_args, tmp_path):
+    check_resume(lambda n, ckpt: train_linear_agent(env, n, *tabular_args, seed=0, checkpoint_dir=ckpt,
+                                                    checkpoint_every=100),
+                 200, lambda agent: agent.weights, tmp_path)
+
+
+@pytest.mark.parametrize("options", [{}, {"index_states": True, "prioritized": True}])
+def test_dqn_resume(options, tmp_path):
+    check_resume(lambda n, ckpt: train_dqn_frozenlake(num_episodes=n, seed=0, checkpoint_dir=ckpt,
+                                                      checkpoint_every=50, **options),
+                 100, network_values, tmp_path)
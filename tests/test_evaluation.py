@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from q_learning import MapCache, evaluate_policy, greedy_policy, make_env, policy_grid, shortest_path_policy
+from q_learning.evaluation import ACTION_SYMBOLS
+
+
+@pytest.fixture(scope="module")
+def desc(tmp_path_factory):
+    return MapCache(str(tmp_path_factory.mktemp("maps"))).load_map(32, 0.2, 0)
+
+
+def test_greedy_policy_and_grid_match_per_state_loop(desc):
+    Q = np.random.default_rng(0).normal(size=(desc.size, 4))
+    policy = greedy_policy(Q)
+    np.testing.assert_array_equal(policy, [np.argmax(Q[state]) for state in range(desc.size)])
+    grid = policy_grid(policy, desc)
+    for row in range(desc.shape[0]):
+        for col in range(desc.shape[1]):
+            cell = desc[row, col].decode()
+            expected = ACTION_SYMBOLS[policy[row * desc.shape[1] + col]] if cell == "F" else cell
+            assert grid[row, col] == expected
+
+
+def test_shortest_path_policy_always_reaches_the_goal(desc):
+    policy = shortest_path_policy(desc)
+    result = evaluate_policy(policy, desc, num_episodes=100, max_steps=4 * desc.shape[0], seed=0)
+    assert result["success_rate"] == 1.0
+
+    # Played through the env, episode by episode, as evaluate_policy() does in lockstep
+    env = make_env(desc=desc, is_slippery=False)
+    state, _ = env.reset(seed=0)
+    for step in range(4 * desc.shape[0]):
+        state, reward, terminated, _, _ = env.step(int(policy[state]))
+        if terminated:
+            break
+    assert reward == 1.0
+    assert step + 1 == result["mean_length"]
+
+
+def test_slippery_evaluation_agrees_with_env_rollouts():
+    env = make_env(is_slippery=True)
+    policy = shortest_path_policy(env.unwrapped.desc)
+    result = evaluate_policy(policy, env=env, num_episodes=20000, seed=0, confidence=0.999)
+    successes = 0
+    env.reset(seed=1)
+    for _ in range(2000):
+        state, _ = env.reset()
+        for _ in range(100):
+            state, reward, terminated, _, _ = env.step(int(policy[state]))
+            if terminated:
+                successes += reward == 1.0
+                break
+    # The env's rate lies within the evaluation's interval, widened by the loop's own sampling error
+    assert result["ci_low"] - 0.03 <= successes / 2000 <= result["ci_high"] + 0.03
@@ -0,0 +1,88 @@
+import http.client
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from q_learning import GridFeatures, LinearQAgent, export_policy, generate_map, greedy_policy, serve_policy
+
+SIZE = 16
+STATE_SIZE = SIZE * SIZE
+
+
+def q_table():
+    return np.random.default_rng(0).normal(size=(STATE_SIZE, 4))
+
+
+def linear_agent():
+    rng = np.random.default_rng(0)
+    agent = LinearQAgent(STATE_SIZE, 4, 0.1, 0.99, 0.0, 0.0, 1.0, features=GridFeatures(generate_map(SIZE, 0.1, 0)),
+                         rng=rng)
+    agent.weights = rng.normal(size=agent.weights.shape)
+    return agent
+
+
+def dqn_network():
+    torch = pytest.importorskip("torch")
+    from q_learning.dqn import DQNetwork
+
+    torch.manual_seed(0)
+    return DQNetwork(STATE_SIZE, 4, embed=True)
+
+
+def q_function(model):
+    """The model's Q-values of every state, and something greedy_policy() accepts."""
+    if isinstance(model, np.ndarray):
+        return model, model
+    if isinstance(model, LinearQAgent):
+        return model.predict_batch(np.arange(STATE_SIZE)), model
+    from q_learning.dqn import batch_q_function
+    return batch_q_function(model)(np.arange(STATE_SIZE)), batch_q_function(model)
+
+
+@pytest.fixture(params=[q_table, linear_agent, dqn_network], ids=["Q-table", "linear", "DQN"])
+def model(request):
+    return request.param()
+
+
+@pytest.mark.parametrize("q_values", [None, "uint8"])
+def test_export_acts_greedily(model, q_values, tmp_path):
+    q, greedy_model = q_function(model)
+    policy = export_policy(model, str(tmp_path / "policy"), STATE_SIZE, q_values=q_values)
+    states = np.arange(STATE_SIZE)
+    np.testing.assert_array_equal(policy.act(states), greedy_policy(greedy_model, STATE_SIZE))
+    assert [policy(state) for state in range(5)] == policy.act(states[:5]).tolist()
+    if q_values == "uint8":
+        # Codes round to the nearest of 256 levels between each row's min and max
+        step = (q.max(axis=1) - q.min(axis=1)) / 255
+        assert np.all(np.abs(policy.q_values(states) - q) <= step[:, None] / 2 + 1e-5)
+
+
+@pytest.fixture
+def server(tmp_path):
+    policy = export_policy(q_table(), str(tmp_path / "policy"))
+    server = serve_policy(policy, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    connection = http.client.HTTPConnection(*server.server_address)
+    yield connection
+    connection.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_serve_json_and_binary(server):
+    states = np.random.default_rng(1).integers(STATE_SIZE, size=1000)
+    expected = greedy_policy(q_table())[states]
+    server.request("POST", "/act", json.dumps({"states": states.tolist()}), {"Content-Type": "application/json"})
+    np.testing.assert_array_equal(json.loads(server.getresponse().read())["actions"], expected)
+    server.request("POST", "/act", states.astype("<i4").tobytes(), {"Content-Type": "application/octet-stream"})
+    np.testing.assert_array_equal(np.frombuffer(server.getresponse().read(), dtype=np.int8), expected)
+
+
+@pytest.mark.parametrize("states", [[-1], [STATE_SIZE], [0.5]])
+def test_serve_rejects_bad_states(server, states):
+    server.request("POST", "/act", json.dumps({"states": states}), {"Content-Type": "application/json"})
+    response = server.getresponse()
+    assert response.status == 400
+    assert "states must be" in json.loads(response.read())["error"]
@@ -0,0 +1,16 @@
+import numpy as np
+
+from q_learning import MapCache, TransitionTable, generate_map, has_path
+
+
+def test_cached_map_and_table_match_generated_ones(tmp_path):
+    desc = generate_map(64, 0.2, 3)
+    assert has_path(desc)
+    table = TransitionTable.from_desc(desc, is_slippery=True)
+    for cache in (MapCache(str(tmp_path)), MapCache(str(tmp_path))):
+        # Generated and stored by the first cache, loaded from disk by the second
+        np.testing.assert_array_equal(cache.load_map(64, 0.2, 3), desc)
+        cached = cache.load_table(64, 0.2, 3, is_slippery=True)
+        assert cached.start_state == table.start_state
+        for name in MapCache.TABLE_FIELDS:
+            np.testing.assert_array_equal(getattr(cached, name), getattr(table, name))
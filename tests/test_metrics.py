@@ -0,0 +1,83 @@
+import os
+import shutil
+
+import numpy as np
+
+from q_learning import MetricsLogger, RollingMean, read_metrics, train_q_table
+
+
+def log_rows(logger, episodes, rewards):
+    for episode, reward in zip(episodes, rewards):
+        logger.log(episode, reward, 1.0 / episode, loss=0.5 * reward, steps_per_sec=1000.0 + episode)
+
+
+def test_round_trip(tmp_path):
+    rewards = np.random.default_rng(0).integers(2, size=300).astype(float)
+    logger = MetricsLogger(str(tmp_path), window=100, flush_every=64)
+    log_rows(logger, range(1, 301), rewards)
+    logger.close()
+
+    metrics = read_metrics(str(tmp_path))
+    np.testing.assert_array_equal(metrics["episode"], np.arange(1, 301))
+    np.testing.assert_array_equal(metrics["reward"], rewards)
+    np.testing.assert_allclose(metrics["epsilon"], 1.0 / np.arange(1, 301))
+    np.testing.assert_array_equal(metrics["loss"], 0.5 * rewards)
+    np.testing.assert_array_equal(metrics["steps_per_sec"], 1000.0 + np.arange(1, 301))
+    # The incremental rolling mean is the trailing 100-episode mean (over fewer episodes at first)
+    expected = [rewards[max(0, i - 99):i + 1].mean() for i in range(300)]
+    np.testing.assert_allclose(metrics["reward_mean"], expected)
+
+    tail = read_metrics(str(tmp_path), start_row=250, columns=["episode"])
+    assert list(tail) == ["episode"]
+    np.testing.assert_array_equal(tail["episode"], np.arange(251, 301))
+
+
+def test_rolling_mean():
+    rolling = RollingMean(3)
+    assert [rolling.update(value) for value in [3, 6, 9, 12]] == [3, 4.5, 6, 9]
+
+
+def test_reader_only_sees_complete_rows(tmp_path):
+    logger = MetricsLogger(str(tmp_path))
+    log_rows(logger, range(1, 11), np.ones(10))
+    logger.close()
+    # A flush caught halfway: one column has a row more, another half a row more
+    with open(tmp_path / "episode.bin", "ab") as f:
+        np.array([11], dtype="<i8").tofile(f)
+    with open(tmp_path / "reward.bin", "ab") as f:
+        f.write(b"\0" * 4)
+    assert len(read_metrics(str(tmp_path))["episode"]) == 10
+
+
+def test_resume_truncates_rows_after_the_checkpoint(tmp_path):
+    rewards = np.random.default_rng(1).integers(2, size=200).astype(float)
+    straight = MetricsLogger(str(tmp_path / "straight"), window=50)
+    log_rows(straight, range(1, 201), rewards)
+    straight.close()
+
+    # A run logs 150 episodes, then resumes from a checkpoint at episode 120
+    interrupted = MetricsLogger(str(tmp_path / "resumed"), window=50)
+    log_rows(interrupted, range(1, 151), rewards)
+    interrupted.close()
+    resumed = MetricsLogger(str(tmp_path / "resumed"), start_episode=120, window=50)
+    assert len(read_metrics(str(tmp_path / "resumed"))["episode"]) == 120
+    log_rows(resumed, range(121, 201), rewards[120:])
+    resumed.close()
+
+    expected, actual = read_metrics(str(tmp_path / "straight")), read_metrics(str(tmp_path / "resumed"))
+    for name in MetricsLogger.COLUMNS:
+        np.testing.assert_array_equal(actual[name], expected[name])
+
+
+def test_trainer_resume_keeps_one_row_per_episode(env, tabular_args, tmp_path):
+    checkpoints, metrics = str(tmp_path / "checkpoints"), str(tmp_path / "metrics")
+    _, expected_rewards = train_q_table(env, 200, *tabular_args, seed=0)
+    train_q_table(env, 150, *tabular_args, seed=0, checkpoint_dir=checkpoints, checkpoint_every=100,
+                  metrics_dir=metrics)
+    # Crash after episode 150 was logged but before its checkpoint was written
+    shutil.rmtree(os.path.join(checkpoints, "episode-000000150"))
+    train_q_table(env, 200, *tabular_args, seed=0, checkpoint_dir=checkpoints, checkpoint_every=100,
+                  metrics_dir=metrics)
+    logged = read_metrics(metrics)
+    np.testing.assert_array_equal(logged["episode"], np.arange(1, 201))
+    np.testing.assert_array_equal(logged["reward"], expected_rewards)
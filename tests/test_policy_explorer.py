@@ -0,0 +1,60 @@
+import subprocess
+import sys
+
+import diskcache
+import psutil
+import pytest
+
+import policy_explorer
+
+CONFIG = {"trainer": "tabular", "map": "4x4", "slippery": False, "episodes": 100, "alpha": 0.1, "gamma": 0.99,
+          "epsilon_decay": 0.999, "seed": 0}
+
+
+@pytest.fixture(autouse=True)
+def job_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(policy_explorer, "jobs", diskcache.Cache(str(tmp_path / "jobs")))
+    monkeypatch.setattr(policy_explorer, "results", diskcache.Cache(str(tmp_path / "results")))
+
+
+@pytest.fixture
+def dead_process():
+    """The (pid, start time) of a process that has exited, as a killed job leaves behind."""
+    process = psutil.Popen([sys.executable, "-c", "pass"])
+    holder = process.pid, process.create_time()
+    process.wait()
+    return holder
+
+
+def test_slots_of_dead_processes_are_reclaimed(dead_process):
+    policy_explorer.jobs.set("slots", [dead_process] * policy_explorer.MAX_JOBS)
+    holder = policy_explorer.current_process()
+    policy_explorer.acquire_slot(holder)
+    assert policy_explorer.jobs.get("slots") == [holder]
+    policy_explorer.release_slot(holder)
+    assert policy_explorer.jobs.get("slots") == []
+
+
+def test_jobs_of_dead_owners_are_taken_over(dead_process):
+    key = policy_explorer.job_key(CONFIG)
+    policy_explorer.jobs.set(("owner", key), dead_process)
+    assert policy_explorer.claim_job(key, policy_explorer.current_process())
+    assert not policy_explorer.claim_job(key, dead_process)
+
+
+def test_killed_job_does_not_block_a_relaunch(tmp_path):
+    # A job holding the slot and the ownership, killed the way Cancel kills it
+    code = ("import diskcache, policy_explorer, time; "
+            f"policy_explorer.jobs = diskcache.Cache({str(tmp_path / 'jobs')!r}); "
+            "holder = policy_explorer.current_process(); "
+            f"policy_explorer.claim_job(policy_explorer.job_key({CONFIG!r}), holder); "
+            "policy_explorer.acquire_slot(holder); print('ready', flush=True); time.sleep(60)")
+    job = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True)
+    assert job.stdout.readline().strip() == "ready"
+    job.kill()
+    job.wait()
+
+    snapshot = policy_explorer.run_job(dict(CONFIG), lambda snapshot: None)
+    assert snapshot["status"] == "done"
+    assert policy_explorer.jobs.get("slots") == []
+    assert policy_explorer.results.get(policy_explorer.job_key(CONFIG)) == snapshot
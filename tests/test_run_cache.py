@@ -0,0 +1,75 @@
+import contextlib
+import io
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from q_learning import RunCache, make_env, train_linear_agent, train_q_table
+
+from conftest import TABULAR_SETTINGS
+
+
+def model_values(model):
+    if hasattr(model, "state_dict"):
+        return np.concatenate([p.detach().numpy().ravel() for p in model.parameters()])
+    return getattr(model, "weights", model)
+
+
+def tabular_run(trainer):
+    return trainer, (make_env(is_slippery=True), 200, *TABULAR_SETTINGS.values()), {}
+
+
+def dqn_run():
+    pytest.importorskip("torch")
+    from q_learning.dqn import train_dqn_frozenlake
+
+    return train_dqn_frozenlake, (), dict(env=make_env(is_slippery=True), num_episodes=50)
+
+
+@pytest.mark.parametrize("run", [lambda: tabular_run(train_q_table), lambda: tabular_run(train_linear_agent),
+                                 dqn_run], ids=["tabular", "linear", "dqn"])
+def test_cached_run_matches_trained_run(run, tmp_path):
+    trainer, args, kwargs = run()
+    cache = RunCache(str(tmp_path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        trained, rewards = cache.run(trainer, *args, seed=0, **kwargs)
+        cached, cached_rewards = cache.run(trainer, *args, seed=0, **kwargs)
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert cached_rewards == rewards
+    np.testing.assert_array_equal(model_values(cached), model_values(trained))
+
+
+def _cached_mean_reward(directory, seed):
+    _, rewards = RunCache(directory).run(train_q_table, make_env(is_slippery=True), 200, *TABULAR_SETTINGS.values(),
+                                         seed=seed)
+    return float(np.mean(rewards))
+
+
+def test_racing_sweep_stores_each_run_once(tmp_path):
+    seeds = [0, 1, 2]
+    # Both workers submit every point, so writes of the same run race
+    points = [(str(tmp_path), seed) for seed in seeds for _ in range(2)]
+    with multiprocessing.Pool(2) as pool:
+        first = pool.starmap(_cached_mean_reward, points)
+        repeated = pool.starmap(_cached_mean_reward, points)
+    expected = [float(np.mean(train_q_table(make_env(is_slippery=True), 200, *TABULAR_SETTINGS.values(),
+                                            seed=seed)[1])) for _, seed in points]
+    assert first == repeated == expected
+    assert len(RunCache(str(tmp_path)).entries()) == len(seeds)
+
+
+def test_eviction_keeps_the_most_recently_used_runs(tmp_path):
+    env = make_env(is_slippery=True)
+    cache = RunCache(str(tmp_path))
+    for seed in range(4):
+        cache.run(train_q_table, env, 200, *TABULAR_SETTINGS.values(), seed=seed)
+    # Using the oldest run makes it the most recent
+    cache.run(train_q_table, env, 200, *TABULAR_SETTINGS.values(), seed=0)
+    cache.max_bytes = cache.size() // 2
+    cache.evict()
+    assert 0 < len(cache.entries()) < 4
+    assert cache.size() <= cache.max_bytes
+    hits = cache.hits
+    cache.run(train_q_table, env, 200, *TABULAR_SETTINGS.values(), seed=0)
+    assert cache.hits == hits + 1
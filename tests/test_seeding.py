@@ -0,0 +1,56 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from q_learning import GridFeatures, train_linear_agent, train_q_lambda, train_q_table
+
+torch = pytest.importorskip("torch")
+from q_learning import dqn  # noqa: E402
+
+
+def network_values(network):
+    return torch.cat([p.flatten() for p in network.parameters()]).detach().numpy()
+
+
+def check_reproducible(train, extract):
+    """Two runs with one seed are identical, and a run with another seed is not."""
+    (first, first_rewards), (same, same_rewards), (other, other_rewards) = train(0), train(0), train(1)
+    assert first_rewards == same_rewards
+    np.testing.assert_array_equal(extract(first), extract(same))
+    assert first_rewards != other_rewards or not np.array_equal(extract(first), extract(other))
+
+
+def test_tabular_seeding(env, tabular_args):
+    check_reproducible(lambda seed: train_q_table(env, 300, *tabular_args, seed=seed), lambda Q: Q)
+
+
+@pytest.mark.parametrize("variant", ["watkins", "peng"])
+def test_q_lambda_seeding(env, tabular_args, variant):
+    check_reproducible(lambda seed: train_q_lambda(env, 300, *tabular_args, variant=variant, seed=seed),
+                       lambda Q: Q)
+
+
+@pytest.mark.parametrize("features", [False, True])
+def test_linear_seeding(env, tabular_args, features):
+    options = {"features": GridFeatures(env.unwrapped.desc), "batch_size": 8} if features else {}
+    check_reproducible(lambda seed: train_linear_agent(env, 300, *tabular_args, seed=seed, **options),
+                       lambda agent: agent.weights)
+
+
+@pytest.mark.parametrize("options", [{}, {"index_states": True, "prioritized": True}])
+def test_dqn_seeding(options):
+    default_state = dqn._default_rng.bit_generator.state
+    check_reproducible(lambda seed: dqn.train_dqn_frozenlake(num_episodes=150, seed=seed, **options),
+                       network_values)
+    # A seeded run draws only from its own Generator, never select_action's module-level fallback
+    assert dqn._default_rng.bit_generator.state == default_state
+
+
+def test_seeding_a_tabular_run_does_not_import_torch():
+    code = ("import sys; from q_learning import make_env, train_q_table; "
+            "train_q_table(make_env(), 10, 100, 0.8, 0.95, 1.0, 0.01, 0.995, seed=0); "
+            "print('torch' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
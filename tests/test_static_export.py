@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("dash")
+import static_export  # noqa: E402
+
+
+def test_static_export_matches_live_app(tmp_path):
+    out_dir = tmp_path / "site"
+    written = static_export.export(str(out_dir))
+    assert written == len([path for path in out_dir.rglob("*") if path.is_file()]) - 1
+    assert static_export.check(str(out_dir)) == []
+    # A previous export is replaced
+    assert static_export.export(str(out_dir)) == written
+
+
+def test_export_refuses_a_folder_it_did_not_write(tmp_path):
+    (tmp_path / "notes.txt").write_text("keep me")
+    with pytest.raises(ValueError, match="refusing"):
+        static_export.export(str(tmp_path))
+    assert (tmp_path / "notes.txt").read_text() == "keep me"
+
+
+def test_check_reports_a_stale_shard(tmp_path):
+    out_dir = tmp_path / "site"
+    static_export.export(str(out_dir))
+    shard = next(out_dir.glob("data/*/countries/AUS.json"))
+    shard.write_text(shard.read_text().replace("Australia", "Austral"))
+    assert static_export.check(str(out_dir)) == ["countries/AUS.json: differs from display_info for Australia"]
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from q_learning import make_env, train_q_table
+from q_learning.envs import TransitionTable
+from q_learning.tabular_jit import jit_available, train_q_table_jit
+
+
+@pytest.mark.parametrize("is_slippery", [False, True])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_jit_matches_train_q_table(tabular_args, is_slippery, seed):
+    python_env, jit_env = make_env(is_slippery=is_slippery), make_env(is_slippery=is_slippery)
+    Q, rewards = train_q_table(python_env, 300, *tabular_args, seed=seed)
+    Q_jit, rewards_jit = train_q_table_jit(jit_env, 300, *tabular_args, seed=seed)
+    np.testing.assert_array_equal(Q_jit, Q)
+    assert rewards_jit == rewards
+    # The environment's RNG is left where stepping it would have left it
+    assert jit_env.unwrapped.np_random.bit_generator.state == python_env.unwrapped.np_random.bit_generator.state
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_jit_from_table_matches_train_q_table(tabular_args, lazy):
+    env = make_env(is_slippery=True, lazy=lazy)
+    table = TransitionTable.from_env(env)
+    Q, rewards = train_q_table(env, 300, *tabular_args, seed=3)
+    Q_jit, rewards_jit = train_q_table_jit(None, 300, *tabular_args, seed=3, table=table)
+    np.testing.assert_array_equal(Q_jit, Q)
+    assert rewards_jit == rewards
+
+
+@pytest.mark.skipif(not jit_available(), reason="numba is not installed")
+def test_jit_matches_fallback(env, tabular_args):
+    Q_jit, rewards_jit = train_q_table_jit(env, 300, *tabular_args, seed=0)
+    Q_python, rewards_python = train_q_table_jit(env, 300, *tabular_args, seed=0, use_jit=False)
+    np.testing.assert_array_equal(Q_jit, Q_python)
+    assert rewards_jit == rewards_python
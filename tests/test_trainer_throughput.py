@@ -0,0 +1,93 @@
+"""
+Steps/sec of every trainer under pytest-benchmark. Each round trains from scratch
+with the same seed, so every round takes the same environment steps.
+"""
+import pytest
+
+from q_learning import make_env, train_linear_agent, train_q_lambda, train_q_table
+from q_learning.benchmarks.common import StepCounter
+
+from conftest import TABULAR_SETTINGS
+
+pytest.importorskip("pytest_benchmark")
+
+EPISODES = {"tabular": 1000, "linear": 500, "dqn": 100}
+
+
+def tabular_args(num_episodes):
+    return (num_episodes, *TABULAR_SETTINGS.values())
+
+
+def measure(benchmark, train, rounds=3):
+    """Benchmark `train(make_env)`, with `make_env` handing out step-counting environments; the steps per round."""
+    envs = []
+
+    def counted_env(is_slippery=True):
+        envs.append(StepCounter(make_env(is_slippery=is_slippery)))
+        return envs[-1]
+
+    def train_once():
+        envs.clear()
+        train(counted_env)
+
+    benchmark.pedantic(train_once, rounds=rounds, iterations=1, warmup_rounds=1)
+    steps = sum(env.steps for env in envs)
+    return record(benchmark, steps)
+
+
+def record(benchmark, steps):
+    assert steps > 0
+    benchmark.extra_info["steps"] = steps
+    if benchmark.stats is not None:
+        # None under --benchmark-disable, which runs each benchmark once untimed
+        benchmark.extra_info["steps_per_sec"] = steps / benchmark.stats.stats.mean
+    return steps
+
+
+@pytest.mark.benchmark(group="trainers")
+def test_tabular_throughput(benchmark):
+    measure(benchmark, lambda env: train_q_table(env(), *tabular_args(EPISODES["tabular"]), seed=0))
+
+
+@pytest.mark.benchmark(group="trainers")
+def test_tabular_jit_throughput(benchmark):
+    from q_learning.envs import TransitionTable
+    from q_learning.tabular_jit import train_q_table_jit
+
+    # The compiled trainer steps a transition table, not the env; it takes the same steps as train_q_table
+    env = StepCounter(make_env(is_slippery=True))
+    train_q_table(env, *tabular_args(EPISODES["tabular"]), seed=0)
+    table = TransitionTable.from_env(env)
+    benchmark.pedantic(lambda: train_q_table_jit(None, *tabular_args(EPISODES["tabular"]), seed=0, table=table),
+                       rounds=3, iterations=1, warmup_rounds=1)
+    record(benchmark, env.steps)
+
+
+@pytest.mark.benchmark(group="trainers")
+@pytest.mark.parametrize("variant,traces", [("watkins", "dense"), ("peng", "sparse")])
+def test_q_lambda_throughput(benchmark, variant, traces):
+    measure(benchmark, lambda env: train_q_lambda(env(), *tabular_args(EPISODES["tabular"]), variant=variant,
+                                                  traces=traces, seed=0))
+
+
+@pytest.mark.benchmark(group="trainers")
+def test_linear_throughput(benchmark):
+    measure(benchmark, lambda env: train_linear_agent(env(), *tabular_args(EPISODES["linear"]), seed=0))
+
+
+@pytest.mark.benchmark(group="trainers")
+@pytest.mark.parametrize("options", [{}, {"index_states": True}], ids=["one-hot", "index"])
+def test_dqn_throughput(benchmark, options):
+    pytest.importorskip("torch")
+    from q_learning.dqn import train_dqn_frozenlake
+
+    measure(benchmark, lambda env: train_dqn_frozenlake(env=env(), num_episodes=EPISODES["dqn"], seed=0,
+                                                        **options))
+
+
+@pytest.mark.benchmark(group="trainers")
+def test_dqn_vectorized_throughput(benchmark):
+    pytest.importorskip("torch")
+    from q_learning.dqn import train_dqn_vectorized
+
+    measure(benchmark, lambda env: train_dqn_vectorized(env_fn=env, num_episodes=EPISODES["dqn"], seed=0))
@@ -0,0 +1,317 @@
+"""
+Pre-simplified world topojson for the choropleth, served by the app itself.
+
+By default plotly.js fetches its world topojson (world_110m.json, or world_50m.json
+at geo.resolution 50) from cdn.plot.ly when a geo figure first renders. `build`
+downloads those files once, or takes a local copy of them, and writes simplified
+versions to ASSETS_DIR, one folder per level in LEVELS. Each level targets a
+maximum width in device pixels: every arc is simplified with Douglas-Peucker to
+half a pixel at that width, and coordinates are re-quantized to a quarter of
+that tolerance. Arcs are shared between neighbouring countries in topojson, so
+borders stay watertight. Each level is written as plain and gzipped JSON.
+
+`build` is a deploy step, never run by the app: until the levels are built the
+app leaves the topojson to the CDN. Hosts without network access build from a
+local copy of the files with --source (see README.md). The levels are written
+to a temporary folder and renamed into place, so running apps never see a
+partial build. register(server) serves the levels at /topojson/<version>/<level>/, with
+`version` a hash of the built files, so responses can be cached for a year and
+are still replaced when the assets are rebuilt. viewport_picker() is the
+clientside callback that picks the level from the width the map takes on the
+screen before the figure first renders.
+
+    python topojson_assets.py build [--source DIR] [--if-missing]
+    python topojson_assets.py measure --source DIR
+
+`measure` compares bytes, and first-render times with Playwright if it is
+installed, of every level against the default files.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+
+import numpy as np
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "topojson")
+# The files plotly.js requests from its default topojsonURL
+SOURCE_URL = "https://cdn.plot.ly/"
+SOURCE_NAMES = ("world_110m", "world_50m")
+# (level, source file, widest map in device pixels it is meant for; None for any width)
+LEVELS = (("small", "world_110m", 700), ("medium", "world_110m", 1400), ("large", "world_50m", None))
+LEVEL_NAMES = tuple(level for level, _, _ in LEVELS)
+LARGE_WIDTH = 2800
+# plotly.js asks for {scope}_{resolution}m.json; every level is served under the default resolution's name
+SERVED_NAME = "world_110m.json"
+CACHE_SECONDS = 365 * 24 * 3600
+FETCH_TIMEOUT = 30
+
+
+def fetch_sources(directory, base_url=SOURCE_URL, timeout=FETCH_TIMEOUT):
+    """Download plotly.js's world topojson files to `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    for name in SOURCE_NAMES:
+        with urllib.request.urlopen(f"{base_url}{name}.json", timeout=timeout) as response, \
+                open(os.path.join(directory, f"{name}.json"), "wb") as f:
+            shutil.copyfileobj(response, f)
+
+
+def decode_arcs(topology):
+    """Every arc of `topology` as an (n, 2) float array of longitude, latitude."""
+    transform = topology.get("transform")
+    arcs = []
+    for arc in topology["arcs"]:
+        points = np.array(arc, dtype=np.float64)[:, :2]
+        if transform is not None:
+            points = np.cumsum(points, axis=0) * transform["scale"] + transform["translate"]
+        arcs.append(points)
+    return arcs
+
+
+def simplify_arc(points, tolerance):
+    """
+    Douglas-Peucker: the points of the polyline that keep it within `tolerance` of
+    the original, endpoints always included. On a closed arc the point farthest
+    from the start is kept too, so rings keep at least three points.
+    """
+    n = len(points)
+    if n <= 2:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    if np.array_equal(points[0], points[-1]):
+        farthest = int(np.argmax(np.hypot(*(points - points[0]).T)))
+        keep[farthest] = True
+        stack = [(0, farthest), (farthest, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = points[last] - points[first]
+        offsets = points[first + 1:last] - points[first]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(*offsets.T)
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            middle = first + 1 + index
+            keep[middle] = True
+            stack += [(first, middle), (middle, last)]
+    return points[keep]
+
+
+def simplify_topology(topology, tolerance):
+    """
+    A copy of `topology` with every arc simplified to `tolerance` degrees and
+    quantized to a grid of tolerance / 4. Objects, ids and properties are kept.
+    """
+    arcs = [simplify_arc(points, tolerance) for points in decode_arcs(topology)]
+    every_point = np.concatenate(arcs)
+    translate = every_point.min(axis=0)
+    scale = np.array([tolerance / 4, tolerance / 4])
+    encoded = []
+    for points in arcs:
+        grid = np.rint((points - translate) / scale).astype(np.int64)
+        # Points that land on the same grid cell carry no shape; the endpoints always stay
+        duplicate = np.r_[False, np.all(grid[1:] == grid[:-1], axis=1)]
+        duplicate[-1] = False
+        grid = grid[~duplicate]
+        encoded.append(np.vstack([grid[:1], np.diff(grid, axis=0)]).tolist())
+    return dict(topology, arcs=encoded, transform={"scale": scale.tolist(), "translate": translate.tolist()})
+
+
+def level_tolerance(max_width):
+    """Half a pixel, in degrees of longitude, on a world map `max_width` pixels wide."""
+    return 360 / (max_width or LARGE_WIDTH) / 2
+
+
+def build(source=None, out_dir=ASSETS_DIR):
+    """
+    Write every level of LEVELS to `out_dir`, from plotly.js's files in the
+    directory `source` (downloaded from its CDN when None), replacing a previous
+    build only once every level is written. Returns the sizes in bytes.
+    """
+    if source is None:
+        with tempfile.TemporaryDirectory() as source:
+            fetch_sources(source)
+            return build(source, out_dir)
+    out_dir = out_dir.rstrip(os.sep)
+    tmp = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    sizes = {}
+    try:
+        for level, name, max_width in LEVELS:
+            with open(os.path.join(source, f"{name}.json")) as f:
+                topology = json.load(f)
+            data = json.dumps(simplify_topology(topology, level_tolerance(max_width)),
+                              separators=(",", ":")).encode()
+            directory = os.path.join(tmp, level)
+            os.makedirs(directory)
+            with open(os.path.join(directory, SERVED_NAME), "wb") as f:
+                f.write(data)
+            with gzip.open(os.path.join(directory, SERVED_NAME + ".gz"), "wb", compresslevel=9) as f:
+                f.write(data)
+            sizes[level] = len(data)
+        # A directory cannot be renamed over a non-empty one: move the old build aside first
+        old = f"{out_dir}.old-{os.getpid()}"
+        if os.path.exists(out_dir):
+            os.rename(out_dir, old)
+        os.rename(tmp, out_dir)
+        shutil.rmtree(old, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return sizes
+
+
+def assets_version(out_dir=ASSETS_DIR):
+    """A short hash of the built levels, or None if they have not been built."""
+    digest = hashlib.sha256()
+    for level in LEVEL_NAMES:
+        path = os.path.join(out_dir, level, SERVED_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def register(server, out_dir=ASSETS_DIR):
+    """
+    Serve the built levels from the Flask `server`. Returns the topojsonURL of
+    every level, or an empty dict if they have not been built (plotly.js then
+    falls back to its CDN).
+    """
+    from flask import request, send_from_directory
+
+    version = assets_version(out_dir)
+    if version is None:
+        return {}
+
+    @server.route(f"/topojson/{version}/<level>/<name>")
+    def topojson(level, name):
+        if level not in LEVEL_NAMES or name != SERVED_NAME:
+            return "unknown topojson", 404
+        directory = os.path.join(out_dir, level)
+        if request.accept_encodings["gzip"]:
+            response = send_from_directory(directory, name + ".gz", mimetype="application/json",
+                                           max_age=CACHE_SECONDS)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = send_from_directory(directory, name, mimetype="application/json", max_age=CACHE_SECONDS)
+        response.headers["Cache-Control"] = f"public, max-age={CACHE_SECONDS}, immutable"
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    return {level: f"/topojson/{version}/{level}/" for level in LEVEL_NAMES}
+
+
+def viewport_picker(urls, map_width):
+    """
+    A clientside callback function taking the figure and returning the Graph's
+    config, with the topojsonURL of the smallest level covering the map's width in
+    device pixels (at most `map_width` CSS pixels), and the figure.
+    """
+    thresholds = [[max_width, urls[level]] for level, _, max_width in LEVELS if max_width is not None]
+    return f"""
+        function(figure) {{
+            var pixels = Math.min(window.innerWidth, {map_width}) * (window.devicePixelRatio || 1);
+            var levels = {json.dumps(thresholds)};
+            var url = {json.dumps(urls[LEVELS[-1][0]])};
+            for (var i = levels.length - 1; i >= 0; i--) {{
+                if (pixels <= levels[i][0]) {{ url = levels[i][1]; }}
+            }}
+            return [{{topojsonURL: url}}, figure];
+        }}
+    """
+
+
+def _render_ms(browser, plotly_js, topojson_url, figure, repeats):
+    """Best first-render time, in milliseconds, of `figure` with the topojson at `topojson_url`."""
+    times = []
+    for _ in range(repeats):
+        # A new page each time: plotly.js keeps fetched topojson for the lifetime of a page
+        page = browser.new_page()
+        page.set_content('<div id="map"></div>')
+        page.add_script_tag(path=plotly_js)
+        times.append(page.evaluate("""async ([figure, url]) => {
+            const start = performance.now();
+            await Plotly.newPlot('map', figure.data, figure.layout, {topojsonURL: url});
+            return performance.now() - start;
+        }""", [figure, topojson_url]))
+        page.close()
+    return min(times)
+
+
+def measure(source, out_dir=ASSETS_DIR, repeats=5):
+    """
+    Bytes, gzipped bytes and (with Playwright) first-render time of the world map
+    with the default files in `source` and with every level, all served locally
+    so that only the geometry differs. Returns one row per file.
+    """
+    import functools
+    import http.server
+    import threading
+
+    rows = []
+    files = [("default", os.path.join(source, f"{name}.json"), source) for name in SOURCE_NAMES[:1]]
+    files += [(level, os.path.join(out_dir, level, SERVED_NAME), os.path.join(out_dir, level))
+              for level in LEVEL_NAMES]
+    for level, path, _ in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        arcs = decode_arcs(json.loads(data))
+        rows.append({"level": level, "bytes": len(data), "gzip_bytes": len(gzip.compress(data, 9)),
+                     "points": sum(len(arc) for arc in arcs), "render_ms": None})
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print("Playwright is not installed: first-render times not measured")
+        return rows
+
+    import plotly
+    import plotly.express as px
+
+    plotly_js = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+    df = px.data.gapminder().query("year == 2007")
+    figure = json.loads(px.choropleth(df, locations="iso_alpha", projection="mercator").update_layout(
+        width=900, height=800).to_json())
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch()
+        for row, (_, _, directory) in zip(rows, files):
+            handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+            server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            row["render_ms"] = _render_ms(browser, plotly_js, f"http://127.0.0.1:{server.server_port}/", figure,
+                                          repeats)
+            server.shutdown()
+        browser.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=("build", "measure"))
+    parser.add_argument("--source", help="directory holding plotly.js's world_110m.json and world_50m.json "
+                                         "(downloaded from its CDN by build when not given)")
+    parser.add_argument("--if-missing", action="store_true", help="build only if no build is there yet")
+    args = parser.parse_args()
+    if args.command == "build":
+        if args.if_missing and assets_version() is not None:
+            print(f"already built: version {assets_version()}")
+            raise SystemExit(0)
+        for level, size in build(args.source).items():
+            print(f"{level}: {size} bytes")
+    else:
+        if args.source is None:
+            parser.error("measure needs --source")
+        for row in measure(args.source):
+            render = "-" if row["render_ms"] is None else f"{row['render_ms']:.0f} ms"
+            print(f"{row['level']:<8} {row['bytes']:>9} bytes  {row['gzip_bytes']:>8} gzipped  "
+                  f"{row['points']:>7} points  first render {render}")
@@ -1,13 +1,21 @@
+import logging
+
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output, State
 import plotly.express as px
 
+import policy_explorer
+import topojson_assets
+
 # Sample data for the map
-df = px.data.gapminder().query("year == 2007")
+df = px.data.gapminder().query("year == 2007").copy()
+# gapminder codes North Korea as KOR, which hides it under South Korea on the map
+df.loc[df.country == "Korea, Dem. Rep.", "iso_alpha"] = "PRK"
 
-# Create a plain world map figure
-fig = px.choropleth(df, locations="iso_alpha", hover_name="country", projection="mercator")
+# Create a plain world map figure; clicks report each country's ISO-3 code in customdata
+fig = px.choropleth(df, locations="iso_alpha", hover_name="country", custom_data=["iso_alpha"],
+                    projection="mercator")
 fig.update_geos(showcoastlines=True, coastlinecolor="black")  # Show coastlines
 fig.update_traces(marker=dict(line=dict(color="black", width=0.5)))  # Country borders in black
 fig.update_layout(
@@ -16,10 +24,13 @@ fig.update_layout(
 )
 fig.update_layout(width=900, height=800)  # Set map size for 75% width
 
-# Initialize the Dash app
-app = dash.Dash(__name__)
+# Initialize the Dash app; the policy explorer's components are only in the layout on its page
+app = dash.Dash(__name__, suppress_callback_exceptions=True)
 server = app.server
 
+# Simplified topojson served by the app when built (see topojson_assets.py); otherwise plotly.js uses its CDN
+topojson_urls = topojson_assets.register(server)
+
 country_adaptations = {
     "Australia": {
         "Adaptation Mechanisms": "High melanin production among indigenous populations to protect against intense UV radiation.",
@@ -1552,16 +1563,79 @@ country_adaptations["Greenland"] = {
     "Impact of Lifestyle": "Reliance on vitamin D supplements and traditional diets rich in vitamin D."
 }
 
+# ISO-3 codes of the names that are not gapminder's: the spellings used above, countries
+# missing from gapminder, and other common variants
+COUNTRY_ALIASES = {
+    "Andorra": "AND", "Armenia": "ARM", "Belarus": "BLR", "Burma": "MMR", "Cape Verde": "CPV",
+    "Côte d'Ivoire": "CIV", "Czechia": "CZE", "Democratic Republic of the Congo": "COD", "DR Congo": "COD",
+    "Eswatini": "SWZ", "Estonia": "EST", "Fiji": "FJI", "French Polynesia": "PYF", "Greenland": "GRL",
+    "Hong Kong": "HKG", "Ivory Coast": "CIV", "Kiribati": "KIR", "Latvia": "LVA", "Liechtenstein": "LIE",
+    "Lithuania": "LTU", "Luxembourg": "LUX", "Marshall Islands": "MHL", "Micronesia": "FSM", "Moldova": "MDA",
+    "Monaco": "MCO", "Nauru": "NRU", "New Caledonia": "NCL", "North Korea": "PRK", "Palau": "PLW",
+    "Palestine": "PSE", "Papua New Guinea": "PNG", "Republic of the Congo": "COG", "Russia": "RUS",
+    "Samoa": "WSM", "Slovakia": "SVK", "Solomon Islands": "SLB", "South Korea": "KOR", "South Sudan": "SSD",
+    "Tonga": "TON", "Tuvalu": "TUV", "UK": "GBR", "Ukraine": "UKR", "United States of America": "USA",
+    "USA": "USA", "Vanuatu": "VUT", "Yemen": "YEM",
+}
+
+NO_INFORMATION = dict.fromkeys(["Adaptation Mechanisms", "Historical Context", "Modern Challenges", "Exceptions",
+                                "Impact of Lifestyle"], "No information available.")
+
+
+def format_info_text(info):
+    return "\n\n".join([f"**{key}:** {value}" for key, value in info.items()])
+
+
+# Every known name of a country -> its ISO-3 code
+country_aliases = dict(zip(df.country, df.iso_alpha))
+country_aliases.update(COUNTRY_ALIASES)
+
+# ISO-3 code -> (display name, Markdown shown when it is clicked), for every country on the
+# map or with adaptation data; map countries keep their gapminder name
+country_index = {iso: (name, format_info_text(NO_INFORMATION)) for name, iso in zip(df.country, df.iso_alpha)}
+country_sources = {}
+unresolved_countries = []
+for country, info in country_adaptations.items():
+    iso = country_aliases.get(country)
+    if iso is None:
+        unresolved_countries.append(country)
+        continue
+    if iso in country_sources:
+        raise ValueError(f"country_adaptations has both {country_sources[iso]!r} and {country!r} for {iso}")
+    country_sources[iso] = country
+    country_index[iso] = (country_index.get(iso, (country,))[0], format_info_text(info))
+
+
+def country_mismatch_report():
+    """
+    Map countries without adaptation data, and adaptation entries the map cannot
+    show because gapminder, which the map is drawn from, has no row for them.
+    """
+    on_map = set(df.iso_alpha)
+    return {
+        "map countries without data": sorted(name for name, iso in zip(df.country, df.iso_alpha)
+                                             if iso not in country_sources),
+        "entries not on the map (no gapminder row)": sorted(country for iso, country in country_sources.items()
+                                                            if iso not in on_map),
+        "entries with unknown names": unresolved_countries,
+    }
+
+
+for problem, countries in country_mismatch_report().items():
+    if countries:
+        logging.getLogger(__name__).warning("%d %s: %s", len(countries), problem, ", ".join(countries))
+
+
 # Helper function to format country adaptation info as Markdown
 def format_country_info(country):
-    info = country_adaptations.get(country, {})
-    info_text = "\n\n".join([f"**{key}:** {value}" for key, value in info.items()])
+    info_text = country_index[country_aliases[country]][1]
     return f"### {country}\n\n" + info_text
 
-app.layout = html.Div([
+map_layout = html.Div([
     html.Div(style={'display': 'flex', 'width': '100%'}, children=[
         html.Div(
-            dcc.Graph(id='world-map', figure=fig),
+            # With local topojson, the figure is only handed to the graph once its resolution is picked
+            dcc.Graph(id='world-map', figure={} if topojson_urls else fig),
             style={'flex': '3', 'display': 'flex', 'justify-content': 'center', 'align-items': 'center', 'margin': '20px'}
         ),
         html.Div(id='info-box', style={
@@ -1583,6 +1657,7 @@ app.layout = html.Div([
             ])
         ])
     ]),
+    dcc.Store(id='world-map-figure', data=fig if topojson_urls else None),
     # Horizontal row for Russia and Greenland adaptations
     dbc.Row([
         dbc.Col(dcc.Markdown(format_country_info("Russia")), width=6, style={'text-align': 'center'}),
@@ -1615,6 +1690,30 @@ html.Div(
 
 ])
 
+app.layout = html.Div([
+    dcc.Location(id='url'),
+    html.Div([
+        dcc.Link('World map', href='/'),
+        ' | ',
+        dcc.Link('FrozenLake policy explorer', href=policy_explorer.PATH),
+    ], style={'margin': '20px'}),
+    html.Div(id='page', children=map_layout),
+])
+
+
+if topojson_urls:
+    app.clientside_callback(
+        topojson_assets.viewport_picker(topojson_urls, map_width=900),
+        [Output('world-map', 'config'), Output('world-map', 'figure')],
+        Input('world-map-figure', 'data')
+    )
+
+
+@app.callback(Output('page', 'children'), Input('url', 'pathname'))
+def display_page(pathname):
+    return policy_explorer.layout if pathname == policy_explorer.PATH else map_layout
+
+
 @app.callback(
     [Output('country-name', 'children'),
      Output('country-info', 'children')],
@@ -1624,18 +1723,8 @@ def display_info(clickData):
     if clickData is None:
         return '', 'Click on a country to view adaptations.'
     else:
-        country = clickData['points'][0]['hovertext']
-        info_dict = country_adaptations.get(country, {
-            "Adaptation Mechanisms": "No information available.",
-            "Historical Context": "No information available.",
-            "Modern Challenges": "No information available.",
-            "Exceptions": "No information available.",
-            "Impact of Lifestyle": "No information available."
-        })
-
-        # Convert the dictionary to a formatted string for display
-        info_text = "\n\n".join([f"**{key}:** {value}" for key, value in info_dict.items()])
-
+        # Every country on the map is in the index, keyed by the ISO-3 code the figure carries
+        country, info_text = country_index[clickData['points'][0]['customdata'][0]]
         return f"Adaptations in {country}", dcc.Markdown(info_text)
 
 